@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Answer Completion Watcher for Perplexity Pro News Automation System
+===================================================================
+
+Потоковое чтение ответа Perplexity. В страницу внедряется MutationObserver,
+а асинхронный скрипт (long-poll) возвращает новый фрагмент текста, как только
+он отрисован. Ответ считается готовым, когда блок ответа не меняется дольше
+заданного "периода тишины".
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List
+
+# Селектор блока ответа Perplexity
+ANSWER_SELECTOR = "[data-testid='response'], .prose, .answer"
+
+# Пауза для накопления фрагмента перед отправкой в Python (мс)
+STREAM_BATCH_MS = 250
+
+# Максимальная длительность одного long-poll вызова (мс)
+STREAM_POLL_MS = 10000
+
+# Помечаем старые ответы и запускаем наблюдатель за изменениями страницы
+PREPARE_WATCH_SCRIPT = """
+document.querySelectorAll(arguments[0]).forEach(n => n.setAttribute('data-pplx-seen', '1'));
+if (window.__pplxObserver) window.__pplxObserver.disconnect();
+window.__pplxLastMutation = performance.now();
+window.__pplxObserver = new MutationObserver(() => { window.__pplxLastMutation = performance.now(); });
+window.__pplxObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+"""
+
+# Ждем новый фрагмент ответа после offset или завершения печати
+NEXT_CHUNK_SCRIPT = """
+const [selector, offset, quietMs, batchMs, maxWaitMs] = arguments;
+const done = arguments[arguments.length - 1];
+let finished = false;
+let chunkTimer = null;
+let quietTimer = null;
+
+if (!window.__pplxObserver) {
+    window.__pplxLastMutation = performance.now();
+    window.__pplxObserver = new MutationObserver(() => { window.__pplxLastMutation = performance.now(); });
+    window.__pplxObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+}
+
+function currentText() {
+    const nodes = Array.from(document.querySelectorAll(selector))
+        .filter(n => !n.hasAttribute('data-pplx-seen'));
+    return nodes.length ? nodes[nodes.length - 1].innerText : '';
+}
+
+function finish(status) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(chunkTimer);
+    clearTimeout(quietTimer);
+    clearTimeout(deadline);
+    const text = currentText();
+    done({
+        status: status,
+        chunk: text.slice(offset),
+        length: text.length,
+        text: status === 'complete' ? text : null
+    });
+}
+
+function check() {
+    const text = currentText();
+    if (!text.trim()) return;
+    if (text.length > offset) {
+        if (!chunkTimer) chunkTimer = setTimeout(() => finish('chunk'), batchMs);
+        return;
+    }
+    const idle = performance.now() - window.__pplxLastMutation;
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(() => finish('complete'), Math.max(0, quietMs - idle));
+}
+
+const observer = new MutationObserver(check);
+observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+const deadline = setTimeout(() => finish('idle'), maxWaitMs);
+check();
+"""
+
+@dataclass
+class AnswerChunk:
+    """Фрагмент потокового ответа"""
+    status: str  # chunk | complete | timeout | sources
+    delta: str
+    text: str
+    elapsed_ms: float
+    sources: List[str] = field(default_factory=list)
+
+    @property
+    def final(self) -> bool:
+        return self.status in ('complete', 'timeout')
+
+async def prepare_answer_watch(browser, selector: str = ANSWER_SELECTOR):
+    """Пометка старых ответов и запуск наблюдателя перед отправкой запроса"""
+    await browser.execute_script(PREPARE_WATCH_SCRIPT, selector)
+
+async def stream_answer(browser, quiet_ms: int, timeout_seconds: float,
+                        selector: str = ANSWER_SELECTOR) -> AsyncIterator[AnswerChunk]:
+    """Потоковое чтение ответа: фрагменты по мере отрисовки, затем финальный текст"""
+    started = time.perf_counter()
+    deadline = started + timeout_seconds
+    offset = 0
+    text = ""
+
+    while True:
+        remaining_ms = int((deadline - time.perf_counter()) * 1000)
+        if remaining_ms <= 0:
+            yield AnswerChunk('timeout', '', text, (time.perf_counter() - started) * 1000)
+            return
+
+        result = await browser.execute_async_script(
+            NEXT_CHUNK_SCRIPT, selector, offset, quiet_ms, STREAM_BATCH_MS,
+            min(remaining_ms, STREAM_POLL_MS)
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        status = result.get('status')
+        delta = result.get('chunk') or ''
+
+        if status == 'chunk':
+            offset = result.get('length', offset + len(delta))
+            text += delta
+            yield AnswerChunk('chunk', delta, text, elapsed_ms)
+
+        elif status == 'complete':
+            text = result.get('text') or text + delta
+            yield AnswerChunk('complete', delta, text, elapsed_ms)
+            return
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Async WebDriver Facade for Perplexity Pro News Automation System
+================================================================
+
+Тонкий асинхронный фасад над Selenium WebDriver. Каждый вызов драйвера
+и элементов страницы выполняется в выделенном потоке воркера, поэтому
+ожидания WebDriverWait не блокируют event loop.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Any, Callable, List
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+class AsyncElement:
+    """Асинхронная обертка над WebElement"""
+
+    def __init__(self, element, browser: 'AsyncWebDriver'):
+        self.element = element
+        self.browser = browser
+
+    async def text(self) -> str:
+        return await self.browser.call(lambda: self.element.text)
+
+    async def get_attribute(self, name: str):
+        return await self.browser.call(self.element.get_attribute, name)
+
+    async def click(self):
+        return await self.browser.call(self.element.click)
+
+    async def clear(self):
+        return await self.browser.call(self.element.clear)
+
+    async def send_keys(self, *values):
+        return await self.browser.call(self.element.send_keys, *values)
+
+class AsyncWebDriver:
+    """Асинхронный фасад: вызовы WebDriver выполняются в executor'е воркера"""
+
+    def __init__(self, driver, executor: Executor):
+        self.driver = driver
+        self.executor = executor
+
+    async def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполнение произвольного блокирующего вызова вне event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def _wrap(self, element) -> AsyncElement:
+        return AsyncElement(element, self)
+
+    async def get(self, url: str):
+        return await self.call(self.driver.get, url)
+
+    async def wait_for(self, condition: Callable, timeout: float) -> AsyncElement:
+        """WebDriverWait(...).until(condition) в потоке воркера"""
+        element = await self.call(WebDriverWait(self.driver, timeout).until, condition)
+        return self._wrap(element)
+
+    async def find_element(self, by: str, value: str) -> AsyncElement:
+        element = await self.call(self.driver.find_element, by, value)
+        return self._wrap(element)
+
+    async def find_elements(self, by: str, value: str) -> List[AsyncElement]:
+        elements = await self.call(self.driver.find_elements, by, value)
+        return [self._wrap(element) for element in elements]
+
+    async def get_cookies(self):
+        return await self.call(self.driver.get_cookies)
+
+    async def add_cookie(self, cookie: dict):
+        return await self.call(self.driver.add_cookie, cookie)
+
+    async def execute_script(self, script: str, *args):
+        return await self.call(self.driver.execute_script, script, *args)
+
+    async def execute_async_script(self, script: str, *args):
+        return await self.call(self.driver.execute_async_script, script, *args)
+
+    async def quit(self):
+        return await self.call(self.driver.quit)
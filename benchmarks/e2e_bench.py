@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Сквозной бенчмарк сессии без Perplexity и Telegram
+==================================================
+
+Поднимает локальные заменители (benchmarks/fake_servers.py): страницы
+Perplexity с потоковым ответом заданной длительности и Bot API с заданной
+долей ответов 429. Затем прогоняет полную сессию через PerplexityAutomation
+(perplexity_main.py) и через NewsAutomationSystem (main.py): браузеры пула,
+разбор, БД, проверка дубликатов, очередь доставки. Если какая-то из систем
+не собирается, падает или не создает ни одного поста, бенчмарк завершается
+с кодом 1.
+
+Результат: постов в минуту, перцентили задержки стадий, ответа и доставки,
+память процесса и браузеров (пик Python-аллокаций - с --tracemalloc, он
+замедляет прогон). Каждый прогон идет в новом временном каталоге с пустой
+БД, поэтому результаты повторяемы и сравнимы между изменениями.
+
+Нужны Chrome и chromedriver. Запуск из корня проекта:
+
+    python benchmarks/e2e_bench.py [--session evening] [--answer-seconds 5] [--flood-rate 0.1]
+    python benchmarks/e2e_bench.py --output baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_servers import FakePerplexity, FakeTelegram  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {'p50': round(pick(0.5), 1), 'p95': round(pick(0.95), 1), 'max': round(ordered[-1], 1)}
+
+def browser_memory_mb() -> Optional[float]:
+    """Суммарный RSS дочерних процессов (Chrome, chromedriver)"""
+    if psutil is None:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(total / 2 ** 20, 1)
+
+def configure_environment(args, perplexity_url: str, telegram_url: str):
+    """Переменные окружения читаются config.py при импорте - задаем их до импорта модулей.
+
+    Пути относительные: каждый прогон работает в своем временном каталоге.
+    """
+    os.environ.update({
+        'PERPLEXITY_URL': perplexity_url,
+        'PERPLEXITY_EMAIL': 'bench@example.com',
+        'PERPLEXITY_PASSWORD': 'bench',
+        'TELEGRAM_API_BASE_URL': telegram_url,
+        'TELEGRAM_BOT_TOKEN': '123456:bench',
+        'TG_IT_CHANNEL': '@bench_it',
+        'TG_AUTOMATION_CHANNEL': '@bench_automation',
+        'TG_ROBOTICS_CHANNEL': '@bench_robotics',
+        'DATABASE_PATH': 'bench.db',
+        'BROWSER_PROFILE_DIR': 'profiles',
+        'DRIVER_POOL_SIZE': str(args.pool_size),
+        'REQUESTS_PER_MINUTE': str(args.rpm),
+        'QUERY_DELAY_SECONDS': '0',
+        'ANSWER_QUIET_MS': str(args.quiet_ms),
+        'TELEGRAM_DIGEST_ENABLED': 'true' if args.digest else 'false',
+        'TELEGRAM_DIGEST_WINDOW_SECONDS': str(args.digest_window),
+        'LOG_LEVEL': 'WARNING'
+    })
+
+async def bench_perplexity_automation(args) -> Dict:
+    """Сессия NewsScheduler.run_session на PerplexityAutomation"""
+    from config import Config
+    from perplexity_main import NewsScheduler, PerplexityAutomation
+
+    automation = PerplexityAutomation({
+        'email': Config.PERPLEXITY_EMAIL,
+        'password': Config.PERPLEXITY_PASSWORD,
+        'telegram_token': Config.TELEGRAM_BOT_TOKEN,
+        'telegram_channels': Config.TELEGRAM_CHANNELS
+    }, pool_size=args.pool_size)
+
+    try:
+        await automation.telegram.initialize()
+        await automation.recover_ready_posts()
+
+        scheduler = NewsScheduler(automation)
+        started = time.perf_counter()
+        results = await scheduler.run_session(args.session, args.target_posts)
+        wall = time.perf_counter() - started
+
+        return {
+            'wall_seconds': round(wall, 1),
+            'queries': automation.queries_used_today,
+            'posts_created': results['posts_created'],
+            'posts_published': results['posts_published'],
+            'posts_queued': results['posts_queued'],
+            'stages': results['pipeline'],
+            'answer_latency_ms': percentiles(list(automation.answer_latencies)),
+            'delivery': automation.get_outbox_stats(),
+            'pacing': automation.get_pacing_stats(),
+            'browser_memory_mb': browser_memory_mb()
+        }
+    finally:
+        await automation.cleanup()
+
+async def bench_news_automation_system(args) -> Dict:
+    """Ручная сессия NewsAutomationSystem.run_manual_session"""
+    from main import NewsAutomationSystem
+
+    system = NewsAutomationSystem()
+    try:
+        if not await system.login():
+            raise RuntimeError("не удалось авторизоваться в заменителе Perplexity")
+        await system.telegram.initialize()
+        await system.automation.recover_ready_posts()
+
+        started = time.perf_counter()
+        results = await system.run_manual_session(args.session)
+        wall = time.perf_counter() - started
+
+        return {
+            'wall_seconds': round(wall, 1),
+            'queries': results['queries_used'],
+            'posts_created': results['posts_created'],
+            'posts_published': results['posts_published'],
+            'posts_queued': results['posts_queued'],
+            'stages': results['pipeline'],
+            'delivery': system.outbox.get_stats(),
+            'browser_memory_mb': browser_memory_mb()
+        }
+    finally:
+        await system.shutdown()
+
+BENCHES = [
+    ('PerplexityAutomation', bench_perplexity_automation),
+    ('NewsAutomationSystem', bench_news_automation_system)
+]
+
+async def run_bench(name: str, bench, args, perplexity: FakePerplexity, telegram: FakeTelegram) -> Dict:
+    messages_before = len(telegram.messages)
+    floods_before = telegram.flood_responses
+    logins_before = perplexity.logins
+
+    with tempfile.TemporaryDirectory(prefix='pplx-bench-') as tmp:
+        # БД, профили браузеров и лог создаются в каталоге прогона
+        previous_cwd = os.getcwd()
+        os.chdir(tmp)
+        if args.tracemalloc:
+            tracemalloc.start()
+        try:
+            result = await bench(args)
+        finally:
+            python_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            tracemalloc.stop()
+            os.chdir(previous_cwd)
+
+    minutes = result['wall_seconds'] / 60
+    result.update({
+        'name': name,
+        # В режиме дайджеста сессия только ставит посты в очередь
+        'posts_per_minute': round((result['posts_published'] + result['posts_queued']) / minutes, 2) if minutes else 0.0,
+        'telegram_messages': len(telegram.messages) - messages_before,
+        'telegram_429': telegram.flood_responses - floods_before,
+        'perplexity_logins': perplexity.logins - logins_before,
+        'python_peak_mb': round(python_peak / 2 ** 20, 1) if python_peak is not None else None,
+        'process_max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    })
+    return result
+
+async def run_all(args) -> List[Dict]:
+    perplexity = FakePerplexity(answer_seconds=args.answer_seconds, chunks=args.chunks)
+    telegram = FakeTelegram(flood_rate=args.flood_rate, retry_after=args.retry_after,
+                            latency_seconds=args.telegram_latency_ms / 1000)
+    configure_environment(args, await perplexity.start(), await telegram.start())
+
+    # perplexity_main не настраивает логирование при импорте: очередь как в рабочем режиме
+    from logging_setup import setup_queued_logging
+    setup_queued_logging('WARNING')
+
+    results, failures = [], []
+    try:
+        for name, bench in BENCHES:
+            # Система, которая не собирается или не работает, - провал, а не пропуск
+            try:
+                result = await run_bench(name, bench, args, perplexity, telegram)
+            except Exception as e:
+                print(f"\n❌ {name}: {type(e).__name__}: {e}")
+                traceback.print_exc()
+                failures.append(name)
+                continue
+
+            results.append(result)
+            print_result(result)
+            if not result['posts_created']:
+                print(f"❌ {name}: сессия не создала ни одного поста")
+                failures.append(name)
+    finally:
+        await perplexity.stop()
+        await telegram.stop()
+
+    return results, failures
+
+def print_result(result: Dict):
+    print(f"\n=== {result['name']} ===")
+    print(f"Время: {result['wall_seconds']} с, запросов: {result['queries']}, "
+          f"постов: {result['posts_created']}, опубликовано: {result['posts_published']}, "
+          f"в дайджест: {result['posts_queued']}")
+    print(f"Постов в минуту: {result['posts_per_minute']}")
+    print(f"Telegram: сообщений {result['telegram_messages']}, ответов 429: {result['telegram_429']}")
+
+    if result.get('answer_latency_ms'):
+        print(f"Ответ Perplexity, мс: {result['answer_latency_ms']}")
+    latency = result['delivery'].get('delivery_latency_seconds')
+    if latency:
+        print(f"Доставка, с: {latency}")
+
+    print(f"{'стадия':>10} {'шт':>5} {'p50, мс':>10} {'p95, мс':>10} {'загрузка':>9} {'очередь':>8}")
+    for stage_name, stage in result['stages'].items():
+        stage_latency = stage.get('latency_ms', {})
+        print(f"{stage_name:>10} {stage['processed']:>5} {stage_latency.get('p50', 0):>10} "
+              f"{stage_latency.get('p95', 0):>10} {stage['utilization']:>9.0%} {stage['queue_max_depth']:>8}")
+
+    memory = [f"процесс {result['process_max_rss_mb']} МБ"]
+    if result['python_peak_mb'] is not None:
+        memory.append(f"пик Python {result['python_peak_mb']} МБ")
+    if result['browser_memory_mb'] is not None:
+        memory.append(f"браузеры {result['browser_memory_mb']} МБ")
+    print(f"Память: {', '.join(memory)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--session', default='evening', help='сессия (набор запросов)')
+    parser.add_argument('--target-posts', type=int, default=5, help='цель сессии по постам')
+    parser.add_argument('--pool-size', type=int, default=2, help='браузеров в пуле')
+    parser.add_argument('--answer-seconds', type=float, default=5.0, help='длительность печати ответа')
+    parser.add_argument('--chunks', type=int, default=20, help='фрагментов в ответе')
+    parser.add_argument('--quiet-ms', type=int, default=500, help='ANSWER_QUIET_MS')
+    parser.add_argument('--rpm', type=int, default=60, help='REQUESTS_PER_MINUTE')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='доля sendMessage с ответом 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответе 429')
+    parser.add_argument('--telegram-latency-ms', type=float, default=50, help='задержка ответа Bot API')
+    parser.add_argument('--digest', action='store_true', help='режим дайджеста')
+    parser.add_argument('--digest-window', type=int, default=5, help='окно дайджеста, с')
+    parser.add_argument('--tracemalloc', action='store_true', help='измерять пик памяти Python (медленнее)')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    results, failures = asyncio.run(run_all(args))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'args': vars(args), 'results': results, 'failures': failures},
+                                                ensure_ascii=False, indent=2))
+        print(f"\n💾 Результаты сохранены в {args.output}")
+
+    if failures:
+        print(f"\n❌ Бенчмарк не пройден: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Локальные заменители Perplexity и Telegram Bot API для бенчмарков
+================================================================
+
+FakePerplexity отдает страницы, повторяющие то, что ищет автоматизация:
+кнопку "Sign In" и форму входа, поле ввода запроса, кнопку отправки и
+ответ в блоке `.prose`, который печатается фрагментами с заданной
+задержкой, и ссылки-источники `.citation`.
+
+FakeTelegram отвечает на getMe и sendMessage как Bot API; заданная доля
+sendMessage получает 429 с retry_after (flood control).
+
+Оба сервера работают на aiohttp в том же event loop, что и бенчмарк.
+"""
+
+import asyncio
+import hashlib
+import html
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from aiohttp import web
+
+SESSION_COOKIE = 'pplx_bench_session'
+
+# Фрагменты ответа: темы и маркеры важности, чтобы посты различались
+# и часть из них проходила порог публикации
+TOPICS = [
+    ("OpenAI", "представила новую модель для генерации кода", "ai"),
+    ("Boston Dynamics", "показала робота для складской логистики", "robotics"),
+    ("NVIDIA", "объявила о рекордной выручке от облачных ускорителей", "cloud"),
+    ("Стартап из Берлина", "привлек финансирование на платформу автоматизации производства", "automation"),
+    ("Google", "обновила Android и добавила функции приватности", "mobile"),
+    ("Ethereum", "завершил обновление сети и снизил комиссии", "blockchain"),
+    ("Microsoft", "закрыла критическую уязвимость в облачных сервисах", "security"),
+    ("Tesla", "расширила программу автономного вождения", "robotics")
+]
+
+MARKERS = [
+    "Это настоящий прорыв в отрасли.",
+    "Сделка оценивается в 2 миллиарда долларов.",
+    "Аналитики называют событие значительным для рынка.",
+    "Компания впервые раскрыла детали проекта.",
+    "Изменения коснутся крупных корпоративных клиентов."
+]
+
+def make_answer(query: str) -> str:
+    """Детерминированный ответ на запрос: одинаковый запрос - одинаковый ответ"""
+    rng = random.Random(hashlib.md5(query.encode()).digest())
+    company, event, category = rng.choice(TOPICS)
+    markers = rng.sample(MARKERS, rng.randint(1, 3))
+    details = ' '.join(rng.sample(MARKERS, 2))
+    return (
+        f"{company} {event} ({rng.randint(100, 999)})\n\n"
+        f"Главное: {company} {event}. {' '.join(markers)} "
+        f"Эксперты связывают новость с направлением {category} и ожидают продолжения в ближайшие недели.\n\n"
+        f"Подробности: {details} Запрос: {query}"
+    )
+
+LOGIN_PAGE = """<!doctype html>
+<html><body>
+<button id="signin" onclick="document.getElementById('login').style.display='block'">Sign In</button>
+<textarea placeholder="Ask anything"></textarea>
+<form id="login" method="post" action="/login" style="display:none">
+  <input type="email" name="email"><input type="password" name="password">
+  <button type="submit">Continue</button>
+</form>
+</body></html>"""
+
+# Ответ печатается фрагментами; фрагменты и паузу между ними дает /answer
+SEARCH_PAGE = """<!doctype html>
+<html><body>
+<main id="thread"></main>
+<textarea placeholder="Ask anything"></textarea>
+<button type="button" aria-label="Submit" id="submit">Ask</button>
+<script>
+document.getElementById('submit').addEventListener('click', async () => {
+  const query = document.querySelector('textarea').value;
+  const response = await fetch('/answer?q=' + encodeURIComponent(query));
+  const {chunks, delay, sources} = await response.json();
+  const block = document.createElement('div');
+  block.className = 'prose';
+  block.setAttribute('data-testid', 'response');
+  document.getElementById('thread').appendChild(block);
+  let i = 0;
+  const timer = setInterval(() => {
+    block.textContent += chunks[i++];
+    if (i >= chunks.length) {
+      clearInterval(timer);
+      for (const href of sources) {
+        const link = document.createElement('a');
+        link.className = 'citation';
+        link.href = href;
+        link.textContent = href;
+        document.getElementById('thread').appendChild(link);
+      }
+    }
+  }, delay);
+});
+</script>
+</body></html>"""
+
+@dataclass
+class FakePerplexity:
+    """Страницы Perplexity с потоковым ответом заданной длительности"""
+    answer_seconds: float = 5.0
+    chunks: int = 20
+    logins: int = 0
+    queries: int = 0
+    _runner: web.AppRunner = None
+    url: str = ''
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/', self.index)
+        app.router.add_post('/login', self.login)
+        app.router.add_get('/answer', self.answer)
+        return app
+
+    async def index(self, request: web.Request) -> web.Response:
+        if request.cookies.get(SESSION_COOKIE):
+            return web.Response(text=SEARCH_PAGE, content_type='text/html')
+        return web.Response(text=LOGIN_PAGE, content_type='text/html')
+
+    async def login(self, request: web.Request) -> web.Response:
+        self.logins += 1
+        response = web.Response(status=303, headers={'Location': '/'})
+        response.set_cookie(SESSION_COOKIE, hashlib.md5(str(time.time()).encode()).hexdigest())
+        return response
+
+    async def answer(self, request: web.Request) -> web.Response:
+        self.queries += 1
+        text = make_answer(request.query.get('q', ''))
+        size = max(1, len(text) // self.chunks + 1)
+        parts = [text[i:i + size] for i in range(0, len(text), size)]
+        delay_ms = int(self.answer_seconds * 1000 / len(parts))
+        sources = [f"https://example.com/news/{hashlib.md5(text.encode()).hexdigest()[:8]}/{i}" for i in range(3)]
+        return web.json_response({'chunks': parts, 'delay': delay_ms, 'sources': sources})
+
+    async def start(self, port: int = 0) -> str:
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}/"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+@dataclass
+class FakeTelegram:
+    """Bot API: getMe и sendMessage, часть отправок получает 429"""
+    flood_rate: float = 0.0
+    retry_after: int = 1
+    latency_seconds: float = 0.05
+    seed: int = 0
+    messages: List[Dict] = field(default_factory=list)
+    flood_responses: int = 0
+    _runner: web.AppRunner = None
+    base_url: str = ''
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.method)
+        return app
+
+    async def _params(self, request: web.Request) -> Dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        return dict(await request.post())
+
+    async def method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = await self._params(request)
+
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'
+            }})
+
+        if method == 'sendMessage':
+            await self._sleep()
+            if self.rng.random() < self.flood_rate:
+                self.flood_responses += 1
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after}
+                }, status=429)
+
+            message_id = len(self.messages) + 1
+            chat_id = params.get('chat_id', '')
+            self.messages.append({'chat_id': chat_id, 'text': params.get('text', ''), 'at': time.time()})
+            return web.json_response({'ok': True, 'result': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': -1000000000000 - int(hashlib.md5(str(chat_id).encode()).hexdigest()[:6], 16),
+                         'type': 'channel', 'title': html.escape(str(chat_id))},
+                'text': params.get('text', '')
+            }})
+
+        return web.json_response({'ok': True, 'result': True})
+
+    async def _sleep(self):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+    async def start(self, port: int = 0) -> str:
+        self._runner = web.AppRunner(self._app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+        self.base_url = f"http://127.0.0.1:{self._runner.addresses[0][1]}/bot"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сопоставления ключевых слов
+====================================
+
+Сравнивает прежний подход (отдельный поиск `term in text` для каждого
+термина) со скомпилированным KeywordMatcher на ответах разной длины.
+
+Запуск из корня проекта:
+
+    python benchmarks/keyword_matcher_bench.py [--repeat 20]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config  # noqa: E402
+from keyword_matcher import AUTOMATION_MARKERS, TECH_TERMS, KeywordMatcher  # noqa: E402
+
+PARAGRAPHS = [
+    "Компания OpenAI объявляет о запуске новой модели, которая, по словам аналитиков, "
+    "может стать прорывом в области машинного обучения и генеративного ИИ.",
+    "Industrial robots are being deployed across manufacturing plants in Asia, while "
+    "Boston Dynamics unveils a new humanoid platform for logistics.",
+    "Стартап из Москвы привлек 40 миллионов долларов финансирования в раунде Series A; "
+    "среди инвесторов - венчурные фонды и крупные корпорации.",
+    "Regulators opened an antitrust investigation after the merger was announced, and "
+    "the stock fell sharply on NASDAQ during trading on Monday.",
+    "Обновление облачной платформы добавляет поддержку kubernetes и serverless-функций, "
+    "а также закрывает критическую уязвимость нулевого дня.",
+    "The report describes general market conditions without naming specific products, "
+    "companies or technologies, and serves as filler text for longer answers."
+]
+
+SIZES = [1_000, 10_000, 50_000, 200_000]
+
+def make_response(size: int) -> str:
+    parts = []
+    length = 0
+    index = 0
+    while length < size:
+        paragraph = PARAGRAPHS[index % len(PARAGRAPHS)]
+        parts.append(paragraph)
+        length += len(paragraph) + 2
+        index += 1
+    return "\n\n".join(parts)[:size]
+
+def legacy_match(text: str, terms):
+    """Прежний подход: один проход по тексту на каждый термин"""
+    text_lower = text.lower()
+    return [term for term in terms if term.lower() in text_lower]
+
+def measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='повторов на размер (берется лучший)')
+    args = parser.parse_args()
+
+    terms = [term for spec in Config.CATEGORY_KEYWORDS.values() for term in spec['keywords']]
+    terms += [term for spec in Config.IMPORTANCE_INDICATORS.values() for term in spec['keywords']]
+    terms += TECH_TERMS + AUTOMATION_MARKERS
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher(Config.CATEGORY_KEYWORDS, Config.IMPORTANCE_INDICATORS)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Терминов: {len(terms)}, сборка автомата: {build_ms:.1f} мс")
+    print(f"{'размер':>10} {'по терминам, мс':>16} {'автомат, мс':>12} {'ускорение':>10}")
+
+    for size in SIZES:
+        text = make_response(size)
+        legacy = measure(lambda: legacy_match(text, terms), args.repeat)
+        compiled = measure(lambda: matcher.match(text), args.repeat)
+        print(f"{size:>10} {legacy * 1000:>16.3f} {compiled * 1000:>12.3f} {legacy / compiled:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора ответов Perplexity
+===================================
+
+Корпус - реальные по форме ответы на русском и английском
+(benchmarks/parser_corpus/*.txt, 1-3 КБ). Из них детерминированно
+собираются документы по 10, 50 и 200 КБ: абзацы исходных ответов идут
+по кругу, пока не наберется нужный размер в байтах UTF-8.
+
+Для каждого документа измеряются лучшее из --repeat время вызова и
+пропускная способность news_parser.parse_response, отдельно - проход
+KeywordMatcher (match), выбор категории и оценка важности по его
+результату, а также пик Python-аллокаций на вызов parse_response.
+
+Перед замерами результат разбора сверяется с эталоном
+(parser_corpus/golden.json): заголовок, краткое содержание, категория,
+важность, термины и каналы. Расхождение - код выхода 1, замеры не
+выполняются: оптимизация не должна незаметно менять результат. Если
+изменение результата намеренное, эталон обновляется через --update-golden.
+
+Запуск из корня проекта:
+
+    python benchmarks/parser_bench.py [--repeat 20]
+    python benchmarks/parser_bench.py --check-only
+    python benchmarks/parser_bench.py --update-golden
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from keyword_matcher import get_matcher  # noqa: E402
+from news_parser import NewsPost, parse_response  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'parser_corpus'
+GOLDEN_PATH = CORPUS_DIR / 'golden.json'
+
+# Составные документы: имя, исходные ответы (префикс имени файла), размер в байтах
+COMPOSED = [
+    ('ru_10k', 'ru_', 10_000),
+    ('en_10k', 'en_', 10_000),
+    ('mixed_50k', '', 50_000),
+    ('ru_200k', 'ru_', 200_000),
+    ('en_200k', 'en_', 200_000)
+]
+
+GOLDEN_FIELDS = ('title', 'summary', 'category', 'importance', 'keywords', 'telegram_channels')
+
+def load_sources() -> Dict[str, str]:
+    return {path.stem: path.read_text(encoding='utf-8') for path in sorted(CORPUS_DIR.glob('*.txt'))}
+
+def compose(texts: List[str], size: int) -> str:
+    """Абзацы текстов по кругу, пока документ не достигнет size байт"""
+    paragraphs = [paragraph for text in texts for paragraph in text.strip().split('\n\n')]
+    parts = []
+    length = 0
+    index = 0
+    while length < size:
+        paragraph = paragraphs[index % len(paragraphs)]
+        parts.append(paragraph)
+        length += len(paragraph.encode('utf-8')) + 2
+        index += 1
+    return '\n\n'.join(parts)
+
+def build_documents() -> List[Tuple[str, str]]:
+    """Документы корпуса (имя, текст): исходные ответы и составные"""
+    sources = load_sources()
+    documents = list(sources.items())
+    for name, prefix, size in COMPOSED:
+        texts = [text for stem, text in sources.items() if stem.startswith(prefix)]
+        documents.append((name, compose(texts, size)))
+    return documents
+
+def query_for(name: str) -> str:
+    return f"Новости корпуса бенчмарка: {name}"
+
+def golden_record(post: NewsPost) -> Dict:
+    return {field: getattr(post, field) for field in GOLDEN_FIELDS}
+
+def check_golden(documents: List[Tuple[str, str]], golden: Dict[str, Dict]) -> List[str]:
+    """Расхождения с эталоном в виде строк для вывода"""
+    problems = []
+    for name, text in documents:
+        expected = golden.get(name)
+        if expected is None:
+            problems.append(f"{name}: нет эталона")
+            continue
+
+        post = parse_response(text, query_for(name))
+        if post is None:
+            problems.append(f"{name}: разбор вернул None")
+            continue
+
+        actual = golden_record(post)
+        for field in GOLDEN_FIELDS:
+            if actual[field] != expected.get(field):
+                problems.append(f"{name}.{field}: ожидалось {expected.get(field)!r}, получено {actual[field]!r}")
+
+    for name in sorted(set(golden) - {name for name, _ in documents}):
+        problems.append(f"{name}: эталон без документа")
+    return problems
+
+def measure(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def peak_allocation(func) -> int:
+    """Пик Python-аллокаций за один вызов, байт"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+def bench_document(name: str, text: str, repeat: int) -> Dict:
+    matcher = get_matcher()
+    query = query_for(name)
+    matched = matcher.match(text)
+    size = len(text.encode('utf-8'))
+
+    parse = measure(lambda: parse_response(text, query), repeat)
+    match = measure(lambda: matcher.match(text), repeat)
+    category = measure(matched.category, repeat)
+    importance = measure(matched.importance, repeat)
+
+    return {
+        'name': name,
+        'bytes': size,
+        'parse_us': round(parse * 1e6, 1),
+        'parse_mb_per_s': round(size / parse / 2 ** 20, 2),
+        'match_us': round(match * 1e6, 1),
+        'category_us': round(category * 1e6, 2),
+        'importance_us': round(importance * 1e6, 2),
+        'parse_peak_kb': round(peak_allocation(lambda: parse_response(text, query)) / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='повторов на документ (берется лучший)')
+    parser.add_argument('--check-only', action='store_true', help='только сверка с эталоном')
+    parser.add_argument('--update-golden', action='store_true', help='перезаписать эталон текущими результатами')
+    parser.add_argument('--output', help='сохранить замеры в JSON')
+    args = parser.parse_args()
+
+    documents = build_documents()
+
+    if args.update_golden:
+        golden = {name: golden_record(parse_response(text, query_for(name))) for name, text in documents}
+        GOLDEN_PATH.write_text(json.dumps(golden, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"💾 Эталон обновлен: {len(golden)} документов -> {GOLDEN_PATH}")
+        return
+
+    golden = json.loads(GOLDEN_PATH.read_text(encoding='utf-8')) if GOLDEN_PATH.exists() else {}
+    problems = check_golden(documents, golden)
+    if problems:
+        print(f"❌ Расхождения с эталоном ({len(problems)}):")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"✅ Эталон совпадает: {len(documents)} документов")
+
+    if args.check_only:
+        return
+
+    started = time.perf_counter()
+    get_matcher.cache_clear()
+    get_matcher()
+    print(f"Сборка автомата: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    print(f"{'документ':>26} {'КБ':>7} {'разбор, мкс':>12} {'МБ/с':>7} {'match, мкс':>11} "
+          f"{'категория':>10} {'важность':>9} {'пик, КБ':>8}")
+    results = []
+    for name, text in documents:
+        result = bench_document(name, text, args.repeat)
+        results.append(result)
+        print(f"{name:>26} {result['bytes'] / 1024:>7.1f} {result['parse_us']:>12.1f} {result['parse_mb_per_s']:>7.2f} "
+              f"{result['match_us']:>11.1f} {result['category_us']:>10.2f} {result['importance_us']:>9.2f} "
+              f"{result['parse_peak_kb']:>8.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'repeat': args.repeat, 'results': results}, ensure_ascii=False, indent=2))
+        print(f"\n💾 Результаты сохранены в {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк запуска CLI
+====================
+
+Команды status и health вызываются из cron, healthcheck и руками, поэтому
+должны завершаться быстро и не загружать тяжелые зависимости: selenium,
+python-telegram-bot и aiohttp нужны только командам, которые работают с
+браузером, ботом или HTTP-сервером.
+
+Команда (по умолчанию `main.py status`) запускается в отдельном процессе
+--repeat раз, берется лучшее время от старта процесса до выхода. Так же
+измеряется пустой запуск интерпретатора (`python -c pass`): бюджет
+--budget-ms относится ко времени команды сверх него, чтобы результат не
+зависел от скорости машины. Еще один запуск с `-X importtime` дает список
+загруженных модулей и самые дорогие импорты. Код выхода 1, если время
+превышает бюджет, если загружен запрещенный модуль или если команда
+завершилась с ошибкой.
+
+Запуск из корня проекта:
+
+    python benchmarks/startup_bench.py [--repeat 10] [--budget-ms 200]
+    python benchmarks/startup_bench.py --command health
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / 'main.py'
+
+# Пакеты, которые не должны загружаться быстрыми командами
+FORBIDDEN = ('selenium', 'telegram', 'aiohttp')
+
+def run_process(args: List[str]) -> Tuple[float, subprocess.CompletedProcess]:
+    """Время выполнения процесса и его результат"""
+    started = time.perf_counter()
+    result = subprocess.run(args, cwd=ROOT, capture_output=True, text=True)
+    return time.perf_counter() - started, result
+
+def run_command(command: List[str], importtime: bool = False) -> Tuple[float, subprocess.CompletedProcess]:
+    """Команда main.py в новом процессе"""
+    return run_process([sys.executable] + (['-X', 'importtime'] if importtime else []) + [str(MAIN)] + command)
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Модули из вывода -X importtime: имя -> накопительное время, мкс"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        modules[parts[2]] = int(parts[1])
+    return modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--command', nargs='+', default=['status'], help='аргументы main.py')
+    parser.add_argument('--repeat', type=int, default=10, help='запусков (берется лучший)')
+    parser.add_argument('--budget-ms', type=float, default=200, help='допустимое время запуска, мс')
+    parser.add_argument('--top', type=int, default=10, help='сколько самых дорогих импортов показать')
+    args = parser.parse_args()
+
+    baseline = min(run_process([sys.executable, '-c', 'pass'])[0] for _ in range(args.repeat))
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        seconds, result = run_command(args.command)
+        if result.returncode != 0:
+            print(f"❌ Команда {' '.join(args.command)} завершилась с кодом {result.returncode}:")
+            print(result.stderr or result.stdout)
+            sys.exit(1)
+        best = min(best, seconds)
+
+    _, result = run_command(args.command, importtime=True)
+    modules = parse_importtime(result.stderr)
+    forbidden = sorted(name for name in modules if name.split('.')[0] in FORBIDDEN)
+
+    print(f"Команда: main.py {' '.join(args.command)}")
+    overhead = best - baseline
+    print(f"Лучшее время из {args.repeat}: {best * 1000:.1f} мс, пустой интерпретатор: {baseline * 1000:.1f} мс")
+    print(f"Сверх интерпретатора: {overhead * 1000:.1f} мс (бюджет {args.budget_ms:.0f} мс)")
+    print(f"Загружено модулей: {len(modules)}")
+    print(f"\n{'модуль':>40} {'накопительно, мс':>17}")
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:>40} {cumulative / 1000:>17.1f}")
+
+    failed = False
+    if forbidden:
+        print(f"\n❌ Загружены тяжелые модули: {', '.join(forbidden)}")
+        failed = True
+    if overhead * 1000 > args.budget_ms:
+        print(f"\n❌ Время запуска {overhead * 1000:.1f} мс превышает бюджет {args.budget_ms:.0f} мс")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Запуск укладывается в бюджет")
+
+if __name__ == "__main__":
+    main()
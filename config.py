@@ -50,9 +50,11 @@ class Config:
     # Perplexity Pro настройки
     PERPLEXITY_EMAIL = os.getenv("PERPLEXITY_EMAIL", "")
     PERPLEXITY_PASSWORD = os.getenv("PERPLEXITY_PASSWORD", "")
+    PERPLEXITY_URL = os.getenv("PERPLEXITY_URL", "https://www.perplexity.ai/")
 
-    # Telegram настройки
+    # Telegram настройки (TELEGRAM_API_BASE_URL - для локального Bot API сервера)
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
     TELEGRAM_CHANNELS = {
         "it_news": os.getenv("TG_IT_CHANNEL", ""),
         "automation": os.getenv("TG_AUTOMATION_CHANNEL", ""),
@@ -95,6 +97,11 @@ class Config:
         )
     }
 
+    # Перекрытие сессий: skip | queue | allow; опоздавший запуск: run | skip
+    SCHEDULER_OVERLAP_POLICY = os.getenv("SCHEDULER_OVERLAP_POLICY", "queue")
+    SCHEDULER_MISFIRE_POLICY = os.getenv("SCHEDULER_MISFIRE_POLICY", "run")
+    SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "300"))
+
     # =============================================================================
     # БРАУЗЕР НАСТРОЙКИ
     # =============================================================================
@@ -107,6 +114,16 @@ class Config:
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
     }
 
+    # Количество параллельных браузеров (каждый авторизуется отдельно)
+    DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "2"))
+
+    # Профили браузеров и cookies для восстановления сессии без логина
+    BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", "data/browser_profiles")
+
+    # Ответ считается готовым, если не менялся ANSWER_QUIET_MS миллисекунд
+    ANSWER_QUIET_MS = int(os.getenv("ANSWER_QUIET_MS", "1500"))
+    ANSWER_TIMEOUT_SECONDS = int(os.getenv("ANSWER_TIMEOUT_SECONDS", "45"))
+
     # =============================================================================
     # ПРОИЗВОДИТЕЛЬНОСТЬ И НАДЕЖНОСТЬ
     # =============================================================================
@@ -116,14 +133,54 @@ class Config:
     RETRY_DELAY_SECONDS = int(os.getenv("RETRY_DELAY_SECONDS", "5"))
     QUERY_DELAY_SECONDS = int(os.getenv("QUERY_DELAY_SECONDS", "30"))
 
-    # Rate limiting
+    # Rate limiting: запросов к Perplexity за скользящую минуту (QUERY_DELAY_SECONDS -
+    # минимальный интервал между отправками); ошибки и ответы дольше
+    # QUERY_SLOW_LATENCY_SECONDS замедляют темп до QUERY_MAX_BACKOFF раз
     REQUESTS_PER_MINUTE = int(os.getenv("REQUESTS_PER_MINUTE", "2"))
-    TELEGRAM_RATE_LIMIT = int(os.getenv("TELEGRAM_RATE_LIMIT", "30"))
+    QUERY_SLOW_LATENCY_SECONDS = float(os.getenv("QUERY_SLOW_LATENCY_SECONDS", "35"))
+    QUERY_MAX_BACKOFF = float(os.getenv("QUERY_MAX_BACKOFF", "8"))
+
+    # Выбор запросов сессии по отдаче шаблонов за столько дней истории
+    QUERY_PLANNER_HISTORY_DAYS = int(os.getenv("QUERY_PLANNER_HISTORY_DAYS", "30"))
+    # Telegram: сообщений в секунду на бота и в минуту на один канал/группу
+    TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", "30"))
+    TELEGRAM_CHAT_MESSAGES_PER_MINUTE = float(os.getenv("TELEGRAM_CHAT_MESSAGES_PER_MINUTE", "20"))
+
+    # Кэш запросов: порог сходства формулировок (0-1) и срок свежести ответа.
+    # Запросы "за сегодня" устаревают в полночь, "прямо сейчас" - через NOW_TTL
+    QUERY_SIMILARITY_THRESHOLD = float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0.95"))
+    QUERY_CACHE_MAX_AGE_HOURS = int(os.getenv("QUERY_CACHE_MAX_AGE_HOURS", "12"))
+    QUERY_CACHE_NOW_TTL_HOURS = int(os.getenv("QUERY_CACHE_NOW_TTL_HOURS", "3"))
+    QUERY_CACHE_MEMORY_ENTRIES = int(os.getenv("QUERY_CACHE_MEMORY_ENTRIES", "256"))
+    QUERY_CACHE_EVICTION_INTERVAL = int(os.getenv("QUERY_CACHE_EVICTION_INTERVAL", "900"))
+
+    # Общий уровень кэша на Redis-совместимом сервере (пусто - отключен)
+    REDIS_URL = os.getenv("REDIS_URL", "")
+
+    # Поиск дубликатов перед публикацией: окно в часах и порог сходства (0-1)
+    DUPLICATE_WINDOW_HOURS = int(os.getenv("DUPLICATE_WINDOW_HOURS", "24"))
+    DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", "0.5"))
+
+    # Посты в статусе ready не старше стольких часов ставятся в очередь при запуске
+    OUTBOX_RECOVERY_HOURS = int(os.getenv("OUTBOX_RECOVERY_HOURS", "24"))
+
+    # Дайджест: посты, попавшие в канал за окно, уходят одним сообщением
+    TELEGRAM_DIGEST_ENABLED = os.getenv("TELEGRAM_DIGEST_ENABLED", "false").lower() == "true"
+    TELEGRAM_DIGEST_WINDOW_SECONDS = int(os.getenv("TELEGRAM_DIGEST_WINDOW_SECONDS", "600"))
 
     # Мониторинг
     HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "300"))
     METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "30"))
 
+    # HTTP-эндпоинты /metrics (Prometheus) и /health (healthcheck контейнера)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+    HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8081"))
+
+    # Трассы постов: отрезки стадий в JSON lines (OTLP/JSON), команда traces
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+
     # =============================================================================
     # ПУТИ И ЛОГИРОВАНИЕ
     # =============================================================================
@@ -135,6 +192,11 @@ class Config:
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE = os.getenv("LOG_FILE", "logs/perplexity_news.log")
 
+    # Ротация лога: по размеру (МБ) и по времени (when для TimedRotatingFileHandler)
+    MAX_LOG_FILE_SIZE = int(os.getenv("MAX_LOG_FILE_SIZE", "100"))
+    LOG_ROTATION_WHEN = os.getenv("LOG_ROTATION_WHEN", "midnight")
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+
     # Резервное копирование
     AUTO_BACKUP_ENABLED = os.getenv("AUTO_BACKUP_ENABLED", "true").lower() == "true"
     BACKUP_INTERVAL_HOURS = int(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
@@ -362,6 +424,14 @@ class Config:
             "max_hashtags": 5,
             "min_hashtags": 2,
             "max_length": 20
+        },
+
+        # Режим дайджеста (TELEGRAM_DIGEST_ENABLED)
+        "digest": {
+            "header": "🗞 **Дайджест новостей** · {date}",
+            "separator": "\n\n➖➖➖\n\n",
+            "footer": "#технологии #новости #дайджест",
+            "max_message_length": 4096
         }
     }
 
@@ -459,6 +529,16 @@ class Config:
         if cls.MIN_IMPORTANCE_TO_PUBLISH < 1 or cls.MIN_IMPORTANCE_TO_PUBLISH > 10:
             errors.append(f"Неверное значение MIN_IMPORTANCE_TO_PUBLISH: {cls.MIN_IMPORTANCE_TO_PUBLISH}")
 
+        # Ниже 0.9 SimHash сводит разные темы одной сессии (см. query_cache.py)
+        if not 0.9 <= cls.QUERY_SIMILARITY_THRESHOLD <= 1.0:
+            errors.append(f"Неверное значение QUERY_SIMILARITY_THRESHOLD: {cls.QUERY_SIMILARITY_THRESHOLD}")
+
+        if not 0.1 <= cls.DUPLICATE_SIMILARITY_THRESHOLD <= 1.0:
+            errors.append(f"Неверное значение DUPLICATE_SIMILARITY_THRESHOLD: {cls.DUPLICATE_SIMILARITY_THRESHOLD}")
+
+        if cls.DRIVER_POOL_SIZE < 1 or cls.DRIVER_POOL_SIZE > 8:
+            errors.append(f"Неверное значение DRIVER_POOL_SIZE: {cls.DRIVER_POOL_SIZE}")
+
         # Проверка временных параметров сессий
         import re
         time_pattern = re.compile(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')
@@ -537,10 +617,17 @@ class Config:
                 name: {"id": channel_id, "enabled": bool(channel_id)}
                 for name, channel_id in cls.TELEGRAM_CHANNELS.items()
             },
-            "browser": cls.BROWSER_CONFIG,
+            "browser": {
+                **cls.BROWSER_CONFIG,
+                "driver_pool_size": cls.DRIVER_POOL_SIZE
+            },
             "performance": {
                 "max_retry_attempts": cls.MAX_RETRY_ATTEMPTS,
                 "query_delay": cls.QUERY_DELAY_SECONDS,
+                "query_similarity_threshold": cls.QUERY_SIMILARITY_THRESHOLD,
+                "query_cache_max_age_hours": cls.QUERY_CACHE_MAX_AGE_HOURS,
+                "duplicate_window_hours": cls.DUPLICATE_WINDOW_HOURS,
+                "duplicate_similarity_threshold": cls.DUPLICATE_SIMILARITY_THRESHOLD,
                 "health_check_interval": cls.HEALTH_CHECK_INTERVAL
             }
         }
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Database Module for Perplexity Pro News Automation System
+=========================================================
+
+Работа с SQLite в режиме WAL. Все записи проходят через один фоновый
+поток-писатель, который группирует операторы в общие транзакции, а чтение
+выполняется на отдельных соединениях в пуле потоков. Ни одна операция
+с БД не выполняется в потоке event loop.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from metrics import DB_COMMIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Настройки соединения: WAL позволяет читать параллельно с записью,
+# synchronous=NORMAL в WAL безопасен при сбое процесса
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON"
+]
+
+SCHEMA = [
+    # Таблица для отслеживания запросов
+    """
+    CREATE TABLE IF NOT EXISTS perplexity_queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        query TEXT NOT NULL,
+        response TEXT,
+        tokens_estimated INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        success BOOLEAN DEFAULT FALSE,
+        query_hash TEXT UNIQUE,
+        answer_latency_ms INTEGER
+    )
+    """,
+
+    # Таблица для постов
+    """
+    CREATE TABLE IF NOT EXISTS news_posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        summary TEXT,
+        category TEXT,
+        importance INTEGER,
+        keywords TEXT,
+        sources TEXT,
+        telegram_channels TEXT,
+        telegram_message_ids TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        published_at DATETIME,
+        status TEXT DEFAULT 'pending'
+    )
+    """,
+
+    # Таблица для статистики
+    """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        date TEXT PRIMARY KEY,
+        queries_used INTEGER,
+        posts_created INTEGER,
+        posts_published INTEGER,
+        telegram_messages_sent INTEGER,
+        errors_count INTEGER
+    )
+    """
+]
+
+# Миграции существующих баз: (версия, описание, операторы).
+# Примененная версия хранится в PRAGMA user_version
+MIGRATIONS = [
+    (1, "время от отправки запроса до готового ответа", [
+        "ALTER TABLE perplexity_queries ADD COLUMN answer_latency_ms INTEGER"
+    ]),
+    (2, "индексы постов по статусу, дате, категории и важности", [
+        "CREATE INDEX IF NOT EXISTS idx_news_posts_status_created ON news_posts(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_news_posts_created_at ON news_posts(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_news_posts_category_importance ON news_posts(category, importance)",
+        "CREATE INDEX IF NOT EXISTS idx_news_posts_importance ON news_posts(importance)"
+    ]),
+    (3, "связь поста с ответом Perplexity", [
+        "ALTER TABLE news_posts ADD COLUMN query_id INTEGER REFERENCES perplexity_queries(id)",
+        "CREATE INDEX IF NOT EXISTS idx_news_posts_query_id ON news_posts(query_id)"
+    ]),
+    (4, "очередь доставки в Telegram", [
+        """
+        CREATE TABLE IF NOT EXISTS telegram_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL REFERENCES news_posts(id),
+            channel_key TEXT NOT NULL,
+            chat_id TEXT NOT NULL,
+            message TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            sent_at DATETIME,
+            message_id INTEGER,
+            last_error TEXT,
+            UNIQUE (post_id, channel_key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_telegram_outbox_due ON telegram_outbox(status, next_attempt_at)"
+    ]),
+    (5, "нормализованный запрос, SimHash и срок свежести ответа для кэша запросов", [
+        "ALTER TABLE perplexity_queries ADD COLUMN normalized_query TEXT",
+        "ALTER TABLE perplexity_queries ADD COLUMN simhash INTEGER",
+        "ALTER TABLE perplexity_queries ADD COLUMN expires_at DATETIME",
+        # Индекс для периодической очистки устаревших ответов
+        "CREATE INDEX IF NOT EXISTS idx_perplexity_queries_expires_at ON perplexity_queries(expires_at)",
+        # Ответы, сохраненные до появления срока свежести, из кэша не отдаются
+        "UPDATE perplexity_queries SET expires_at = timestamp WHERE expires_at IS NULL"
+    ])
+]
+
+# Сводка для команды status: посты за сегодня (локальное время) и очередь доставки
+STATUS_QUERIES = {
+    'posts': """
+        SELECT status, COUNT(*) FROM news_posts
+        WHERE created_at >= datetime('now', 'localtime', 'start of day', 'utc')
+        GROUP BY status
+    """,
+    'outbox': """
+        SELECT status, COUNT(*) FROM telegram_outbox
+        WHERE status IN ('pending', 'sending', 'uncertain') GROUP BY status
+    """
+}
+
+# Сохранение ответа Perplexity. Прежний ответ на тот же запрос не заменяется
+# (на него могут ссылаться посты), а освобождает query_hash и остается архивом
+STORE_ANSWER_STATEMENTS = [
+    "UPDATE perplexity_queries SET query_hash = NULL WHERE query_hash = ?",
+    """
+    INSERT INTO perplexity_queries
+    (query, response, query_hash, success, answer_latency_ms, normalized_query, simhash, expires_at)
+    VALUES (?, ?, ?, TRUE, ?, ?, ?, ?)
+    """
+]
+
+# Вставка поста; query_id передается явно или находится по хэшу запроса
+INSERT_POST_SQL = """
+    INSERT INTO news_posts
+    (title, summary, category, importance, keywords, sources, telegram_channels, status, query_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?,
+            COALESCE(?, (SELECT id FROM perplexity_queries WHERE query_hash = ?)))
+"""
+
+def _column_exists_error(error: sqlite3.OperationalError) -> bool:
+    # Колонка уже есть в базе, созданной по актуальной схеме
+    return 'duplicate column name' in str(error)
+
+@dataclass
+class WriteRequest:
+    """Оператор (или группа операторов) на запись"""
+    statements: List[Tuple[str, Sequence[Any]]]
+    future: Future = field(default_factory=Future)
+
+def read_status_snapshot(db_path: str, day: date) -> Dict[str, Any]:
+    """Дневная статистика, посты и очередь доставки напрямую из файла БД.
+
+    Соединение только для чтения, без потока-писателя, пула читателей и
+    миграций: так команда status не мешает работающей системе и быстро
+    завершается. Отсутствующие БД или таблицы дают пустые значения.
+    """
+    snapshot: Dict[str, Any] = {'daily': None, 'posts': {}, 'outbox': {}}
+    path = Path(db_path)
+    if not path.exists():
+        return snapshot
+
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        conn.execute("PRAGMA busy_timeout=5000")
+        try:
+            row = conn.execute("""
+                SELECT queries_used, posts_created, posts_published, errors_count
+                FROM daily_stats WHERE date = ?
+            """, (day.isoformat(),)).fetchone()
+            if row is not None:
+                snapshot['daily'] = dict(zip(['queries_used', 'posts_created', 'posts_published', 'errors_count'], row))
+        except sqlite3.OperationalError:
+            pass
+
+        for key, sql in STATUS_QUERIES.items():
+            try:
+                snapshot[key] = dict(conn.execute(sql).fetchall())
+            except sqlite3.OperationalError:
+                pass
+    finally:
+        conn.close()
+
+    return snapshot
+
+class DatabaseWriter(threading.Thread):
+    """Единственный поток-писатель: группирует записи в транзакции.
+
+    Ошибка транзакции (BEGIN, COMMIT, диск заполнен, блокировка дольше
+    busy_timeout) завершает ошибкой запросы своей пачки, поток продолжает
+    работу. Если поток все же остановился (не удалось открыть соединение),
+    новые запросы сразу завершаются ошибкой, а не ждут вечно.
+    """
+
+    def __init__(self, connect, batch_size: int = 200, batch_wait: float = 0.02):
+        super().__init__(name="db-writer", daemon=True)
+        self.connect = connect
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.requests: 'queue.Queue[Optional[WriteRequest]]' = queue.Queue()
+
+        self.commits = 0
+        self.statements = 0
+        self.commit_seconds = 0.0
+        self.failed_batches = 0
+        self.error: Optional[BaseException] = None
+
+    def submit(self, statements: List[Tuple[str, Sequence[Any]]]) -> Future:
+        request = WriteRequest(statements)
+        if self.error is not None:
+            request.future.set_exception(RuntimeError(f"Поток записи в БД остановлен: {self.error}"))
+            return request.future
+        self.requests.put(request)
+        if self.error is not None:
+            # Поток остановился между проверкой и постановкой в очередь
+            self._fail_pending()
+        return request.future
+
+    def stop(self):
+        self.requests.put(None)
+        self.join()
+
+    def _collect_batch(self, first: WriteRequest) -> Tuple[List[WriteRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self.requests.get(timeout=max(timeout, 0)) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+
+        return batch, False
+
+    def _fail_pending(self):
+        """Ошибка для всех запросов, оставшихся в очереди остановленного потока"""
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and not request.future.done():
+                request.future.set_exception(RuntimeError(f"Поток записи в БД остановлен: {self.error}"))
+
+    def _execute_batch(self, conn: sqlite3.Connection, batch: List[WriteRequest]) -> List[Tuple]:
+        results = []
+
+        conn.execute("BEGIN")
+        for request in batch:
+            # Точка сохранения: ошибка одного запроса не откатывает остальные
+            conn.execute("SAVEPOINT request")
+            try:
+                cursor = None
+                for sql, params in request.statements:
+                    cursor = conn.execute(sql, params)
+                conn.execute("RELEASE request")
+                results.append((request, (cursor.lastrowid, cursor.rowcount), None))
+            except sqlite3.OperationalError as e:
+                # Ошибка уровня транзакции (диск, блокировка) - откатывается вся пачка
+                if not conn.in_transaction:
+                    raise
+                conn.execute("ROLLBACK TO request")
+                conn.execute("RELEASE request")
+                results.append((request, None, e))
+            except Exception as e:
+                conn.execute("ROLLBACK TO request")
+                conn.execute("RELEASE request")
+                results.append((request, None, e))
+
+        conn.execute("COMMIT")
+        return results
+
+    def run(self):
+        try:
+            conn = self.connect()
+            conn.isolation_level = None  # транзакциями управляем вручную
+        except Exception as e:
+            logger.error("❌ Поток записи в БД не запущен: %s", e)
+            self.error = e
+            self._fail_pending()
+            return
+
+        stopping = False
+        while not stopping:
+            first = self.requests.get()
+            if first is None:
+                break
+
+            batch, stopping = self._collect_batch(first)
+            started = time.perf_counter()
+
+            try:
+                results = self._execute_batch(conn, batch)
+            except Exception as e:
+                logger.error("❌ Ошибка транзакции записи в БД (%d запросов): %s", len(batch), e)
+                self.failed_batches += 1
+                try:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                except Exception as rollback_error:
+                    logger.error("❌ Ошибка отката транзакции: %s", rollback_error)
+                results = [(request, None, e) for request in batch]
+
+            elapsed = time.perf_counter() - started
+            self.commits += 1
+            self.statements += sum(len(request.statements) for request in batch)
+            self.commit_seconds += elapsed
+            DB_COMMIT_SECONDS.observe(elapsed)
+
+            for request, result, error in results:
+                if error is not None:
+                    request.future.set_exception(error)
+                else:
+                    request.future.set_result(result)
+
+        conn.close()
+
+class DatabaseManager:
+    """Доступ к БД: фоновый писатель и пул читателей"""
+
+    def __init__(self, db_path: str, reader_threads: int = 2):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.create_schema()
+
+        self.writer = DatabaseWriter(self.connect)
+        self.writer.start()
+
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix="db-reader")
+
+    def connect(self) -> sqlite3.Connection:
+        """Новое соединение с настройками WAL"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def create_schema(self):
+        """Создание таблиц и миграция (выполняется синхронно при запуске)"""
+        conn = self.connect()
+        try:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+
+            self.migrate(conn)
+        finally:
+            conn.close()
+
+    def migrate(self, conn: sqlite3.Connection):
+        """Применение миграций, которых еще нет в базе"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        for target, description, statements in MIGRATIONS:
+            if target <= version:
+                continue
+
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError as e:
+                    if not _column_exists_error(e):
+                        raise
+
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+            logger.info(f"🗄️ Миграция БД {target}: {description}")
+
+    # -------------------------------------------------------------------------
+    # Запись
+    # -------------------------------------------------------------------------
+
+    def submit(self, sql: str, params: Sequence[Any] = ()) -> Future:
+        """Постановка записи в очередь без ожидания (fire-and-forget)"""
+        return self.writer.submit([(sql, params)])
+
+    async def write(self, sql: str, params: Sequence[Any] = ()) -> Tuple[int, int]:
+        """Запись через фоновый поток; возвращает (lastrowid, rowcount)"""
+        return await asyncio.wrap_future(self.writer.submit([(sql, params)]))
+
+    def submit_answer(self, query: str, response: str, query_hash: str, answer_latency_ms: int,
+                      normalized_query: str, simhash: int, expires_at: str) -> Future:
+        """Постановка ответа Perplexity в очередь записи; результат - (id строки, rowcount)"""
+        release, insert = STORE_ANSWER_STATEMENTS
+        return self.writer.submit([
+            (release, (query_hash,)),
+            (insert, (query, response, query_hash, answer_latency_ms, normalized_query, simhash, expires_at))
+        ])
+
+    async def write_many(self, statements: List[Tuple[str, Sequence[Any]]]) -> Tuple[int, int]:
+        """Несколько операторов, применяемых атомарно"""
+        return await asyncio.wrap_future(self.writer.submit(statements))
+
+    # -------------------------------------------------------------------------
+    # Чтение
+    # -------------------------------------------------------------------------
+
+    def reader(self) -> sqlite3.Connection:
+        """Соединение для чтения, отдельное для каждого потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        return conn
+
+    def _fetch(self, sql: str, params: Sequence[Any], one: bool):
+        cursor = self.reader().execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+    async def fetch_one(self, sql: str, params: Sequence[Any] = ()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._fetch, sql, params, True)
+
+    async def fetch_all(self, sql: str, params: Sequence[Any] = ()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._fetch, sql, params, False)
+
+    # -------------------------------------------------------------------------
+    # Операции системы
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def post_params(post, status: str, query_hash: Optional[str] = None) -> Tuple:
+        """Параметры INSERT_POST_SQL для поста"""
+        return (
+            post.title,
+            post.summary,
+            post.category,
+            post.importance,
+            json.dumps(post.keywords),
+            json.dumps(post.sources),
+            json.dumps(post.telegram_channels),
+            status,
+            getattr(post, 'query_id', None),
+            query_hash
+        )
+
+    async def save_news_post(self, post, query_hash: Optional[str] = None) -> int:
+        """Сохранение поста со статусом ready; возвращает id строки.
+
+        query_hash связывает пост с ответом, записанным в той же очереди.
+        """
+        row_id, _ = await self.write(INSERT_POST_SQL, self.post_params(post, 'ready', query_hash))
+        return row_id
+
+    async def update_post_status(self, post_id: int, status: str):
+        """Обновление статуса поста по id"""
+        await self.write("UPDATE news_posts SET status = ? WHERE id = ?", (status, post_id))
+
+    async def fetch_posts(self, where: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Посты news_posts по условию (поля NewsPost и статус)"""
+        rows = await self.fetch_all(f"""
+            SELECT id, title, summary, category, importance, keywords, sources,
+                   telegram_channels, created_at, status, query_id
+            FROM news_posts WHERE {where}
+            ORDER BY id
+        """, params)
+
+        posts = []
+        for row in rows:
+            post = dict(zip(['id', 'title', 'summary', 'category', 'importance', 'keywords', 'sources',
+                             'telegram_channels', 'created_at', 'status', 'query_id'], row))
+            for key in ('keywords', 'sources', 'telegram_channels'):
+                post[key] = json.loads(post[key]) if post[key] else []
+            posts.append(post)
+        return posts
+
+    async def get_daily_stats(self, day: date) -> Optional[Dict[str, Any]]:
+        """Дневная статистика"""
+        row = await self.fetch_one("""
+            SELECT date, queries_used, posts_created, posts_published,
+                   telegram_messages_sent, errors_count
+            FROM daily_stats WHERE date = ?
+        """, (day.isoformat(),))
+
+        if row is None:
+            return None
+
+        keys = ['date', 'queries_used', 'posts_created', 'posts_published',
+                'telegram_messages_sent', 'errors_count']
+        return dict(zip(keys, row))
+
+    async def update_daily_stats(self, stats_data: Dict[str, Any]):
+        """Сохранение дневной статистики (значения - итоги за день)"""
+        await self.write("""
+            INSERT OR REPLACE INTO daily_stats
+            (date, queries_used, posts_created, posts_published, errors_count)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            stats_data['date'],
+            stats_data['queries_used'],
+            stats_data['posts_created'],
+            stats_data['posts_published'],
+            stats_data['errors_count']
+        ))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика фонового писателя"""
+        commits = self.writer.commits
+        return {
+            'commits': commits,
+            'statements': self.writer.statements,
+            'statements_per_commit': round(self.writer.statements / commits, 2) if commits else 0.0,
+            'avg_commit_ms': round(self.writer.commit_seconds / commits * 1000, 2) if commits else 0.0,
+            'write_queue': self.writer.requests.qsize(),
+            'failed_batches': self.writer.failed_batches
+        }
+
+    def close(self):
+        """Сброс очереди записи и закрытие соединений"""
+        self.writer.stop()
+        self._readers.shutdown(wait=True)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Duplicate Story Index for Perplexity Pro News Automation System
+===============================================================
+
+Поиск почти одинаковых новостей перед публикацией. Разные запросы одной
+сессии часто возвращают одну и ту же историю; такой пост помечается как
+'duplicate' и не отправляется в канал повторно.
+
+Текст поста (заголовок и краткое содержание) превращается в набор
+основ слов. Пересказ одной истории другими словами сохраняет большую часть
+основ, а пары соседних слов меняются почти полностью. По основам строится MinHash-
+подпись (one permutation hashing: одно хэширование шингла и минимум по
+корзине, пустые корзины заполняются соседними), а LSH-индекс по полосам
+подписи дает кандидатов за несколько обращений к словарям.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Размер подписи и разбиение на полосы: порог срабатывания LSH ~ (1/b)^(1/r) = 0.5
+SIGNATURE_SIZE = 64
+BANDS = 16
+ROWS_PER_BAND = SIGNATURE_SIZE // BANDS
+
+# Основа слова: первые символы (грубо, но устойчиво к русским окончаниям)
+STEM_LENGTH = 5
+
+WORD = re.compile(r'\w+')
+EMPTY_SLOT = (1 << 64) - 1
+
+def shingles(text: str) -> Set[str]:
+    """Основы слов текста (однобуквенные слова пропускаются)"""
+    return {word[:STEM_LENGTH] for word in WORD.findall(text.lower()) if len(word) > 1}
+
+def minhash(features: Iterable[str]) -> Tuple[int, ...]:
+    """MinHash-подпись с одним хэшированием на шингл"""
+    slots = [EMPTY_SLOT] * SIGNATURE_SIZE
+
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+        slot = h % SIGNATURE_SIZE
+        value = h // SIGNATURE_SIZE
+        if value < slots[slot]:
+            slots[slot] = value
+
+    # Уплотнение: пустая корзина берет значение ближайшей непустой справа
+    if EMPTY_SLOT in slots and any(value != EMPTY_SLOT for value in slots):
+        for i in range(SIGNATURE_SIZE):
+            offset = 1
+            while slots[i] == EMPTY_SLOT:
+                candidate = slots[(i + offset) % SIGNATURE_SIZE]
+                if candidate != EMPTY_SLOT:
+                    # Смещение делает заимствованное значение отличимым от исходного
+                    slots[i] = candidate + offset
+                offset += 1
+
+    return tuple(slots)
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Оценка сходства Жаккара по доле совпавших позиций подписи"""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_SIZE
+
+@dataclass
+class IndexedPost:
+    """Пост в окне поиска дубликатов"""
+    post_id: Optional[int]
+    title: str
+    channels: FrozenSet[str]
+    signature: Tuple[int, ...]
+    added_at: float
+
+@dataclass
+class DuplicateMatch:
+    """Найденный ранее опубликованный пост"""
+    post_id: Optional[int]
+    title: str
+    similarity: float
+
+class DuplicateIndex:
+    """Инкрементальный MinHash/LSH-индекс недавних постов"""
+
+    def __init__(self, window_hours: float, threshold: float):
+        self.window_seconds = window_hours * 3600
+        self.threshold = threshold
+
+        self.posts: Deque[IndexedPost] = deque()  # в порядке добавления
+        self.buckets: List[Dict[Tuple[int, ...], List[IndexedPost]]] = [defaultdict(list) for _ in range(BANDS)]
+
+        self.checks = 0
+        self.duplicates = 0
+        self.check_seconds = 0.0
+
+    @staticmethod
+    def _text(title: str, summary: str) -> str:
+        return f"{title}\n{summary}"
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        return [signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND] for i in range(BANDS)]
+
+    def load(self, conn):
+        """Заполнение окна опубликованными постами из БД (при запуске)"""
+        rows = conn.execute("""
+            SELECT id, title, summary, telegram_channels, strftime('%s', created_at)
+            FROM news_posts
+            WHERE status = 'published' AND created_at >= datetime('now', ?)
+            ORDER BY created_at
+        """, (f"-{int(self.window_seconds)} seconds",)).fetchall()
+
+        now_wall, now_mono = time.time(), time.monotonic()
+        for post_id, title, summary, channels, created_at in rows:
+            # Возраст поста переводим в шкалу monotonic
+            added_at = now_mono - max(0.0, now_wall - float(created_at or now_wall))
+            self._add(post_id, title, summary or '', _parse_channels(channels), added_at)
+
+        logger.info(f"🧬 Индекс дубликатов загружен: {len(self.posts)} постов за {self.window_seconds / 3600:g} ч")
+
+    def _add(self, post_id: Optional[int], title: str, summary: str,
+             channels: Iterable[str], added_at: float, signature: Optional[Tuple[int, ...]] = None):
+        entry = IndexedPost(post_id, title, frozenset(channels),
+                            signature or minhash(shingles(self._text(title, summary))), added_at)
+        self.posts.append(entry)
+        for i, band in enumerate(self._bands(entry.signature)):
+            self.buckets[i][band].append(entry)
+
+    def _expire(self, now: float):
+        while self.posts and now - self.posts[0].added_at > self.window_seconds:
+            entry = self.posts.popleft()
+            for i, band in enumerate(self._bands(entry.signature)):
+                bucket = self.buckets[i].get(band)
+                if bucket:
+                    bucket.remove(entry)
+                    if not bucket:
+                        del self.buckets[i][band]
+
+    def check_and_add(self, post) -> Optional[DuplicateMatch]:
+        """Проверка поста перед публикацией.
+
+        Дубликат - похожий пост за окно, отправленный хотя бы в один из тех же
+        каналов. Уникальный пост сразу добавляется в индекс, чтобы параллельная
+        публикация той же истории тоже была распознана; если доставка не
+        удалась, вызывающий убирает его через discard().
+        """
+        started = time.perf_counter()
+        now = time.monotonic()
+        self._expire(now)
+
+        signature = minhash(shingles(self._text(post.title, post.summary)))
+        channels = frozenset(post.telegram_channels)
+
+        best: Optional[DuplicateMatch] = None
+        seen = set()
+        for i, band in enumerate(self._bands(signature)):
+            for entry in self.buckets[i].get(band, ()):
+                if id(entry) in seen or not entry.channels & channels:
+                    continue
+                seen.add(id(entry))
+
+                score = similarity(signature, entry.signature)
+                if score >= self.threshold and (best is None or score > best.similarity):
+                    best = DuplicateMatch(entry.post_id, entry.title, score)
+
+        if best is None:
+            self._add(post.id, post.title, post.summary, channels, now, signature)
+        else:
+            self.duplicates += 1
+
+        self.checks += 1
+        self.check_seconds += time.perf_counter() - started
+        return best
+
+    def discard(self, post_id: Optional[int]) -> bool:
+        """Удаление поста из окна (публикация не состоялась)"""
+        entry = next((entry for entry in self.posts if post_id is not None and entry.post_id == post_id), None)
+        if entry is None:
+            return False
+
+        self.posts.remove(entry)
+        for i, band in enumerate(self._bands(entry.signature)):
+            bucket = self.buckets[i].get(band)
+            if bucket and entry in bucket:
+                bucket.remove(entry)
+                if not bucket:
+                    del self.buckets[i][band]
+        return True
+
+    def get_stats(self) -> Dict:
+        """Размер окна и время проверки"""
+        return {
+            'indexed': len(self.posts),
+            'checks': self.checks,
+            'duplicates': self.duplicates,
+            'avg_check_ms': round(self.check_seconds / self.checks * 1000, 3) if self.checks else 0.0,
+            'window_hours': self.window_seconds / 3600,
+            'threshold': self.threshold
+        }
+
+def _parse_channels(value) -> List[str]:
+    try:
+        return json.loads(value) if value else []
+    except ValueError:
+        return []
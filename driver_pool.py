@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Driver Pool for Perplexity Pro News Automation System
+=====================================================
+
+Пул Selenium WebDriver воркеров для параллельного выполнения запросов.
+Каждый воркер владеет собственным браузером Chrome (отдельный процесс)
+и однопоточным executor'ом: WebDriver не потокобезопасен, поэтому все
+обращения к конкретному драйверу выполняются в одном и том же потоке.
+
+Если запрос завершился ошибкой WebDriver (упавший Chrome, потерянная
+сессия), браузер воркера закрывается и создается заново до возвращения
+воркера в пул, чтобы следующие запросы не попадали в мертвую сессию.
+Истекшее ожидание элемента (TimeoutException) браузер не перезапускает.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from async_driver import AsyncWebDriver
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WorkerStats:
+    """Статистика работы воркера"""
+    queries: int = 0
+    errors: int = 0
+    restarts: int = 0
+    logins: int = 0
+    busy_seconds: float = 0.0
+    last_used: Optional[str] = None
+
+class DriverWorker:
+    """Воркер пула: браузер + выделенный поток для вызовов WebDriver"""
+
+    def __init__(self, worker_id: int, driver_factory: Callable[[int], Any]):
+        self.worker_id = worker_id
+        self.driver_factory = driver_factory
+        self.driver = None
+        self.browser: Optional[AsyncWebDriver] = None
+        self.session_active = False
+        self.busy = False
+        self.stats = WorkerStats()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix=f"webdriver-{worker_id}"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Выполнение блокирующего вызова в потоке воркера"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def ensure_driver(self):
+        """Ленивое создание браузера при первом использовании"""
+        if self.driver is None:
+            self.driver = await self.run(self.driver_factory, self.worker_id)
+            self.browser = AsyncWebDriver(self.driver, self.executor)
+            self.session_active = False
+        return self.browser
+
+    async def quit_driver(self):
+        """Закрытие браузера; поток воркера продолжает работать"""
+        if self.driver is not None:
+            try:
+                await self.browser.quit()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка закрытия браузера воркера {self.worker_id}: {e}")
+            self.driver = None
+            self.browser = None
+            self.session_active = False
+
+    async def restart(self):
+        """Новый браузер вместо упавшего; при ошибке запуска - повтор при следующей выдаче"""
+        self.stats.restarts += 1
+        await self.quit_driver()
+        try:
+            await self.ensure_driver()
+        except Exception as e:
+            logger.error(f"❌ Не удалось перезапустить браузер воркера {self.worker_id}: {e}")
+
+    async def close(self):
+        """Закрытие браузера и остановка потока воркера"""
+        await self.quit_driver()
+        self.executor.shutdown(wait=False)
+
+class DriverPool:
+    """Пул авторизованных браузеров Perplexity"""
+
+    def __init__(self, size: int, driver_factory: Callable[[int], Any]):
+        self.size = max(1, size)
+        self.workers: List[DriverWorker] = [
+            DriverWorker(worker_id, driver_factory) for worker_id in range(self.size)
+        ]
+        self._idle: Optional[asyncio.Queue] = None
+
+    def _get_idle_queue(self) -> asyncio.Queue:
+        # Очередь создается внутри работающего event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for worker in self.workers:
+                self._idle.put_nowait(worker)
+        return self._idle
+
+    @asynccontextmanager
+    async def checkout(self):
+        """Получение свободного воркера на время выполнения запроса"""
+        idle = self._get_idle_queue()
+        worker = await idle.get()
+        worker.busy = True
+        started = time.monotonic()
+
+        try:
+            await worker.ensure_driver()
+            yield worker
+        except WebDriverException as e:
+            worker.stats.errors += 1
+            if not isinstance(e, TimeoutException):
+                logger.warning(f"⚠️ Ошибка WebDriver воркера {worker.worker_id}, перезапуск браузера: {e.msg}")
+                await worker.restart()
+            raise
+        except Exception:
+            worker.stats.errors += 1
+            raise
+        finally:
+            worker.busy = False
+            worker.stats.busy_seconds += time.monotonic() - started
+            worker.stats.last_used = time.strftime('%Y-%m-%d %H:%M:%S')
+            idle.put_nowait(worker)
+
+    @property
+    def session_active(self) -> bool:
+        """Есть ли хотя бы один авторизованный воркер"""
+        return any(worker.session_active for worker in self.workers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер пула и статистика по воркерам"""
+        return {
+            'size': self.size,
+            'busy': sum(1 for worker in self.workers if worker.busy),
+            'workers': [
+                {
+                    'worker_id': worker.worker_id,
+                    'browser_started': worker.driver is not None,
+                    'session_active': worker.session_active,
+                    'busy': worker.busy,
+                    **asdict(worker.stats)
+                }
+                for worker in self.workers
+            ]
+        }
+
+    async def close(self):
+        """Закрытие всех браузеров пула"""
+        await asyncio.gather(*(worker.close() for worker in self.workers))
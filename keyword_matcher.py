@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher for Perplexity Pro News Automation System
+=========================================================
+
+Поиск всех ключевых слов категорий и индикаторов важности за один проход
+по тексту ответа. Словарь терминов один раз компилируется в хэш-таблицы
+по словам: текст разбивается на слова одним вызовом re (в C), а каждое
+уникальное слово проверяется несколькими обращениями к словарям, независимо
+от числа терминов.
+
+Правила сопоставления:
+
+* короткие термины и аббревиатуры (AI, ИИ, GPT) - только целое слово;
+* латинские слова - целое слово с окончанием множественного числа (robot/robots);
+* русские слова - по основе, чтобы учитывать падежи (робот/роботов);
+* в словосочетаниях первые слова совпадают точно, правило окончания
+  применяется к последнему слову.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from config import Config
+
+# Термины для списка ключевых слов поста (хештегов)
+TECH_TERMS = [
+    'AI', 'ИИ', 'машинное обучение', 'neural networks', 'blockchain',
+    'cloud', 'облако', 'automation', 'robotics', 'IoT', 'API',
+    'стартап', 'startup', 'инвестиции', 'funding'
+]
+
+# Признаки промышленной автоматизации в новостях о роботах
+AUTOMATION_MARKERS = ['промышленный', 'промышленность', 'industrial', 'manufacturing']
+
+# Категория, если ни один термин не найден
+DEFAULT_CATEGORY = 'it'
+
+# Базовая важность поста до учета индикаторов
+BASE_IMPORTANCE = 5
+
+# Группа индикаторов дает полный вес, если найдено столько разных ее терминов;
+# каждая следующая по вкладу группа учитывается с этим множителем
+FULL_EVIDENCE_TERMS = 3
+GROUP_DECAY = 0.5
+
+WORD = re.compile(r'\w+')
+RUSSIAN_ENDING = re.compile(r'[аеиоуыэюяйь]{1,2}$')
+CYRILLIC = re.compile(r'[а-яё]')
+
+# Правила окончания последнего слова термина
+WORD_END = 'word'      # только целое слово
+PLURAL_END = 'plural'  # целое слово или с окончанием s/es
+STEM_END = 'stem'      # слово начинается с основы
+
+# Длина префикса, по которому ищутся основы
+STEM_PREFIX = 4
+
+@dataclass
+class MatchResult:
+    """Результат одного прохода по тексту"""
+    categories: Dict[str, float] = field(default_factory=dict)
+    importance_groups: Dict[str, int] = field(default_factory=dict)
+    importance_terms: Dict[str, int] = field(default_factory=dict)
+    terms: List[str] = field(default_factory=list)
+    automation: bool = False
+
+    def category(self) -> str:
+        """Категория с наибольшим взвешенным счетом"""
+        if not self.categories:
+            return DEFAULT_CATEGORY
+
+        best = max(self.categories, key=self.categories.get)
+        if best == 'robotics' and self.automation:
+            return 'automation'
+        return best
+
+    def importance(self, base: int = BASE_IMPORTANCE) -> int:
+        """Важность 1-10 с убывающим вкладом групп индикаторов.
+
+        Вклад группы - ее вес, умноженный на долю найденных разных терминов
+        (полный при FULL_EVIDENCE_TERMS); группы складываются по убыванию
+        вклада, каждая следующая с множителем GROUP_DECAY. Одно общее слово
+        ("прогноз", "Google") почти не меняет оценку, а ответ, где есть
+        понемногу из всех групп, не получает сразу 10.
+        """
+        contributions = sorted((
+            weight * min(self.importance_terms.get(group, 1), FULL_EVIDENCE_TERMS) / FULL_EVIDENCE_TERMS
+            for group, weight in self.importance_groups.items()
+        ), reverse=True)
+        bonus = sum(contribution * GROUP_DECAY ** index for index, contribution in enumerate(contributions))
+        return min(max(base + int(bonus), 1), 10)
+
+def _match_rule(term: str) -> Tuple[Tuple[str, ...], str]:
+    """Слова термина (последнее - основа для STEM_END) и правило окончания"""
+    words = tuple(WORD.findall(term.lower()))
+    last_word = words[-1]
+
+    if len(last_word) <= 3 or term.isupper():
+        return words, WORD_END
+
+    if CYRILLIC.search(last_word):
+        # Основа: отбрасываем окончание, остаток слова допускается любой
+        if len(last_word) > 5:
+            words = words[:-1] + (RUSSIAN_ENDING.sub('', last_word),)
+        return words, STEM_END
+
+    return words, PLURAL_END
+
+class KeywordMatcher:
+    """Скомпилированный словарь категорий, индикаторов важности и терминов"""
+
+    def __init__(self, category_keywords: Dict[str, Dict], importance_indicators: Dict[str, Dict],
+                 tech_terms: Iterable[str] = TECH_TERMS,
+                 automation_markers: Iterable[str] = AUTOMATION_MARKERS):
+        # ключ термина -> [(вид, имя группы, вес, исходный термин)]
+        self.entries: Dict[Tuple[str, ...], List[Tuple[str, str, float, str]]] = defaultdict(list)
+
+        # Однословные термины: точная форма слова и основы по префиксу
+        self.words: Dict[str, List[Tuple[str, ...]]] = defaultdict(list)
+        self.stems: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = defaultdict(list)
+        # Словосочетания по первому слову: (остальные слова, правило, ключ)
+        self.phrases: Dict[str, List[Tuple[Tuple[str, ...], str, Tuple[str, ...]]]] = defaultdict(list)
+
+        def add(term: str, kind: str, group: str, weight: float):
+            key, rule = _match_rule(term)
+            if key not in self.entries:
+                self._compile(key, rule)
+            self.entries[key].append((kind, group, weight, term))
+
+        for category, spec in category_keywords.items():
+            for term in spec['keywords']:
+                add(term, 'category', category, spec.get('weight', 1.0))
+
+        for group, spec in importance_indicators.items():
+            for term in spec['keywords']:
+                add(term, 'importance', group, spec['score'])
+
+        for term in tech_terms:
+            add(term, 'term', term, 0)
+
+        for term in automation_markers:
+            add(term, 'automation', term, 0)
+
+        # Более длинные основы проверяются первыми
+        for candidates in self.stems.values():
+            candidates.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def _compile(self, key: Tuple[str, ...], rule: str):
+        if len(key) > 1:
+            self.phrases[key[0]].append((key[1:], rule, key))
+            return
+
+        word = key[0]
+        if rule == STEM_END:
+            self.stems[word[:STEM_PREFIX]].append((word, key))
+            return
+
+        self.words[word].append(key)
+        if rule == PLURAL_END:
+            self.words[word + 's'].append(key)
+            self.words[word + 'es'].append(key)
+
+    @staticmethod
+    def _word_matches(token: str, word: str, rule: str) -> bool:
+        if rule == STEM_END:
+            return token.startswith(word)
+        if rule == PLURAL_END:
+            return token in (word, word + 's', word + 'es')
+        return token == word
+
+    @classmethod
+    def from_config(cls) -> 'KeywordMatcher':
+        return cls(Config.CATEGORY_KEYWORDS, Config.IMPORTANCE_INDICATORS)
+
+    def _keys(self, tokens: List[str]) -> Iterable[Tuple[str, ...]]:
+        """Ключи терминов, найденных в последовательности слов"""
+        # Уникальные слова в порядке первого появления (dict.fromkeys работает в C);
+        # в ответах слова сильно повторяются, поэтому проверок намного меньше, чем слов
+        unique = dict.fromkeys(tokens)
+        words, stems = self.words, self.stems
+
+        for token in unique:
+            found = words.get(token)
+            if found:
+                yield from found
+
+            candidates = stems.get(token[:STEM_PREFIX])
+            if candidates:
+                for stem, key in candidates:
+                    if token.startswith(stem):
+                        yield key
+                        break
+
+        # Словосочетания проверяются только там, где встретилось их первое слово
+        for first in self.phrases.keys() & unique.keys():
+            position = -1
+            while True:
+                try:
+                    position = tokens.index(first, position + 1)
+                except ValueError:
+                    break
+                for rest, rule, key in self.phrases[first]:
+                    tail = tokens[position + 1:position + 1 + len(rest)]
+                    if (len(tail) == len(rest) and tail[:-1] == list(rest[:-1])
+                            and self._word_matches(tail[-1], rest[-1], rule)):
+                        yield key
+
+    def match(self, text: str, max_terms: int = 5) -> MatchResult:
+        """Счет категорий, групп важности и список терминов за один проход"""
+        result = MatchResult()
+        seen = set()
+
+        for key in self._keys(WORD.findall(text.lower())):
+            if key in seen:
+                continue  # каждый термин учитывается один раз
+            seen.add(key)
+
+            for kind, group, weight, term in self.entries[key]:
+                if kind == 'category':
+                    result.categories[group] = result.categories.get(group, 0.0) + weight
+                elif kind == 'importance':
+                    result.importance_groups[group] = weight
+                    result.importance_terms[group] = result.importance_terms.get(group, 0) + 1
+                elif kind == 'term' and len(result.terms) < max_terms:
+                    result.terms.append(term)
+                elif kind == 'automation':
+                    result.automation = True
+
+        return result
+
+@lru_cache(maxsize=1)
+def get_matcher() -> KeywordMatcher:
+    """Общий экземпляр, собранный из таблиц конфигурации"""
+    return KeywordMatcher.from_config()
+
+def route_channels(category: str, importance: int) -> List[str]:
+    """Целевые каналы для категории поста"""
+    # Если важность высокая, отправляем во все каналы
+    if importance >= 8:
+        return ["it_news", "automation", "robotics"]
+
+    if category == "automation":
+        return ["automation"]
+    if category == "robotics":
+        return ["robotics"]
+    if category == "ai":
+        return ["it_news", "automation"]
+    return ["it_news"]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Logging Setup for Perplexity Pro News Automation System
+=======================================================
+
+Логирование без дискового ввода-вывода в event loop: обработчики корневого
+логгера заменяются одним QueueHandler, а запись в файл и stdout выполняет
+QueueListener в фоновом потоке. В потоке вызова остается только сборка
+текста сообщения (`record.getMessage()`); время, уровень и формат строки
+подставляет поток слушателя.
+
+Файл лога ротируется по размеру (MAX_LOG_FILE_SIZE, МБ) и по времени
+(LOG_ROTATION_WHEN, по умолчанию в полночь), хранится LOG_BACKUP_COUNT
+архивов.
+
+На частых путях (каждый запрос, фрагмент ответа, отправка) сообщения
+пишутся в стиле `logger.info("... %s", value)`: при выключенном уровне
+аргументы не форматируются вовсе.
+"""
+
+import atexit
+import copy
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from pathlib import Path
+from typing import Dict, Optional
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """Ротация по времени и, дополнительно, по размеру файла"""
+
+    def __init__(self, filename: str, max_bytes: int = 0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if super().shouldRollover(record):
+            return 1
+        if self.max_bytes > 0 and self.stream is not None:
+            # Размер проверяется по позиции в файле: без stat() на каждую запись
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return 1
+        return 0
+
+    def rotation_filename(self, default_name: str) -> str:
+        # Несколько ротаций за интервал (по размеру) не должны перезаписывать друг друга
+        name = super().rotation_filename(default_name)
+        candidate, index = name, 1
+        while Path(candidate).exists():
+            candidate = f"{name}.{index}"
+            index += 1
+        return candidate
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке вызова"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются сразу: изменяемые объекты могут поменяться,
+        # пока запись ждет в очереди. Остальное форматирование - в потоке слушателя
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def setup_queued_logging(level: str = "INFO", log_file: Optional[str] = None,
+                         max_bytes: int = 0, when: str = "midnight", backup_count: int = 7,
+                         levels: Optional[Dict[str, int]] = None) -> QueueListener:
+    """Перенастройка корневого логгера на очередь с фоновым потоком записи.
+
+    Повторный вызов останавливает прежний поток и заменяет обработчики.
+    """
+    global _listener
+    shutdown_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(SizedTimedRotatingFileHandler(
+            log_file, max_bytes=max_bytes, when=when, backupCount=backup_count, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    for logger_name, logger_level in (levels or {}).items():
+        logging.getLogger(logger_name).setLevel(logger_level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """Запись оставшихся сообщений и остановка потока слушателя"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(shutdown_logging)
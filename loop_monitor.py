@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Event Loop Latency Monitor for Perplexity Pro News Automation System
+====================================================================
+
+Фоновая задача, которая измеряет задержку event loop: насколько позже
+запланированного просыпается asyncio.sleep. Если блокирующий вызов
+занимает loop, задержка растет пропорционально времени блокировки.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class LoopLatencyMonitor:
+    """Измерение задержки event loop"""
+
+    def __init__(self, interval: float = 0.5, window: int = 600, warn_threshold: float = 0.5):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запуск мониторинга в текущем event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """Остановка мониторинга"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag > self.warn_threshold:
+                logger.warning("🐢 Event loop заблокирован на %.0f мс", lag * 1000)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Сводка задержек в миллисекундах"""
+        if not self.samples:
+            return {'samples': 0, 'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+        return {
+            'samples': len(ordered),
+            'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+            'p95_ms': round(p95 * 1000, 2),
+            'max_ms': round(self.max_lag * 1000, 2)
+        }
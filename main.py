@@ -17,35 +17,23 @@ import os
 import signal
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List, Optional
 
-# Добавляем корневую директорию в путь
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from src.config import Config, load_config
-from src.automation import PerplexityAutomation
-from src.scheduler import NewsScheduler
-from src.telegram_publisher import TelegramPublisher
-from src.database import DatabaseManager
+# Здесь только легкие модули: selenium, python-telegram-bot и aiohttp
+# загружаются командами, которым они нужны (status и health без них)
+from config import Config, load_config
+from session_scheduler import SessionScheduler, next_occurrence
+from database import DatabaseManager, read_status_snapshot
+from loop_monitor import LoopLatencyMonitor
+from pipeline import Pipeline, Stage
+from metrics import DAILY_QUOTA_REMAINING, DB_WRITE_QUEUE, REGISTRY, MetricsServer
+import tracing
+from logging_setup import setup_queued_logging
 
 # Настройка логирования
 def setup_logging():
-    """Настройка системы логирования"""
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-
-    # Основной логгер
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL.upper()),
-        format=log_format,
-        handlers=[
-            logging.FileHandler(log_dir / "perplexity_news.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    """Настройка системы логирования: очередь и запись в фоновом потоке с ротацией"""
 
     # Отдельные логгеры для компонентов
     loggers = {
@@ -55,24 +43,55 @@ def setup_logging():
         'asyncio': logging.WARNING
     }
 
-    for logger_name, level in loggers.items():
-        logging.getLogger(logger_name).setLevel(level)
+    setup_queued_logging(
+        Config.LOG_LEVEL,
+        Config.LOG_FILE,
+        max_bytes=Config.MAX_LOG_FILE_SIZE * 1024 * 1024,
+        when=Config.LOG_ROTATION_WHEN,
+        backup_count=Config.LOG_BACKUP_COUNT,
+        levels=loggers
+    )
 
 class NewsAutomationSystem:
     """Главный класс системы автоматизации новостей"""
 
     def __init__(self):
+        from perplexity_main import PerplexityAutomation
+        from telegram_publisher import TelegramPublisher
+
         self.logger = logging.getLogger(__name__)
         self.db = DatabaseManager(Config.DATABASE_PATH)
-        self.automation = PerplexityAutomation(Config.get_perplexity_credentials())
         self.telegram = TelegramPublisher(Config.get_telegram_config())
-        self.scheduler = NewsScheduler(self, Config.get_schedule_config())
+
+        # Браузеры пула, кэш запросов, индекс дубликатов и очередь доставки
+        # работают с общей БД системы и ее публикатором
+        credentials = Config.get_perplexity_credentials()
+        self.automation = PerplexityAutomation({
+            'email': credentials.email,
+            'password': credentials.password,
+            'telegram_token': Config.TELEGRAM_BOT_TOKEN,
+            'telegram_channels': Config.TELEGRAM_CHANNELS
+        }, db=self.db, telegram=self.telegram)
+        self.outbox = self.automation.outbox
+        self.outbox.add_delivery_listener(self.on_post_delivered)
+        self.planner = self.automation.planner
+        self.scheduler = SessionScheduler(
+            Config.get_schedule_config(),
+            self.run_manual_session,
+            overlap=Config.SCHEDULER_OVERLAP_POLICY,
+            misfire=Config.SCHEDULER_MISFIRE_POLICY,
+            misfire_grace_seconds=Config.SCHEDULER_MISFIRE_GRACE_SECONDS
+        )
+        self.loop_monitor = LoopLatencyMonitor()
+        self.metrics_server = MetricsServer(Config.HEALTH_HOST, Config.HEALTH_PORT, health=lambda: self.last_health)
 
         self.running = False
+        self.last_health: Dict[str, bool] = {}
         self.stats = {
             'queries_today': 0,
             'posts_created_today': 0,
             'posts_published_today': 0,
+            'posts_queued_today': 0,
             'errors_today': 0,
             'start_time': datetime.now()
         }
@@ -81,12 +100,17 @@ class NewsAutomationSystem:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
+        # Трассы постов (JSON lines в формате OTLP) для команды traces
+        if Config.TRACING_ENABLED:
+            tracing.configure(Config.TRACE_FILE)
+
         self.logger.info("🚀 Система автоматизации новостей инициализирована")
 
     def signal_handler(self, signum, frame):
         """Обработчик сигналов для корректного завершения"""
         self.logger.info(f"📡 Получен сигнал {signum}. Завершение работы...")
         self.running = False
+        self.scheduler.stop()
 
     async def health_check(self) -> Dict[str, bool]:
         """Проверка состояния всех компонентов системы"""
@@ -99,14 +123,14 @@ class NewsAutomationSystem:
 
         try:
             # Проверка базы данных
-            self.db.get_daily_stats(datetime.now().date())
+            await self.db.get_daily_stats(datetime.now().date())
             health_status['database'] = True
         except Exception as e:
             self.logger.error(f"❌ Ошибка БД: {e}")
 
         try:
-            # Проверка Perplexity (без реального запроса)
-            if await self.automation.check_session():
+            # Проверка Perplexity (без реального запроса): авторизован ли браузер пула
+            if self.automation.session_active:
                 health_status['perplexity'] = True
         except Exception as e:
             self.logger.error(f"❌ Ошибка Perplexity: {e}")
@@ -119,20 +143,38 @@ class NewsAutomationSystem:
             self.logger.error(f"❌ Ошибка Telegram: {e}")
 
         try:
-            # Проверка браузера
-            if await self.automation.check_browser():
+            # Проверка браузера: запущен хотя бы один браузер пула
+            if any(worker['browser_started'] for worker in self.automation.get_pool_stats()['workers']):
                 health_status['browser'] = True
         except Exception as e:
             self.logger.error(f"❌ Ошибка браузера: {e}")
 
+        self.last_health = health_status
         overall_health = all(health_status.values())
         status_emoji = "✅" if overall_health else "⚠️"
 
         self.logger.info(f"{status_emoji} Проверка здоровья: {health_status}")
         return health_status
 
-    async def create_news_post_from_query(self, query: str) -> Optional['NewsPost']:
-        """Создание поста из запроса к Perplexity"""
+    async def login(self) -> bool:
+        """Авторизация в Perplexity на свободном браузере пула.
+
+        Остальные воркеры восстанавливают сессию или входят при первом запросе.
+        """
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            async with self.automation.pool.checkout() as worker:
+                if worker.session_active:
+                    return True
+                return await self.automation.login_to_perplexity(worker)
+        except WebDriverException as e:
+            # Пул уже перезапустил браузер; вход повторится при первом запросе
+            self.logger.error(f"❌ Браузер недоступен при авторизации: {e.msg}")
+            return False
+
+    async def query_perplexity(self, query: str) -> Optional['CapturedAnswer']:
+        """Выполнение запроса к Perplexity; возвращает ответ с запросом"""
 
         try:
             # Проверка лимитов
@@ -140,27 +182,42 @@ class NewsAutomationSystem:
                 self.logger.warning(f"⚠️ Достигнут дневной лимит запросов: {Config.MAX_DAILY_QUERIES}")
                 return None
 
-            self.logger.info(f"🔍 Выполняем запрос: {query[:50]}...")
+            self.logger.info("🔍 Выполняем запрос: %.50s...", query)
 
-            # Выполнение запроса через Perplexity
-            response = await self.automation.execute_query(query)
-            if not response:
+            # Выполнение запроса через Perplexity (заголовок ищется по мере печати ответа)
+            answer = await self.automation.fetch_answer(query)
+            if not answer:
                 self.stats['errors_today'] += 1
                 return None
 
             self.stats['queries_today'] += 1
+            return answer
+
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка запроса к Perplexity: {e}")
+            self.stats['errors_today'] += 1
+            return None
+
+    async def create_news_post_from_query(self, query: str) -> Optional['NewsPost']:
+        """Создание поста из запроса к Perplexity"""
+
+        with tracing.trace('create_news_post', query=query[:200]):
+            answer = await self.query_perplexity(query)
+            if not answer:
+                return None
+            return await self.build_post(answer)
+
+    async def build_post(self, answer: 'CapturedAnswer') -> Optional['NewsPost']:
+        """Разбор ответа и сохранение поста"""
 
-            # Обработка ответа
-            post = await self.automation.process_response(response, query)
+        try:
+            # Разбор, оценка и сохранение в БД (отрезки parse и db.save_post)
+            post = await self.automation.build_post(answer)
             if not post:
                 self.stats['errors_today'] += 1
                 return None
 
-            # Сохранение в БД
-            self.db.save_news_post(post)
             self.stats['posts_created_today'] += 1
-
-            self.logger.info(f"📝 Создан пост: {post.title} (важность: {post.importance})")
             return post
 
         except Exception as e:
@@ -171,30 +228,43 @@ class NewsAutomationSystem:
     async def publish_post(self, post: 'NewsPost') -> bool:
         """Публикация поста в Telegram каналы"""
 
-        try:
-            # Проверка важности
-            if post.importance < Config.MIN_IMPORTANCE_TO_PUBLISH:
-                self.logger.debug(f"⏭️ Пост пропущен (важность {post.importance} < {Config.MIN_IMPORTANCE_TO_PUBLISH})")
-                return False
-
-            # Публикация в каналы
-            success = await self.telegram.publish_post(post)
+        with tracing.trace('publish_post', post_id=post.id):
+            try:
+                # Проверка важности
+                if post.importance < Config.MIN_IMPORTANCE_TO_PUBLISH:
+                    self.logger.debug("⏭️ Пост пропущен (важность %s < %s)", post.importance, Config.MIN_IMPORTANCE_TO_PUBLISH)
+                    return False
+
+                # Публикация в каналы через очередь доставки (статус поста обновляет очередь).
+                # В режиме дайджеста deliver не ждет отправки: пост только поставлен в очередь,
+                # опубликованным его учтет on_post_delivered после отправки дайджеста
+                success = await self.automation.deliver(post)
+
+                if success:
+                    if self.outbox.digest_window_seconds:
+                        self.stats['posts_queued_today'] += 1
+                        self.logger.info("📬 Пост поставлен в дайджест: %s", post.title)
+                    else:
+                        self.stats['posts_published_today'] += 1
+                        self.logger.info("📤 Пост опубликован: %s", post.title)
+                    return True
+                else:
+                    self.stats['errors_today'] += 1
+                    return False
 
-            if success:
-                self.stats['posts_published_today'] += 1
-                self.db.update_post_status(post.id, 'published')
-                self.logger.info(f"📤 Пост опубликован: {post.title}")
-                return True
-            else:
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка публикации: {e}")
                 self.stats['errors_today'] += 1
                 return False
 
-        except Exception as e:
-            self.logger.error(f"❌ Ошибка публикации: {e}")
+    def on_post_delivered(self, post_id: int, status: str):
+        """Итог доставки поста, которого publish не ждал (дайджест, восстановленные посты)"""
+        if status == 'published':
+            self.stats['posts_published_today'] += 1
+        else:
             self.stats['errors_today'] += 1
-            return False
 
-    async def run_manual_session(self, session_name: str = "manual") -> Dict[str, int]:
+    async def run_manual_session(self, session_name: str = "manual") -> Dict:
         """Запуск ручной сессии обработки новостей"""
 
         self.logger.info(f"🎯 Запуск ручной сессии: {session_name}")
@@ -202,32 +272,47 @@ class NewsAutomationSystem:
         results = {
             'posts_created': 0,
             'posts_published': 0,
+            'posts_queued': 0,
             'queries_used': 0,
             'errors': 0
         }
 
-        # Получаем список запросов для сессии
-        queries = Config.get_session_queries(session_name)
-
-        for query in queries[:Config.MAX_QUERIES_PER_SESSION]:
-            try:
-                # Создание поста
-                post = await self.create_news_post_from_query(query)
-                if post:
-                    results['posts_created'] += 1
-                    results['queries_used'] += 1
-
-                    # Публикация если важность достаточная
-                    if post.importance >= Config.MIN_IMPORTANCE_TO_PUBLISH:
-                        if await self.publish_post(post):
-                            results['posts_published'] += 1
+        # Получаем список запросов для сессии: бюджет тратится сначала
+        # на шаблоны, которые чаще дают публикации
+        session = Config.get_schedule_config().get(session_name)
+        budget = min(session.queries_budget if session else Config.MAX_QUERIES_PER_SESSION,
+                     Config.MAX_QUERIES_PER_SESSION)
+        queries = await self.planner.plan(Config.get_session_queries(session_name), budget)
+
+        async def parse_stage(answer: 'CapturedAnswer') -> Optional['NewsPost']:
+            post = await self.build_post(answer)
+            if post:
+                results['posts_created'] += 1
+                results['queries_used'] += 1
+            return post
 
-                # Пауза между запросами
-                await asyncio.sleep(Config.QUERY_DELAY_SECONDS)
+        async def dedupe_stage(post: 'NewsPost') -> Optional['NewsPost']:
+            # Публикация если важность достаточная и история еще не отправлялась
+            if post.importance < Config.MIN_IMPORTANCE_TO_PUBLISH or self.automation.is_duplicate(post):
+                return None
+            return post
 
-            except Exception as e:
-                self.logger.error(f"❌ Ошибка в ручной сессии: {e}")
-                results['errors'] += 1
+        # Доставка и запись поста N идут, пока выполняется запрос N+1;
+        # публикации ждут доставки параллельно (в режиме дайджеста - только постановки в очередь)
+        pipeline = Pipeline([
+            Stage('query', self.query_perplexity, workers=Config.DRIVER_POOL_SIZE),
+            Stage('parse', parse_stage),
+            Stage('dedupe', dedupe_stage),
+            Stage('publish', self.publish_post, workers=max(budget, 1))
+        ], trace_name='post')
+        published = await pipeline.run(queries)
+
+        stages = pipeline.get_stats()
+        accepted = sum(1 for result in published if result)
+        # Посты дайджеста еще не отправлены: их учтет on_post_delivered
+        results['posts_queued' if self.outbox.digest_window_seconds else 'posts_published'] = accepted
+        results['errors'] = sum(stage['errors'] for stage in stages.values())
+        results['pipeline'] = stages
 
         self.logger.info(f"✅ Ручная сессия завершена: {results}")
         return results
@@ -239,11 +324,8 @@ class NewsAutomationSystem:
 
         while self.running:
             try:
-                # Проверяем расписание
-                await self.scheduler.check_and_run_sessions()
-
-                # Пауза перед следующей проверкой
-                await asyncio.sleep(60)  # Проверяем каждую минуту
+                # Ожидание до ближайшей сессии без периодического опроса
+                await self.scheduler.run()
 
             except Exception as e:
                 self.logger.error(f"❌ Ошибка в планировщике: {e}")
@@ -261,7 +343,7 @@ class NewsAutomationSystem:
             'errors_count': self.stats['errors_today']
         }
 
-        self.db.update_daily_stats(stats_data)
+        await self.db.update_daily_stats(stats_data)
 
         # Сброс счетчиков в полночь
         now = datetime.now()
@@ -274,10 +356,16 @@ class NewsAutomationSystem:
             'queries_today': 0,
             'posts_created_today': 0,
             'posts_published_today': 0,
+            'posts_queued_today': 0,
             'errors_today': 0
         })
         self.logger.info("🔄 Дневные счетчики сброшены")
 
+    def collect_metrics(self):
+        """Показатели для /metrics: остаток дневного лимита и очередь записи в БД"""
+        DAILY_QUOTA_REMAINING.set(max(Config.MAX_DAILY_QUERIES - self.stats['queries_today'], 0))
+        DB_WRITE_QUEUE.set(self.db.writer.requests.qsize())
+
     def get_system_status(self) -> Dict:
         """Получение статуса системы"""
 
@@ -288,10 +376,21 @@ class NewsAutomationSystem:
             'uptime_seconds': int(uptime.total_seconds()),
             'uptime_human': str(uptime).split('.')[0],
             'stats': self.stats,
+            'driver_pool': self.automation.get_pool_stats(),
+            'pacing': self.automation.get_pacing_stats(),
+            'query_cache': self.automation.get_cache_stats(),
+            'dedup': self.automation.get_dedup_stats(),
+            'planner': self.planner.get_stats(),
+            'telegram': self.telegram.get_stats(),
+            'outbox': self.outbox.get_stats(),
+            'database': self.db.get_stats(),
+            'loop_latency': self.loop_monitor.get_stats(),
+            'schedule': self.scheduler.get_stats(),
             'config': {
                 'max_daily_queries': Config.MAX_DAILY_QUERIES,
                 'min_importance': Config.MIN_IMPORTANCE_TO_PUBLISH,
-                'channels_count': len(Config.TELEGRAM_CHANNELS)
+                'channels_count': len(Config.TELEGRAM_CHANNELS),
+                'driver_pool_size': Config.DRIVER_POOL_SIZE
             }
         }
 
@@ -311,14 +410,27 @@ class NewsAutomationSystem:
                         self.logger.error(f"❌ Компонент '{component}' недоступен")
 
             # Инициализация компонентов
-            await self.automation.initialize()
+            await self.login()
             await self.telegram.initialize()
 
+            # Мониторинг задержки event loop (останавливается в shutdown)
+            self.loop_monitor.start()
+
+            # /metrics и /health: последний результат проверки здоровья и счетчики
+            if Config.METRICS_ENABLED:
+                REGISTRY.add_collector(self.collect_metrics)
+                await self.metrics_server.start()
+
+            # Очередь доставки: прерванные отправки помечаются, посты в статусе ready
+            # возвращаются в очередь, остальное дожидается отправки
+            await self.automation.recover_ready_posts()
+
             # Запуск фоновых задач
             tasks = [
                 asyncio.create_task(self.run_scheduled_sessions()),
                 asyncio.create_task(self.periodic_health_check()),
-                asyncio.create_task(self.periodic_stats_update())
+                asyncio.create_task(self.periodic_stats_update()),
+                asyncio.create_task(self.periodic_cache_eviction())
             ]
 
             self.logger.info("✅ Система запущена и готова к работе")
@@ -341,6 +453,16 @@ class NewsAutomationSystem:
             except Exception as e:
                 self.logger.error(f"❌ Ошибка проверки здоровья: {e}")
 
+    async def periodic_cache_eviction(self):
+        """Периодическая очистка устаревших ответов в кэше запросов"""
+
+        while self.running:
+            try:
+                await asyncio.sleep(Config.QUERY_CACHE_EVICTION_INTERVAL)
+                await self.automation.query_cache.evict_expired()
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка очистки кэша: {e}")
+
     async def periodic_stats_update(self):
         """Периодическое обновление статистики"""
 
@@ -358,18 +480,16 @@ class NewsAutomationSystem:
 
         try:
             # Завершение компонентов
-            if hasattr(self.automation, 'cleanup'):
-                await self.automation.cleanup()
+            await self.loop_monitor.stop()
+            await self.scheduler.close()
+            await self.metrics_server.stop()
+            REGISTRY.remove_collector(self.collect_metrics)
 
-            if hasattr(self.telegram, 'cleanup'):
-                await self.telegram.cleanup()
-
-            # Сохранение финальной статистики
+            # Сохранение финальной статистики (до закрытия БД)
             await self.update_daily_stats()
 
-            # Закрытие соединений
-            if hasattr(self.db, 'close'):
-                self.db.close()
+            # Браузеры пула, кэш запросов, очередь доставки, бот и БД
+            await self.automation.cleanup()
 
             self.logger.info("✅ Система корректно завершена")
 
@@ -392,7 +512,10 @@ async def run_single_query(query: str):
 
         if post.importance >= Config.MIN_IMPORTANCE_TO_PUBLISH:
             if await system.publish_post(post):
-                print("📤 Пост опубликован в Telegram")
+                if system.outbox.digest_window_seconds:
+                    print("📬 Пост поставлен в очередь дайджеста")
+                else:
+                    print("📤 Пост опубликован в Telegram")
             else:
                 print("❌ Ошибка публикации в Telegram")
         else:
@@ -411,27 +534,103 @@ async def run_manual_session_cmd(session_name: str = "manual"):
     print(f"✅ Сессия '{session_name}' завершена:")
     print(f"Создано постов: {results['posts_created']}")
     print(f"Опубликовано: {results['posts_published']}")
+    if results['posts_queued']:
+        print(f"Поставлено в дайджест: {results['posts_queued']}")
     print(f"Использовано запросов: {results['queries_used']}")
 
     if results['errors'] > 0:
         print(f"❌ Ошибок: {results['errors']}")
 
-    await system.shutdown()
+    for stage_name, stage in results['pipeline'].items():
+        print(f"⚙️ {stage_name}: обработано {stage['processed']}, загрузка {stage['utilization']:.0%}, "
+              f"очередь до {stage['queue_max_depth']}")
 
-async def show_system_status():
-    """CLI команда для показа статуса системы"""
-
-    system = NewsAutomationSystem()
-    status = system.get_system_status()
-
-    print(f"📊 Статус системы: {status['status']}")
-    print(f"⏱️ Время работы: {status['uptime_human']}")
-    print(f"📈 Запросов сегодня: {status['stats']['queries_today']}")
-    print(f"📝 Постов создано: {status['stats']['posts_created_today']}")
-    print(f"📤 Постов опубликовано: {status['stats']['posts_published_today']}")
+    await system.shutdown()
 
-    if status['stats']['errors_today'] > 0:
-        print(f"❌ Ошибок сегодня: {status['stats']['errors_today']}")
+def show_system_status():
+    """CLI команда для показа статуса системы.
+
+    Данные берутся из файла БД (дневная статистика, которую сохраняет
+    работающая система, посты и очередь доставки) и из расписания; браузер,
+    бот и остальные компоненты системы не создаются.
+    """
+
+    snapshot = read_status_snapshot(Config.DATABASE_PATH, date.today())
+    daily = snapshot['daily'] or {}
+
+    print(f"📈 Запросов сегодня: {daily.get('queries_used', 0)}/{Config.MAX_DAILY_QUERIES}")
+    print(f"📝 Постов создано: {daily.get('posts_created', 0)}")
+    print(f"📤 Постов опубликовано: {daily.get('posts_published', 0)}")
+
+    if daily.get('errors_count', 0) > 0:
+        print(f"❌ Ошибок сегодня: {daily['errors_count']}")
+
+    if snapshot['posts']:
+        print("🗂️ Посты за сегодня: " + ", ".join(f"{status}: {count}" for status, count in sorted(snapshot['posts'].items())))
+
+    if snapshot['outbox']:
+        print("📬 Очередь доставки: " + ", ".join(f"{status}: {count}" for status, count in sorted(snapshot['outbox'].items())))
+
+    now = datetime.now()
+    for session_name, session in Config.get_schedule_config().items():
+        if session.enabled:
+            print(f"📅 Сессия {session_name}: {next_occurrence(session.time, now).isoformat(timespec='minutes')}")
+
+def check_running_health() -> Optional[Dict]:
+    """Результат /health работающей системы или None, если она не отвечает"""
+    import json
+    import urllib.error
+    import urllib.request
+
+    url = f"http://localhost:{Config.HEALTH_PORT}/health"
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        # 503: система работает, но компонент недоступен
+        return json.loads(e.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def print_health(health: Dict):
+    """Вывод результата проверки здоровья по компонентам"""
+    for component, status in health.items():
+        if isinstance(status, bool):
+            emoji = "✅" if status else "❌"
+            print(f"{emoji} {component}: {'OK' if status else 'FAIL'}")
+
+async def run_reparse_cmd(chunk_size: int = 500):
+    """CLI команда для повторного разбора сохраненных ответов"""
+    from reparse import reparse_stored_responses
+
+    db = DatabaseManager(Config.DATABASE_PATH)
+    try:
+        results = await reparse_stored_responses(db, chunk_size=chunk_size)
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, db.close)
+
+    print(f"✅ Повторный разбор завершен:")
+    print(f"Ответов: {results['rows']}, постов: {results['posts']}")
+    print(f"Время: {results['seconds']} с ({results['rows_per_second']} строк/с, процессов: {results['workers']})")
+
+def show_slowest_traces(limit: int = 10, day: Optional[str] = None):
+    """CLI команда: самые долгие трассы дня с разбивкой по стадиям"""
+
+    selected = date.fromisoformat(day) if day else date.today()
+    traces = tracing.slowest_traces(Config.TRACE_FILE, limit, selected)
+    if not traces:
+        print(f"Трасс за {selected.isoformat()} нет ({Config.TRACE_FILE})")
+        return
+
+    print(f"🐢 Самые долгие трассы за {selected.isoformat()}:")
+    for item in traces:
+        attributes = item['attributes']
+        label = attributes.get('title') or attributes.get('item') or attributes.get('query') or ''
+        print(f"\n{item['started']:%H:%M:%S} {item['name']} {item['seconds']:.1f} с  trace {item['trace_id']}")
+        if label:
+            print(f"  {label}")
+        for line in tracing.breakdown(item):
+            print(f"  {line}")
 
 def main():
     """Главная функция запуска"""
@@ -444,6 +643,30 @@ def main():
     for dir_name in ['data', 'logs', 'temp']:
         Path(dir_name).mkdir(exist_ok=True)
 
+    # Повторный разбор работает только с БД и не требует учетных данных
+    if len(sys.argv) > 1 and sys.argv[1] == "reparse":
+        chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        asyncio.run(run_reparse_cmd(chunk_size))
+        return
+
+    # Просмотр трасс читает только файл трасс
+    if len(sys.argv) > 1 and sys.argv[1] == "traces":
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        show_slowest_traces(limit, sys.argv[3] if len(sys.argv) > 3 else None)
+        return
+
+    # Статус читает БД и расписание: учетные данные не нужны
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        show_system_status()
+        return
+
+    # Здоровье работающей системы берется из ее /health без запуска компонентов
+    if len(sys.argv) > 1 and sys.argv[1] == "health":
+        health = check_running_health()
+        if health is not None:
+            print_health(health)
+            return
+
     # Проверка конфигурации
     if not Config.validate_config():
         logger.error("❌ Ошибки в конфигурации. Завершение работы.")
@@ -461,25 +684,22 @@ def main():
             session_name = sys.argv[2]
             asyncio.run(run_manual_session_cmd(session_name))
 
-        elif command == "status":
-            asyncio.run(show_system_status())
-
         elif command == "health":
+            # Система не запущена: полная проверка с созданием компонентов
             async def check_health():
                 system = NewsAutomationSystem()
-                health = await system.health_check()
-                for component, status in health.items():
-                    emoji = "✅" if status else "❌"
-                    print(f"{emoji} {component}: {'OK' if status else 'FAIL'}")
+                print_health(await system.health_check())
 
             asyncio.run(check_health())
 
         else:
             print("Доступные команды:")
-            print("  python src/main.py query 'ваш запрос'")
-            print("  python src/main.py session morning|afternoon|evening|night")
-            print("  python src/main.py status")
-            print("  python src/main.py health")
+            print("  python main.py query 'ваш запрос'")
+            print("  python main.py session morning|afternoon|evening|night")
+            print("  python main.py status")
+            print("  python main.py health")
+            print("  python main.py reparse [размер_порции]")
+            print("  python main.py traces [количество] [ГГГГ-ММ-ДД]")
             sys.exit(1)
     else:
         # Основной режим работы
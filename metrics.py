@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Metrics for Perplexity Pro News Automation System
+=================================================
+
+Счетчики, показатели и гистограммы в текстовом формате Prometheus и
+HTTP-сервер на aiohttp с эндпоинтами /metrics и /health (порт HEALTH_PORT,
+его же опрашивает healthcheck в docker-compose.yml).
+
+Метрики обновляются в местах измерения (запрос Perplexity, разбор, commit
+в потоке-писателе БД, отправка в Telegram, стадии конвейера), поэтому
+обновление защищено блокировкой. Значения, которые дешевле прочитать, чем
+отслеживать (глубина очередей, остаток дневного лимита), заполняют
+сборщики - функции, вызываемые перед каждой выдачей /metrics.
+"""
+
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм задержки, секунды
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ANSWER_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+# Стадии конвейера: от проверки дубликатов (мс) до запроса Perplexity (минуты)
+STAGE_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Общая часть метрик: имя, описание, метки и блокировка"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(Counter):
+    """Текущее значение"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+class Histogram(Metric):
+    """Распределение значений по накопительным корзинам"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # метки -> (счетчики корзин, сумма, количество)
+        self.series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self.series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    """Набор метрик и сборщиков, выдаваемых на /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Функция, обновляющая показатели перед каждой выдачей"""
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in list(self.collectors):
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сборщика метрик: {e}")
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Perplexity
+QUERY_LATENCY = REGISTRY.register(Histogram(
+    'perplexity_query_latency_seconds', 'Время от отправки запроса до завершения ответа', buckets=ANSWER_BUCKETS))
+QUERY_RESULTS = REGISTRY.register(Counter(
+    'perplexity_queries_total', 'Выполненные запросы по результату (success, error, timeout)', ['result']))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'perplexity_query_cache_lookups_total', 'Поиск ответа в кэше запросов (hit, miss)', ['result']))
+DAILY_QUOTA_REMAINING = REGISTRY.register(Gauge(
+    'perplexity_daily_quota_remaining', 'Остаток дневного лимита запросов'))
+
+# Разбор и БД
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    'news_parse_seconds', 'Разбор и оценка ответа Perplexity', buckets=FAST_BUCKETS))
+DB_COMMIT_SECONDS = REGISTRY.register(Histogram(
+    'db_commit_seconds', 'Транзакция потока-писателя БД', buckets=FAST_BUCKETS))
+DB_WRITE_QUEUE = REGISTRY.register(Gauge(
+    'db_write_queue_depth', 'Запросы, ожидающие потока-писателя БД'))
+
+# Telegram
+TELEGRAM_SEND_SECONDS = REGISTRY.register(Histogram(
+    'telegram_send_seconds', 'Вызов sendMessage Bot API', buckets=REQUEST_BUCKETS))
+TELEGRAM_FLOOD = REGISTRY.register(Counter(
+    'telegram_flood_waits_total', 'Ответы 429 (RetryAfter) от Bot API'))
+OUTBOX_DEPTH = REGISTRY.register(Gauge(
+    'telegram_outbox_depth', 'Строки очереди доставки по статусу', ['status']))
+
+# Конвейер сессии
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'pipeline_stage_seconds', 'Обработка элемента стадией конвейера', ['stage'], buckets=STAGE_BUCKETS))
+STAGE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'pipeline_stage_queue_depth', 'Глубина входной очереди стадии', ['stage']))
+
+class MetricsServer:
+    """HTTP-сервер /metrics и /health"""
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY,
+                 health: Optional[Callable[[], Dict]] = None):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.health = health
+        self._runner = None
+
+    async def metrics(self, request) -> 'web.Response':
+        from aiohttp import web
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    async def health_status(self, request) -> 'web.Response':
+        """Последний результат проверки здоровья; 503, если компонент недоступен"""
+        from aiohttp import web
+        status = self.health() if self.health else {}
+        healthy = all(value for value in status.values() if isinstance(value, bool))
+        return web.Response(text=json.dumps({'healthy': healthy, **status}, ensure_ascii=False, default=str),
+                            status=200 if healthy else 503, content_type='application/json')
+
+    async def start(self) -> bool:
+        """Запуск сервера; без aiohttp метрики только собираются"""
+        # aiohttp загружается только при запуске сервера: команды CLI его не импортируют
+        try:
+            from aiohttp import web
+        except ImportError:
+            logger.warning("⚠️ Пакет aiohttp не установлен: эндпоинт /metrics отключен")
+            return False
+
+        app = web.Application()
+        app.router.add_get('/metrics', self.metrics)
+        app.router.add_get('/health', self.health_status)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"📈 Метрики доступны на http://{self.host}:{self.port}/metrics")
+        return True
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
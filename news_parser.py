@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+News Parser for Perplexity Pro News Automation System
+=====================================================
+
+Разбор ответа Perplexity в структурированный пост. Модуль не зависит от
+браузера и Telegram, поэтому функции разбора можно выполнять в процессах
+ProcessPoolExecutor (массовый повторный разбор сохраненных ответов).
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from keyword_matcher import get_matcher, route_channels
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class NewsPost:
+    """Структура новостного поста"""
+    title: str
+    summary: str
+    category: str
+    importance: int
+    keywords: List[str]
+    sources: List[str]
+    telegram_channels: List[str]
+    raw_response: str
+    created_at: datetime
+    id: Optional[int] = None  # id строки news_posts после сохранения
+    query_id: Optional[int] = None  # id ответа в perplexity_queries
+
+def extract_title(response: str, query_context: str, complete: bool = True) -> Optional[str]:
+    """Заголовок поста: первая содержательная строка среди первых пяти.
+
+    Для неполного (потокового) текста учитываются только завершенные строки;
+    None означает, что заголовок пока определить нельзя.
+    """
+    lines = response.split('\n')
+    if not complete:
+        lines = lines[:-1]
+
+    # Ищем заголовок (обычно первая строка или после маркеров)
+    for line in lines[:5]:
+        if len(line.strip()) > 20 and not line.startswith('http'):
+            return line.strip()
+
+    if not complete and len(lines) < 5:
+        return None
+
+    return query_context[:60] + "..."
+
+def extract_summary(response: str, complete: bool = True) -> Optional[str]:
+    """Краткое содержание: первые 2-3 предложения.
+
+    Для неполного текста результат возвращается, только когда
+    первые три предложения уже завершены.
+    """
+    sentences = re.split(r'[.!?]', response, maxsplit=3)
+    if not complete and len(sentences) < 4:
+        return None
+
+    summary_sentences = []
+    for sentence in sentences[:3]:
+        if len(sentence.strip()) > 20:
+            summary_sentences.append(sentence.strip())
+
+    summary = '. '.join(summary_sentences)
+    if summary and not summary.endswith('.'):
+        summary += '.'
+
+    return summary
+
+def parse_response(response: str, query_context: str,
+                   title: Optional[str] = None,
+                   summary: Optional[str] = None) -> Optional[NewsPost]:
+    """Парсинг ответа Perplexity в структурированный пост.
+
+    title и summary можно передать заранее, если они уже извлечены
+    из потокового ответа.
+    """
+
+    try:
+        # Извлекаем основные элементы из ответа
+        if title is None:
+            title = extract_title(response, query_context)
+
+        # Создаем краткое содержание (первые 2-3 предложения)
+        if summary is None:
+            summary = extract_summary(response)
+
+        # Категория, важность и термины - за один проход по ответу
+        matched = get_matcher().match(response)
+        category = matched.category()
+        importance = matched.importance()
+
+        return NewsPost(
+            title=title[:120],  # Ограничиваем длину заголовка
+            summary=summary[:500],  # Ограничиваем длину описания
+            category=category,
+            importance=importance,
+            keywords=matched.terms,
+            sources=[],  # Заполнится позже
+            telegram_channels=route_channels(category, importance),
+            raw_response=response,
+            created_at=datetime.now()
+        )
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка парсинга ответа Perplexity: {e}")
+        return None
+
+def parse_batch(rows: Sequence[Tuple[int, int, str, str]]) -> List[NewsPost]:
+    """Разбор пачки сохраненных ответов (id поста, id ответа, query, response) в процессе пула"""
+    posts = []
+    for post_id, query_id, query, response in rows:
+        post = parse_response(response, query)
+        if post:
+            post.id = post_id
+            post.query_id = query_id
+            post.raw_response = ''  # исходный текст уже есть в БД, не гоняем его между процессами
+            posts.append(post)
+    return posts
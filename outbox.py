@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Telegram Outbox for Perplexity Pro News Automation System
+=========================================================
+
+Надежная доставка постов в Telegram. Публикация записывает в таблицу
+telegram_outbox по строке на пару (пост, канал) в одной транзакции с
+изменением статуса поста, а фоновый обработчик отправляет строки с
+повторами и экспоненциальной паузой (MAX_RETRY_ATTEMPTS, RETRY_DELAY_SECONDS).
+Это единственный слой повторов: TelegramPublisher.send делает одну попытку,
+а на RetryAfter только приостанавливает чат - строка вернется в очередь не
+раньше, чем через retry_after.
+
+Идемпотентность: перед отправкой строка фиксируется в статусе 'sending'.
+Если процесс упал между отправкой и записью результата, после перезапуска
+такая строка получает статус 'uncertain' и повторно не отправляется -
+лучше пропустить сообщение, чем опубликовать его дважды. Поэтому close()
+не прерывает начатую отправку, а дожидается ее (не дольше CLOSE_TIMEOUT_SECONDS).
+Посты, оставшиеся после сбоя в статусе ready, возвращает в очередь
+recover_ready_posts().
+
+Режим дайджеста (TELEGRAM_DIGEST_ENABLED): строки канала получают общее
+время отправки через TELEGRAM_DIGEST_WINDOW_SECONDS после первой из них и
+уходят одним сообщением (или несколькими, если не помещаются в лимит
+Telegram). Статус каждой строки и поста ведется как и при обычной отправке;
+publish() в этом режиме не ждет отправки дайджеста и возвращается сразу после
+записи строк в outbox. Итог доставки таких постов (как и постов, возвращенных
+в очередь после перезапуска) получают слушатели add_delivery_listener().
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional
+
+from telegram.error import RetryAfter, TelegramError, TimedOut
+
+from config import Config
+from database import DatabaseManager
+import tracing
+from metrics import OUTBOX_DEPTH
+from news_parser import NewsPost
+from telegram_publisher import format_digest_entry, format_post_message, render_digest
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк берется из очереди за один проход
+DRAIN_BATCH_SIZE = 50
+
+# Максимальная пауза обработчика, если нет строк к отправке (секунды)
+IDLE_POLL_SECONDS = 30
+
+# Сколько close() ждет завершения начатой отправки (секунды)
+CLOSE_TIMEOUT_SECONDS = 30
+
+SELECT_DUE_SQL = """
+    SELECT id, post_id, channel_key, chat_id, message, attempts, created_at
+    FROM telegram_outbox
+    WHERE status = 'pending' AND next_attempt_at <= datetime('now')
+    ORDER BY next_attempt_at, id
+    LIMIT ?
+"""
+
+# Строка дайджеста уходит вместе с ожидающими строками того же канала
+INSERT_DIGEST_SQL = """
+    INSERT OR IGNORE INTO telegram_outbox (post_id, channel_key, chat_id, message, next_attempt_at)
+    VALUES (?, ?, ?, ?, COALESCE(
+        (SELECT MIN(next_attempt_at) FROM telegram_outbox
+         WHERE chat_id = ? AND status = 'pending' AND attempts = 0),
+        datetime('now', ?)))
+"""
+
+# Итоговый статус поста, когда по всем его каналам доставка завершена
+FINISH_POST_SQL = """
+    UPDATE news_posts
+    SET status = CASE
+            WHEN EXISTS (SELECT 1 FROM telegram_outbox WHERE post_id = :post_id AND status = 'sent')
+                THEN 'published'
+            WHEN EXISTS (SELECT 1 FROM telegram_outbox WHERE post_id = :post_id AND status = 'uncertain')
+                THEN 'uncertain'
+            ELSE 'failed' END,
+        published_at = CURRENT_TIMESTAMP,
+        telegram_message_ids = (
+            SELECT json_group_array(channel_key || ':' || message_id)
+            FROM telegram_outbox WHERE post_id = :post_id AND status = 'sent'
+        )
+    WHERE id = :post_id AND NOT EXISTS (
+        SELECT 1 FROM telegram_outbox
+        WHERE post_id = :post_id AND status IN ('pending', 'sending')
+    ) AND EXISTS (
+        SELECT 1 FROM telegram_outbox WHERE post_id = :post_id
+    )
+"""
+
+def _parse_utc(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+class TelegramOutbox:
+    """Очередь доставки в таблице telegram_outbox и ее фоновый обработчик"""
+
+    def __init__(self, db: DatabaseManager, publisher, max_attempts: int = None,
+                 retry_delay_seconds: float = None, digest_window_seconds: int = None):
+        self.db = db
+        self.publisher = publisher
+        self.max_attempts = max_attempts or Config.MAX_RETRY_ATTEMPTS
+        self.retry_delay_seconds = retry_delay_seconds or Config.RETRY_DELAY_SECONDS
+
+        # Окно дайджеста; 0 - каждый пост отправляется отдельным сообщением
+        if digest_window_seconds is None:
+            digest_window_seconds = Config.TELEGRAM_DIGEST_WINDOW_SECONDS if Config.TELEGRAM_DIGEST_ENABLED else 0
+        self.digest_window_seconds = digest_window_seconds
+
+        self.wakeup = asyncio.Event()
+        self.closing = False
+        self.task: Optional[asyncio.Task] = None
+        self.waiters: Dict[int, List[asyncio.Future]] = {}
+        # Итог доставки постов, которых не ждет publish(): (id поста, статус)
+        self.listeners: List[Callable[[int, str], None]] = []
+        # Отрезок трассы, ожидающий доставки поста: отправки вкладываются в него
+        self.trace_parents: Dict[int, tracing.Span] = {}
+
+        # Время от постановки в очередь до доставки (секунды)
+        self.latencies: Deque[float] = deque(maxlen=500)
+        self.depth: Dict[str, int] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.digests_sent = 0
+        self.digest_posts = 0
+
+    def add_delivery_listener(self, listener: Callable[[int, str], None]):
+        """Подписка на итог доставки постов без ожидающего publish().
+
+        Статус - 'published', 'failed' или 'uncertain'. Пост, доставку которого
+        ждал publish(), слушателям не передается: его учитывает вызывающий.
+        """
+        self.listeners.append(listener)
+
+    def ensure_running(self):
+        """Запуск фонового обработчика, если он еще не запущен"""
+        if self.closing:
+            return
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def recover(self) -> int:
+        """Строки, прерванные во время отправки, помечаются как 'uncertain'"""
+        _, uncertain = await self.db.write("""
+            UPDATE telegram_outbox
+            SET status = 'uncertain', last_error = 'прервано во время отправки'
+            WHERE status = 'sending'
+        """)
+        if uncertain:
+            logger.warning(f"⚠️ Строк outbox с неизвестным результатом отправки: {uncertain} (повторно не отправляются)")
+        return uncertain
+
+    async def recover_ready_posts(self, is_duplicate: Optional[Callable[[NewsPost], bool]] = None) -> int:
+        """Восстановление доставки после перезапуска.
+
+        Прерванные отправки помечаются как 'uncertain', а важные посты,
+        оставшиеся в статусе ready (созданы, но не поставлены в очередь до
+        сбоя), ставятся в очередь. is_duplicate отсеивает уже опубликованное.
+        """
+        await self.recover()
+        self.ensure_running()
+
+        rows = await self.db.fetch_posts(
+            "status = 'ready' AND importance >= ? AND created_at >= datetime('now', ?)",
+            (Config.MIN_IMPORTANCE_TO_PUBLISH, f"-{Config.OUTBOX_RECOVERY_HOURS} hours")
+        )
+
+        queued = 0
+        for row in rows:
+            post = NewsPost(
+                title=row['title'], summary=row['summary'] or '', category=row['category'],
+                importance=row['importance'], keywords=row['keywords'], sources=row['sources'],
+                telegram_channels=row['telegram_channels'], raw_response='',
+                created_at=datetime.fromisoformat(row['created_at']), id=row['id'], query_id=row['query_id']
+            )
+            if is_duplicate is not None and is_duplicate(post):
+                continue
+            if await self.enqueue(post):
+                queued += 1
+
+        if queued:
+            logger.info(f"📬 В очередь доставки возвращено постов: {queued}")
+        return queued
+
+    def format_message(self, post) -> str:
+        """Текст строки outbox: отдельное сообщение или блок дайджеста"""
+        if self.digest_window_seconds:
+            return format_digest_entry(post)
+        return format_post_message(post)
+
+    async def enqueue(self, post, message: Optional[str] = None) -> bool:
+        """Постановка поста в очередь на все его каналы.
+
+        Возвращает False, если у поста нет доступных каналов.
+        """
+        channels = self.publisher.channels
+        targets = [(key, channels[key]) for key in dict.fromkeys(post.telegram_channels) if channels.get(key)]
+        if not targets or post.id is None:
+            return False
+
+        if message is None:
+            message = self.format_message(post)
+
+        if self.digest_window_seconds:
+            window = f"+{int(self.digest_window_seconds)} seconds"
+            statements = [
+                (INSERT_DIGEST_SQL, (post.id, channel_key, chat_id, message, chat_id, window))
+                for channel_key, chat_id in targets
+            ]
+        else:
+            statements = [(
+                """
+                INSERT OR IGNORE INTO telegram_outbox (post_id, channel_key, chat_id, message)
+                VALUES (?, ?, ?, ?)
+                """,
+                (post.id, channel_key, chat_id, message)
+            ) for channel_key, chat_id in targets]
+        statements.append((
+            "UPDATE news_posts SET status = 'queued' WHERE id = ? AND status NOT IN ('published', 'failed', 'uncertain')",
+            (post.id,)
+        ))
+
+        await self.db.write_many(statements)
+        self.ensure_running()
+        self.wakeup.set()
+        return True
+
+    async def publish(self, post, message: Optional[str] = None, wait: Optional[bool] = None) -> bool:
+        """Постановка в очередь и, если wait, ожидание доставки.
+
+        С ожиданием возвращает True, если пост отправлен хотя бы в один канал;
+        без ожидания - True, как только строки записаны в outbox. По умолчанию
+        ждет только при отдельной отправке: в режиме дайджеста доставка
+        наступает через TELEGRAM_DIGEST_WINDOW_SECONDS, и ее итог запишет
+        обработчик в статус поста.
+        """
+        if wait is None:
+            wait = not self.digest_window_seconds
+        if not wait:
+            with tracing.span('outbox.enqueue'):
+                return await self.enqueue(post, message)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(post.id, []).append(waiter)
+
+        with tracing.span('outbox.enqueue'):
+            queued = await self.enqueue(post, message)
+        if not queued:
+            self.waiters[post.id].remove(waiter)
+            return False
+
+        with tracing.span('outbox.wait_delivery') as wait_span:
+            if isinstance(wait_span, tracing.Span):
+                self.trace_parents[post.id] = wait_span
+            try:
+                # Пост мог быть доставлен раньше (повторная публикация)
+                await self._resolve_waiters([post.id])
+                return await waiter
+            finally:
+                self.trace_parents.pop(post.id, None)
+
+    async def run(self):
+        """Фоновая отправка строк, срок которых наступил"""
+        while not self.closing:
+            try:
+                rows = await self.db.fetch_all(SELECT_DUE_SQL, (DRAIN_BATCH_SIZE,))
+                if self.closing:
+                    break
+                if rows:
+                    await self._deliver(rows)
+                    continue
+
+                await self._refresh_depth()
+                self.wakeup.clear()
+                if self.closing:
+                    break
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=await self._idle_timeout())
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработчика outbox: {e}")
+                await asyncio.sleep(self.retry_delay_seconds)
+
+    async def _idle_timeout(self) -> float:
+        """Пауза до ближайшей повторной попытки"""
+        row = await self.db.fetch_one("""
+            SELECT (julianday(MIN(next_attempt_at)) - julianday('now')) * 86400
+            FROM telegram_outbox WHERE status = 'pending'
+        """)
+        if row is None or row[0] is None:
+            return IDLE_POLL_SECONDS
+        return min(max(row[0], 0.1), IDLE_POLL_SECONDS)
+
+    async def _deliver(self, rows):
+        ids = [row[0] for row in rows]
+        placeholders = ','.join('?' * len(ids))
+
+        # Фиксируем попытку до отправки: после сбоя строка не уйдет повторно
+        await self.db.write(
+            f"UPDATE telegram_outbox SET status = 'sending', attempts = attempts + 1 WHERE id IN ({placeholders})",
+            ids
+        )
+
+        if self.digest_window_seconds:
+            results = await self._send_digests(rows)
+        else:
+            results = await asyncio.gather(
+                *(self._send(post_id, channel_key, chat_id, message)
+                  for _, post_id, channel_key, chat_id, message, _, _ in rows),
+                return_exceptions=True
+            )
+
+        statements = []
+        now = datetime.now(timezone.utc)
+        posts = set()
+
+        for (row_id, post_id, channel_key, _, _, attempts, created_at), result in zip(rows, results):
+            posts.add(post_id)
+            attempts += 1
+
+            if not isinstance(result, Exception):
+                statements.append((
+                    "UPDATE telegram_outbox SET status = 'sent', message_id = ?, sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+                    (result.message_id, row_id)
+                ))
+                self.sent += 1
+                enqueued_at = _parse_utc(created_at)
+                if enqueued_at:
+                    self.latencies.append((now - enqueued_at).total_seconds())
+                logger.info("📤 Опубликовано в %s (пост #%s)", channel_key, post_id)
+                continue
+
+            if isinstance(result, TimedOut):
+                # Запрос мог дойти до Telegram: повтор рискует дублем
+                statements.append((
+                    "UPDATE telegram_outbox SET status = 'uncertain', last_error = ? WHERE id = ?",
+                    (str(result), row_id)
+                ))
+                logger.warning("⚠️ Таймаут отправки в %s (пост #%s): результат неизвестен", channel_key, post_id)
+                continue
+
+            if not isinstance(result, TelegramError) or attempts >= self.max_attempts:
+                statements.append((
+                    "UPDATE telegram_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                    (str(result), row_id)
+                ))
+                self.failed += 1
+                logger.error("❌ Доставка в %s не удалась (пост #%s): %s", channel_key, post_id, result)
+                continue
+
+            # Экспоненциальная пауза: delay, 2*delay, 4*delay...
+            delay = self.retry_delay_seconds * 2 ** (attempts - 1)
+            if isinstance(result, RetryAfter):
+                # Flood control: раньше срока Telegram повтор все равно отклонит
+                delay = max(delay, float(result.retry_after))
+            statements.append((
+                "UPDATE telegram_outbox SET status = 'pending', last_error = ?, next_attempt_at = datetime('now', ?) WHERE id = ?",
+                (str(result), f"+{int(delay)} seconds", row_id)
+            ))
+            self.retried += 1
+            logger.warning("🔄 Повтор отправки в %s через %g с (попытка %d/%d): %s",
+                           channel_key, delay, attempts, self.max_attempts, result)
+
+        for post_id in posts:
+            statements.append((FINISH_POST_SQL, {'post_id': post_id}))
+
+        await self.db.write_many(statements)
+        await self._finish_posts(posts)
+
+    async def _send(self, post_id: int, channel_key: str, chat_id: str, text: str, posts: int = 1):
+        """Отправка с отрезком в трассе поста, который ждет доставки"""
+        with tracing.span('telegram.deliver', parent=self.trace_parents.get(post_id), channel=channel_key, posts=posts):
+            return await self.publisher.send(chat_id, text)
+
+    async def _send_digests(self, rows) -> List:
+        """Отправка строк дайджестами по чатам; результат сообщения - каждой его строке"""
+        groups: Dict[str, List[int]] = {}
+        for index, row in enumerate(rows):
+            groups.setdefault(row[3], []).append(index)
+
+        results: List = [None] * len(rows)
+        sent = await asyncio.gather(*(
+            self._send_digest(chat_id, [rows[index] for index in indices])
+            for chat_id, indices in groups.items()
+        ))
+        for indices, digest_results in zip(groups.values(), sent):
+            for index, result in zip(indices, digest_results):
+                results[index] = result
+        return results
+
+    async def _send_digest(self, chat_id: str, rows: List) -> List:
+        """Сообщения дайджеста одного чата отправляются по порядку"""
+        results: List = [None] * len(rows)
+        for text, indices in render_digest([row[4] for row in rows]):
+            # Отрезок отправки попадает в трассу первого поста сообщения
+            _, post_id, channel_key, _, _, _, _ = rows[indices[0]]
+            try:
+                result = await self._send(post_id, channel_key, chat_id, text, posts=len(indices))
+                self.digests_sent += 1
+                self.digest_posts += len(indices)
+            except Exception as e:
+                result = e
+            for index in indices:
+                results[index] = result
+        return results
+
+    async def _final_statuses(self, post_ids) -> List:
+        """(id, статус) постов, доставка которых завершена"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return []
+
+        placeholders = ','.join('?' * len(post_ids))
+        return await self.db.fetch_all(
+            f"SELECT id, status FROM news_posts WHERE id IN ({placeholders}) AND status IN ('published', 'failed', 'uncertain')",
+            post_ids
+        )
+
+    async def _resolve_waiters(self, post_ids):
+        waiting = [post_id for post_id in post_ids if post_id in self.waiters]
+        for post_id, status in await self._final_statuses(waiting):
+            for waiter in self.waiters.pop(post_id, []):
+                if not waiter.done():
+                    waiter.set_result(status == 'published')
+
+    async def _finish_posts(self, post_ids):
+        """Итог доставки: результат ожидающим publish(), остальные посты - слушателям"""
+        for post_id, status in await self._final_statuses(post_ids):
+            waiters = self.waiters.pop(post_id, [])
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(status == 'published')
+            if waiters:
+                continue
+
+            for listener in self.listeners:
+                try:
+                    listener(post_id, status)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработчика итога доставки: {e}")
+
+    async def _refresh_depth(self):
+        rows = await self.db.fetch_all("""
+            SELECT status, COUNT(*) FROM telegram_outbox
+            WHERE status IN ('pending', 'sending', 'uncertain') GROUP BY status
+        """)
+        self.depth = dict(rows)
+        for status in ('pending', 'sending', 'uncertain'):
+            OUTBOX_DEPTH.set(self.depth.get(status, 0), status=status)
+
+    def get_stats(self) -> Dict:
+        """Глубина очереди и задержка доставки"""
+        stats = {
+            'pending': self.depth.get('pending', 0),
+            'sending': self.depth.get('sending', 0),
+            'uncertain': self.depth.get('uncertain', 0),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried
+        }
+
+        if self.digest_window_seconds:
+            stats['digest'] = {
+                'window_seconds': self.digest_window_seconds,
+                'messages_sent': self.digests_sent,
+                'posts_sent': self.digest_posts
+            }
+
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            percentile = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+            stats['delivery_latency_seconds'] = {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(ordered[-1], 2)
+            }
+
+        return stats
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT_SECONDS):
+        """Остановка обработчика (неотправленные строки останутся в таблице).
+
+        Начатая пачка отправок доводится до записи результата: отмена посреди
+        отправки оставила бы строки в 'sending', а после перезапуска - в
+        'uncertain'. Обработчик отменяется, только если не уложился в timeout.
+        """
+        self.closing = True
+        self.wakeup.set()
+        if self.task:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.task), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Отправка outbox не завершилась за {timeout:g} с, обработчик остановлен")
+                self.task.cancel()
+                try:
+                    await self.task
+                except asyncio.CancelledError:
+                    pass
+            except asyncio.CancelledError:
+                self.task.cancel()
+                raise
+        for waiters in self.waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.cancel()
+        self.waiters.clear()
@@ -1,117 +1,178 @@
 
 import asyncio
 import json
-import sqlite3
 import time
-import schedule
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from typing import AsyncIterator, List, Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from telegram import Bot
-from telegram.error import TelegramError
-import re
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 import hashlib
+from collections import deque
+from dataclasses import dataclass, field
+
+from config import Config, TelegramConfig
+from driver_pool import DriverPool, DriverWorker
+from loop_monitor import LoopLatencyMonitor
+from pipeline import Pipeline, Stage
+from rate_limiter import AdaptiveRateGovernor
+from session_scheduler import SessionScheduler
+from session_store import SessionStore
+from answer_watcher import AnswerChunk, prepare_answer_watch, stream_answer
+from query_cache import QueryCache
+from dedup_index import DuplicateIndex
+from query_planner import QueryPlanner
+from telegram_publisher import TelegramPublisher
+from outbox import TelegramOutbox
+from database import DatabaseManager
+from metrics import (CACHE_LOOKUPS, DAILY_QUOTA_REMAINING, DB_WRITE_QUEUE, PARSE_SECONDS,
+                     QUERY_LATENCY, QUERY_RESULTS, REGISTRY, MetricsServer)
+from news_parser import NewsPost, extract_summary, extract_title, parse_response
+from logging_setup import setup_queued_logging
+import tracing
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('perplexity_news.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+PERPLEXITY_URL = Config.PERPLEXITY_URL
+
+# Селектор поля ввода запроса на главной странице
+SEARCH_INPUT_SELECTOR = "textarea, input[placeholder*='Ask']"
+
+# Авторизованная страница: есть поле ввода и нет кнопки входа
+LOGGED_IN_SCRIPT = """
+return !!document.querySelector(arguments[0]) &&
+    !Array.from(document.querySelectorAll('button')).some(b => /Sign In/i.test(b.textContent));
+"""
+
 @dataclass
-class NewsPost:
-    """Структура новостного поста"""
-    title: str
-    summary: str
-    category: str
-    importance: int
-    keywords: List[str]
-    sources: List[str]
-    telegram_channels: List[str]
-    raw_response: str
-    created_at: datetime
+class CapturedAnswer:
+    """Ответ Perplexity с заголовком и кратким содержанием, найденными во время печати"""
+    query: str
+    text: str
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    sources: List[str] = field(default_factory=list)
+    # Дочитывание потока после complete: источники и запись ответа в БД
+    rest: Optional[asyncio.Task] = field(default=None, repr=False, compare=False)
+
+    async def wait_sources(self):
+        """Ожидание источников (и отправки ответа в очередь записи БД)"""
+        if self.rest is not None:
+            await self.rest
 
 class PerplexityAutomation:
     """Главный класс автоматизации Perplexity Pro"""
 
-    def __init__(self, credentials: Dict[str, str]):
+    def __init__(self, credentials: Dict[str, str], pool_size: Optional[int] = None,
+                 db: Optional[DatabaseManager] = None, telegram: Optional[TelegramPublisher] = None):
         self.email = credentials['email']
         self.password = credentials['password'] 
         self.telegram_token = credentials['telegram_token']
         self.channels = credentials['telegram_channels']
 
-        self.driver = None
-        self.session_active = False
+        # Пул браузеров: каждый воркер авторизуется отдельно
+        self.pool = DriverPool(pool_size or Config.DRIVER_POOL_SIZE, self.setup_driver)
+        self.session_store = SessionStore(Config.BROWSER_PROFILE_DIR)
         self.queries_used_today = 0
+        self.queries_in_flight = 0
         self.max_daily_queries = 50  # Безопасный лимит
 
-        self.setup_database()
-        self.telegram_bot = Bot(token=self.telegram_token)
-
-    def setup_database(self):
-        """Инициализация базы данных"""
-        self.conn = sqlite3.connect('perplexity_news.db', check_same_thread=False)
-        cursor = self.conn.cursor()
-
-        # Таблица для отслеживания запросов
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS perplexity_queries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query TEXT NOT NULL,
-                response TEXT,
-                tokens_estimated INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                success BOOLEAN DEFAULT FALSE,
-                query_hash TEXT UNIQUE
-            )
-        """)
-
-        # Таблица для постов
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS news_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                summary TEXT,
-                category TEXT,
-                importance INTEGER,
-                keywords TEXT,
-                sources TEXT,
-                telegram_channels TEXT,
-                telegram_message_ids TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                published_at DATETIME,
-                status TEXT DEFAULT 'pending'
-            )
-        """)
-
-        # Таблица для статистики
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                date TEXT PRIMARY KEY,
-                queries_used INTEGER,
-                posts_created INTEGER,
-                posts_published INTEGER,
-                telegram_messages_sent INTEGER,
-                errors_count INTEGER
-            )
-        """)
+        # Время от отправки запроса до завершения ответа (мс)
+        self.answer_latencies = deque(maxlen=200)
+
+        # Темп отправки запросов: ответы из кэша его не расходуют
+        self.governor = AdaptiveRateGovernor(
+            Config.REQUESTS_PER_MINUTE,
+            min_interval=Config.QUERY_DELAY_SECONDS,
+            slow_latency_seconds=Config.QUERY_SLOW_LATENCY_SECONDS,
+            max_backoff=Config.QUERY_MAX_BACKOFF
+        )
+
+        # Записи идут через фоновый поток-писатель, чтение - через пул читателей.
+        # main.py передает свою БД (Config.DATABASE_PATH) и публикатора
+        self.db = db or DatabaseManager('perplexity_news.db')
+        self.pending_writes = set()
+        self.query_cache = QueryCache(
+            self.db,
+            similarity_threshold=Config.QUERY_SIMILARITY_THRESHOLD,
+            default_ttl_hours=Config.QUERY_CACHE_MAX_AGE_HOURS,
+            now_ttl_hours=Config.QUERY_CACHE_NOW_TTL_HOURS,
+            memory_entries=Config.QUERY_CACHE_MEMORY_ENTRIES,
+            redis_url=Config.REDIS_URL
+        )
+        self.planner = QueryPlanner(self.db, Config.QUERY_PLANNER_HISTORY_DAYS)
+        self.dedup_index = DuplicateIndex(Config.DUPLICATE_WINDOW_HOURS, Config.DUPLICATE_SIMILARITY_THRESHOLD)
+        conn = self.db.connect()
+        try:
+            self.dedup_index.load(conn)
+        finally:
+            conn.close()
+
+        self.telegram = telegram or TelegramPublisher(TelegramConfig(self.telegram_token, self.channels))
+        self.outbox = TelegramOutbox(self.db, self.telegram)
+
+    @property
+    def session_active(self) -> bool:
+        """Авторизован ли хотя бы один браузер пула"""
+        return self.pool.session_active
+
+    def get_pool_stats(self) -> Dict:
+        """Статистика пула браузеров и времени ответа Perplexity"""
+        stats = self.pool.get_stats()
+
+        if self.answer_latencies:
+            ordered = sorted(self.answer_latencies)
+            stats['answer_latency_ms'] = {
+                'last': self.answer_latencies[-1],
+                'avg': int(sum(ordered) / len(ordered)),
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            }
+
+        return stats
 
-        self.conn.commit()
+    async def cleanup(self):
+        """Закрытие браузеров пула и соединения с БД"""
+        await self.pool.close()
+        await self.query_cache.close()
+        await self.outbox.close()
+        await self.telegram.cleanup()
+        if self.pending_writes:
+            await asyncio.gather(*self.pending_writes, return_exceptions=True)
 
-    def setup_driver(self):
-        """Настройка Selenium WebDriver"""
+        # Дожидаемся записи очереди в БД вне event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.db.close)
+
+    def get_cache_stats(self) -> Dict:
+        """Попадания и промахи кэша запросов"""
+        return self.query_cache.get_stats()
+
+    def get_dedup_stats(self) -> Dict:
+        """Проверки и найденные дубликаты перед публикацией"""
+        return self.dedup_index.get_stats()
+
+    def get_planner_stats(self) -> Dict:
+        """Опубликовано постов на выполненный запрос по шаблонам"""
+        return self.planner.get_stats()
+
+    def get_pacing_stats(self) -> Dict:
+        """Темп отправки запросов в Perplexity"""
+        return self.governor.get_stats()
+
+    def collect_metrics(self):
+        """Показатели для /metrics: остаток дневного лимита и очередь записи в БД"""
+        DAILY_QUOTA_REMAINING.set(max(self.max_daily_queries - self.queries_used_today - self.queries_in_flight, 0))
+        DB_WRITE_QUEUE.set(self.db.writer.requests.qsize())
+
+    def get_outbox_stats(self) -> Dict:
+        """Глубина очереди доставки и задержка публикации"""
+        return self.outbox.get_stats()
+
+    def setup_driver(self, worker_id: int = 0):
+        """Настройка Selenium WebDriver (выполняется в потоке воркера)"""
         options = Options()
         options.add_argument('--headless')
         options.add_argument('--no-sandbox')
@@ -119,6 +180,9 @@ class PerplexityAutomation:
         options.add_argument('--disable-gpu')
         options.add_argument('--window-size=1920,1080')
 
+        # Постоянный профиль сохраняет авторизацию между перезапусками
+        options.add_argument(f'--user-data-dir={self.session_store.profile_dir(worker_id).resolve()}')
+
         # Отключаем изображения для экономии трафика
         prefs = {
             "profile.managed_default_content_settings.images": 2,
@@ -126,331 +190,380 @@ class PerplexityAutomation:
         }
         options.add_experimental_option("prefs", prefs)
 
-        self.driver = webdriver.Chrome(options=options)
-        self.driver.implicitly_wait(10)
+        driver = webdriver.Chrome(options=options)
+        driver.implicitly_wait(10)
+
+        # Ожидание ответа выполняется асинхронным скриптом в браузере
+        driver.set_script_timeout(Config.ANSWER_TIMEOUT_SECONDS + 5)
+        logger.info(f"🌐 Запущен браузер воркера {worker_id}")
+        return driver
+
+    async def _is_logged_in(self, worker: DriverWorker) -> bool:
+        """Проверка, что открытая страница принадлежит авторизованной сессии"""
+        try:
+            await worker.browser.wait_for(
+                EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_INPUT_SELECTOR)), 10
+            )
+            return bool(await worker.browser.execute_script(LOGGED_IN_SCRIPT, SEARCH_INPUT_SELECTOR))
+        except TimeoutException:
+            return False
+
+    async def restore_session(self, worker: DriverWorker) -> bool:
+        """Восстановление сессии из профиля браузера или сохраненных cookies"""
+        browser = await worker.ensure_driver()
+
+        # Профиль Chrome уже может содержать действующую сессию
+        await browser.get(PERPLEXITY_URL)
+        if await self._is_logged_in(worker):
+            return True
+
+        # Резервный вариант: cookie jar из прошлой сессии
+        cookies = self.session_store.load_cookies(worker.worker_id)
+        if not cookies:
+            return False
+
+        for cookie in cookies:
+            try:
+                await browser.add_cookie(cookie)
+            except Exception as e:
+                logger.debug("Cookie %s не восстановлена: %s", cookie.get('name'), e)
+
+        await browser.get(PERPLEXITY_URL)
+        if await self._is_logged_in(worker):
+            return True
+
+        self.session_store.clear(worker.worker_id)
+        return False
 
-    async def login_to_perplexity(self):
-        """Авторизация в Perplexity"""
+    async def login_to_perplexity(self, worker: DriverWorker):
+        """Авторизация воркера пула в Perplexity"""
         try:
-            if not self.driver:
-                self.setup_driver()
+            browser = await worker.ensure_driver()
 
-            self.driver.get("https://www.perplexity.ai/")
-            await asyncio.sleep(3)
+            if await self.restore_session(worker):
+                self.session_store.save_cookies(worker.worker_id, await browser.get_cookies())
+                worker.session_active = True
+                logger.info(f"♻️ Воркер {worker.worker_id}: сессия Perplexity восстановлена без логина")
+                return True
+
+            await browser.get(PERPLEXITY_URL)
 
             # Ищем кнопку входа
-            login_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Sign In')]"))
+            login_button = await browser.wait_for(
+                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Sign In')]")), 10
             )
-            login_button.click()
-            await asyncio.sleep(2)
+            await login_button.click()
 
             # Вводим email
-            email_field = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='email']"))
+            email_field = await browser.wait_for(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "input[type='email']")), 10
             )
-            email_field.send_keys(self.email)
+            await email_field.send_keys(self.email)
 
             # Вводим пароль
-            password_field = self.driver.find_element(By.CSS_SELECTOR, "input[type='password']")
-            password_field.send_keys(self.password)
+            password_field = await browser.find_element(By.CSS_SELECTOR, "input[type='password']")
+            await password_field.send_keys(self.password)
 
             # Нажимаем войти
-            submit_button = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
-            submit_button.click()
+            submit_button = await browser.find_element(By.CSS_SELECTOR, "button[type='submit']")
+            await submit_button.click()
 
             # Ждем загрузки главной страницы
-            WebDriverWait(self.driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "textarea, input[placeholder*='Ask']"))
+            await browser.wait_for(
+                EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_INPUT_SELECTOR)), 15
             )
 
-            self.session_active = True
-            logger.info("✅ Успешно авторизованы в Perplexity")
+            # Сохраняем сессию для следующих запусков
+            self.session_store.save_cookies(worker.worker_id, await browser.get_cookies())
+
+            worker.session_active = True
+            worker.stats.logins += 1
+            logger.info(f"✅ Воркер {worker.worker_id} авторизован в Perplexity")
             return True
 
+        except TimeoutException as e:
+            logger.error(f"❌ Ошибка авторизации воркера {worker.worker_id} в Perplexity: {e.msg}")
+            return False
+
+        except WebDriverException:
+            # Браузер упал: pool.checkout перезапустит воркер
+            logger.error(f"❌ Браузер воркера {worker.worker_id} недоступен при авторизации")
+            raise
+
         except Exception as e:
-            logger.error(f"❌ Ошибка авторизации в Perplexity: {e}")
+            logger.error(f"❌ Ошибка авторизации воркера {worker.worker_id} в Perplexity: {e}")
             return False
 
-    async def execute_perplexity_query(self, query: str) -> Optional[str]:
-        """Выполнение запроса в Perplexity"""
+    async def stream_perplexity_query(self, query: str) -> AsyncIterator[AnswerChunk]:
+        """Потоковое выполнение запроса: фрагменты ответа по мере отрисовки.
+
+        Последовательность: chunk... -> complete (полный текст) -> sources.
+        Кэшированный ответ отдается одним фрагментом complete.
+        """
 
-        # Проверяем лимиты
-        if self.queries_used_today >= self.max_daily_queries:
+        # Проверяем лимиты с учетом запросов, которые уже выполняются
+        if self.queries_used_today + self.queries_in_flight >= self.max_daily_queries:
             logger.warning(f"⚠️ Достигнут дневной лимит запросов: {self.max_daily_queries}")
-            return None
+            return
+
+        # Проверяем дубликаты, включая почти одинаковые формулировки
+        with tracing.span('query_cache.lookup') as lookup_span:
+            cached = await self.query_cache.lookup(query)
+            lookup_span.set(hit=bool(cached))
+        CACHE_LOOKUPS.inc(result='hit' if cached else 'miss')
+        if cached:
+            logger.info("📋 Найден кэшированный ответ для запроса (%s, %s)", cached.kind, cached.tier)
+            yield AnswerChunk('complete', cached.response, cached.response, 0.0)
+            return
 
-        # Проверяем дубликаты
         query_hash = hashlib.md5(query.encode()).hexdigest()
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT response FROM perplexity_queries WHERE query_hash = ? AND success = TRUE", (query_hash,))
-        existing = cursor.fetchone()
-
-        if existing:
-            logger.info(f"📋 Найден кэшированный ответ для запроса")
-            return existing[0]
+        normalized_query, query_simhash, expires_at = self.query_cache.cache_fields(query)
 
+        self.queries_in_flight += 1
         try:
-            if not self.session_active:
-                await self.login_to_perplexity()
-
-            # Находим поле ввода
-            search_input = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "textarea, input[placeholder*='Ask']"))
-            )
-
-            # Очищаем и вводим запрос
-            search_input.clear()
-            search_input.send_keys(query)
-            await asyncio.sleep(1)
-
-            # Отправляем запрос
-            submit_button = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit'], button[aria-label*='Submit']")
-            submit_button.click()
-
-            # Ждем ответ (может занять до 30 секунд)
-            logger.info(f"⏳ Ожидаем ответ от Perplexity на запрос: {query[:50]}...")
-
-            # Ждем появления результата
-            response_element = WebDriverWait(self.driver, 45).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='response'], .prose, .answer"))
-            )
-
-            # Извлекаем текст ответа
-            response_text = response_element.text
+            checkout_span = tracing.start_span('driver_pool.checkout')
+            async with self.pool.checkout() as worker:
+                checkout_span.end()
+                if not worker.session_active:
+                    with tracing.span('perplexity.login', worker=worker.worker_id):
+                        logged_in = await self.login_to_perplexity(worker)
+                    if not logged_in:
+                        self.governor.record_error()
+                        return
+
+                browser = worker.browser
+
+                # Находим поле ввода
+                with tracing.span('perplexity.wait_input'):
+                    search_input = await browser.wait_for(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_INPUT_SELECTOR)), 10
+                    )
 
-            # Извлекаем источники
-            try:
-                sources_elements = self.driver.find_elements(By.CSS_SELECTOR, "[data-testid='source'], .source, .citation")
-                sources = [elem.get_attribute('href') or elem.text for elem in sources_elements[:5]]
-            except:
-                sources = []
-
-            # Сохраняем в БД
-            cursor.execute("""
-                INSERT OR REPLACE INTO perplexity_queries 
-                (query, response, query_hash, success) 
-                VALUES (?, ?, ?, TRUE)
-            """, (query, response_text, query_hash))
-            self.conn.commit()
+                # Очищаем и вводим запрос
+                await search_input.clear()
+                await search_input.send_keys(query)
+                await asyncio.sleep(1)
+
+                # Старые ответы на странице не должны считаться новым
+                await prepare_answer_watch(browser)
+
+                # Ждем своей очереди по темпу запросов (REQUESTS_PER_MINUTE) уже на
+                # свободном браузере: токен, взятый до ожидания воркера, выпускал бы
+                # отправки пачкой, когда освобождаются браузеры
+                with tracing.span('perplexity.rate_wait'):
+                    await self.governor.acquire()
+
+                # Отправляем запрос
+                submit_button = await browser.find_element(By.CSS_SELECTOR, "button[type='submit'], button[aria-label*='Submit']")
+                submitted_at = time.perf_counter()
+                await submit_button.click()
+
+                logger.info("⏳ Воркер %s ожидает ответ от Perplexity на запрос: %.50s...", worker.worker_id, query)
+
+                # Отдаем фрагменты, пока ответ не перестанет печататься
+                # (отрезок не активируется: между yield выполняется код вызывающего)
+                answer_span = tracing.start_span('perplexity.answer', worker=worker.worker_id)
+                final = None
+                async for chunk in stream_answer(browser, Config.ANSWER_QUIET_MS, Config.ANSWER_TIMEOUT_SECONDS):
+                    if chunk.final:
+                        final = chunk
+                        break
+                    yield chunk
+
+                answer_latency_ms = int((time.perf_counter() - submitted_at) * 1000)
+                answer_span.set(status=final.status if final else 'empty', chars=len(final.text) if final else 0)
+                answer_span.end()
+
+                if final is None or not final.text.strip():
+                    raise TimeoutException(f"ответ не появился за {Config.ANSWER_TIMEOUT_SECONDS} с")
+                if final.status == 'timeout':
+                    logger.warning("⚠️ Ответ не завершился за %s с, используем то, что успело загрузиться", Config.ANSWER_TIMEOUT_SECONDS)
+
+                response_text = final.text
+                self.answer_latencies.append(answer_latency_ms)
+                self.governor.record_success(answer_latency_ms / 1000)
+                QUERY_LATENCY.observe(answer_latency_ms / 1000)
+                QUERY_RESULTS.inc(result='success')
+
+                # Финальный текст отдаем до загрузки источников:
+                # разбор и маршрутизация поста начинаются сразу
+                yield AnswerChunk('complete', final.delta, response_text, final.elapsed_ms)
+
+                # Извлекаем источники
+                with tracing.span('perplexity.sources') as sources_span:
+                    try:
+                        sources_elements = await browser.find_elements(By.CSS_SELECTOR, "[data-testid='source'], .source, .citation")
+                        sources = [await elem.get_attribute('href') or await elem.text() for elem in sources_elements[:5]]
+                    except:
+                        sources = []
+                    sources_span.set(count=len(sources))
+
+                worker.stats.queries += 1
+
+            # Сохраняем в БД без ожидания: запись попадет в одну транзакцию
+            # с постом, который создается из этого ответа
+            saved = self.db.submit_answer(query, response_text, query_hash, answer_latency_ms,
+                                          normalized_query, query_simhash, expires_at)
+            self._track_write(self._cache_saved_answer(saved, query, response_text, expires_at))
 
             self.queries_used_today += 1
-            logger.info(f"✅ Получен ответ от Perplexity ({len(response_text)} символов)")
+            logger.info("✅ Получен ответ от Perplexity (%d символов, %d мс)", len(response_text), answer_latency_ms)
 
-            return response_text
+            yield AnswerChunk('sources', '', response_text, final.elapsed_ms, sources=sources)
 
         except TimeoutException:
             logger.error("⏰ Timeout при ожидании ответа от Perplexity")
-            return None
+            self.governor.record_error()
+            QUERY_RESULTS.inc(result='timeout')
 
         except Exception as e:
-            logger.error(f"❌ Ошибка выполнения запроса: {e}")
-            return None
-
-    def parse_perplexity_response(self, response: str, query_context: str) -> Optional[NewsPost]:
-        """Парсинг ответа Perplexity в структурированный пост"""
-
+            logger.error("❌ Ошибка выполнения запроса: %s", e)
+            self.governor.record_error()
+            QUERY_RESULTS.inc(result='error')
+
+        finally:
+            self.queries_in_flight -= 1
+
+    def _track_write(self, coro) -> asyncio.Task:
+        """Фоновая задача, завершения которой дожидается cleanup()"""
+        task = asyncio.create_task(coro)
+        self.pending_writes.add(task)
+        task.add_done_callback(self.pending_writes.discard)
+        return task
+
+    async def _cache_saved_answer(self, saved, query: str, response_text: str, expires_at: str):
+        """Индексация ответа в кэше после его записи в БД"""
         try:
-            # Извлекаем основные элементы из ответа
-            lines = response.split('\n')
-
-            # Ищем заголовок (обычно первая строка или после маркеров)
-            title = ""
-            for line in lines[:5]:
-                if len(line.strip()) > 20 and not line.startswith('http'):
-                    title = line.strip()
-                    break
-
-            if not title:
-                title = query_context[:60] + "..."
-
-            # Создаем краткое содержание (первые 2-3 предложения)
-            sentences = re.split(r'[.!?]', response)
-            summary_sentences = []
-            for sentence in sentences[:3]:
-                if len(sentence.strip()) > 20:
-                    summary_sentences.append(sentence.strip())
-
-            summary = '. '.join(summary_sentences)
-            if summary and not summary.endswith('.'):
-                summary += '.'
-
-            # Определяем категорию на основе ключевых слов
-            response_lower = response.lower()
-            category = "it"  # По умолчанию
-
-            if any(word in response_lower for word in ['робот', 'robot', 'automation', 'автоматизац']):
-                if any(word in response_lower for word in ['промышл', 'industrial', 'manufacturing']):
-                    category = "automation"
-                else:
-                    category = "robotics"
-            elif any(word in response_lower for word in ['ai', 'artificial intelligence', 'машинное обучение', 'нейрон']):
-                category = "ai"
-
-            # Оцениваем важность (1-10)
-            importance = 5  # Базовая важность
-
-            importance_indicators = {
-                'breakthrough': +3, 'прорыв': +3,
-                'revolutionary': +2, 'революц': +2,
-                'major': +2, 'крупн': +2,
-                'significant': +1, 'значител': +1,
-                'funding': +1, 'финансирован': +1,
-                'acquisition': +2, 'поглощен': +2,
-                'partnership': +1, 'партнерств': +1
-            }
+            row_id, _ = await asyncio.wrap_future(saved)
+            await self.query_cache.add(row_id, query, response_text, expires_at)
+        except Exception as e:
+            logger.error("❌ Ошибка сохранения ответа в БД: %s", e)
 
-            for keyword, score in importance_indicators.items():
-                if keyword in response_lower:
-                    importance += score
-
-            importance = min(max(importance, 1), 10)
-
-            # Извлекаем ключевые слова
-            keywords = []
-            common_tech_terms = [
-                'AI', 'ИИ', 'машинное обучение', 'neural networks', 'blockchain',
-                'cloud', 'облако', 'automation', 'robotics', 'IoT', 'API',
-                'стартап', 'startup', 'инвестиции', 'funding'
-            ]
-
-            for term in common_tech_terms:
-                if term.lower() in response_lower:
-                    keywords.append(term)
-
-            keywords = keywords[:5]  # Ограничиваем количество
-
-            # Определяем целевые каналы
-            telegram_channels = []
-            if category == "it":
-                telegram_channels.append("it_news")
-            elif category == "automation": 
-                telegram_channels.append("automation")
-            elif category == "robotics":
-                telegram_channels.append("robotics")
-            elif category == "ai":
-                telegram_channels.extend(["it_news", "automation"])
-
-            # Если важность высокая, отправляем во все каналы
-            if importance >= 8:
-                telegram_channels = ["it_news", "automation", "robotics"]
-
-            return NewsPost(
-                title=title[:120],  # Ограничиваем длину заголовка
-                summary=summary[:500],  # Ограничиваем длину описания
-                category=category,
-                importance=importance,
-                keywords=keywords,
-                sources=[],  # Заполнится позже
-                telegram_channels=telegram_channels,
-                raw_response=response,
-                created_at=datetime.now()
-            )
+    async def execute_perplexity_query(self, query: str) -> Optional[str]:
+        """Выполнение запроса в Perplexity на свободном браузере пула"""
+        response_text = None
 
-        except Exception as e:
-            logger.error(f"❌ Ошибка парсинга ответа Perplexity: {e}")
-            return None
+        async for chunk in self.stream_perplexity_query(query):
+            if chunk.final:
+                response_text = chunk.text
 
-    async def create_news_post_from_query(self, query: str) -> Optional[NewsPost]:
-        """Создание новостного поста из запроса"""
+        return response_text
 
-        # Выполняем запрос к Perplexity
-        response = await self.execute_perplexity_query(query)
-        if not response:
-            return None
+    # Разбор ответа вынесен в news_parser (используется и при повторном разборе)
+    extract_title = staticmethod(extract_title)
+    extract_summary = staticmethod(extract_summary)
 
-        # Парсим ответ
-        post = self.parse_perplexity_response(response, query)
+    def parse_perplexity_response(self, response: str, query_context: str,
+                                  title: Optional[str] = None,
+                                  summary: Optional[str] = None) -> Optional[NewsPost]:
+        """Парсинг ответа Perplexity в структурированный пост"""
+        started = time.perf_counter()
+        try:
+            return parse_response(response, query_context, title=title, summary=summary)
+        finally:
+            PARSE_SECONDS.observe(time.perf_counter() - started)
+
+    async def fetch_answer(self, query: str) -> Optional[CapturedAnswer]:
+        """Выполнение запроса; заголовок и краткое содержание ищутся по мере печати ответа.
+
+        Ответ возвращается, как только Perplexity закончил печатать: разбор
+        идет, пока браузер собирает источники. Остаток потока дочитывается в
+        фоне (answer.rest), чтобы запрос сохранился в БД.
+        """
+
+        title = None
+        summary = None
+
+        stream = self.stream_perplexity_query(query)
+        async for chunk in stream:
+            if chunk.status == 'chunk':
+                if title is None:
+                    title = self.extract_title(chunk.text, query, complete=False)
+                if summary is None:
+                    summary = self.extract_summary(chunk.text, complete=False)
+
+            elif chunk.final:
+                answer = CapturedAnswer(query, chunk.text, title, summary)
+                answer.rest = self._track_write(self._read_sources(stream, answer))
+                return answer
+
+        return None
+
+    async def _read_sources(self, stream: AsyncIterator[AnswerChunk], answer: CapturedAnswer):
+        """Источники из остатка потока (после complete)"""
+        async for chunk in stream:
+            if chunk.status == 'sources':
+                answer.sources = chunk.sources
+
+    async def build_post(self, answer: CapturedAnswer) -> Optional[NewsPost]:
+        """Разбор и оценка ответа, сохранение поста в БД"""
+
+        with tracing.span('parse', chars=len(answer.text)):
+            post = self.parse_perplexity_response(answer.text, answer.query, title=answer.title, summary=answer.summary)
         if not post:
             return None
 
-        # Сохраняем в БД
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO news_posts 
-            (title, summary, category, importance, keywords, sources, telegram_channels, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'ready')
-        """, (
-            post.title,
-            post.summary, 
-            post.category,
-            post.importance,
-            json.dumps(post.keywords),
-            json.dumps(post.sources),
-            json.dumps(post.telegram_channels)
-        ))
-        self.conn.commit()
-
-        logger.info(f"📝 Создан пост: {post.title} (важность: {post.importance})")
-        return post
-
-    async def publish_to_telegram(self, post: NewsPost):
-        """Публикация поста в Telegram каналы"""
-
-        # Форматируем сообщение
-        emoji_map = {
-            'it': '💻',
-            'automation': '🤖',
-            'robotics': '⚙️', 
-            'ai': '🧠'
-        }
+        # Источники собирались во время разбора; после них ответ уже в очереди
+        # записи, и пост попадает в БД после своего запроса
+        with tracing.span('perplexity.wait_sources'):
+            await answer.wait_sources()
+        if answer.sources:
+            post.sources = answer.sources
 
-        emoji = emoji_map.get(post.category, '📰')
-
-        # Индикатор важности
-        importance_emoji = ""
-        if post.importance >= 9:
-            importance_emoji = "🔥🔥 "
-        elif post.importance >= 7:
-            importance_emoji = "🔥 "
-
-        # Формируем хештеги
-        hashtags = [f"#{keyword.replace(' ', '_')}" for keyword in post.keywords[:3]]
-        hashtags.append(f"#{post.category}")
+        # Сохраняем в БД
+        with tracing.span('db.save_post'):
+            post.id = await self.db.save_news_post(post, query_hash=hashlib.md5(answer.query.encode()).hexdigest())
+        tracing.annotate(post_id=post.id, title=post.title[:80], importance=post.importance)
 
-        message = f"""
-{emoji} **{importance_emoji}{post.title}**
+        logger.info("📝 Создан пост: %s (важность: %s)", post.title, post.importance)
+        return post
 
-{post.summary}
+    async def create_news_post_from_query(self, query: str) -> Optional[NewsPost]:
+        """Создание новостного поста из запроса"""
 
-{' '.join(hashtags)}
-📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}
+        with tracing.trace('create_news_post', query=query[:200]):
+            answer = await self.fetch_answer(query)
+            if not answer:
+                return None
+            return await self.build_post(answer)
 
-#технологии #новости
-        """.strip()
+    def is_duplicate(self, post: NewsPost) -> bool:
+        """Та же история уже отправлялась в эти каналы - пост помечается и не публикуется"""
+        duplicate = self.dedup_index.check_and_add(post)
+        if not duplicate:
+            return False
 
-        published_channels = []
+        logger.info("🧬 Дубликат поста #%s (сходство %.2f): %.50s...", duplicate.post_id, duplicate.similarity, post.title)
+        if post.id is not None:
+            self.db.submit("UPDATE news_posts SET status = 'duplicate' WHERE id = ?", (post.id,))
+        return True
 
-        # Публикуем в каналы
-        for channel_key in post.telegram_channels:
-            if channel_key in self.channels:
-                try:
-                    chat_id = self.channels[channel_key]
-                    result = await self.telegram_bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        parse_mode='Markdown'
-                    )
+    async def publish_to_telegram(self, post: NewsPost):
+        """Публикация поста в Telegram каналы"""
 
-                    published_channels.append(f"{channel_key}:{result.message_id}")
-                    logger.info(f"📤 Опубликовано в {channel_key}")
+        with tracing.trace('publish_post', post_id=post.id):
+            if self.is_duplicate(post):
+                return False
 
-                    # Пауза между отправками
-                    await asyncio.sleep(2)
+            return await self.deliver(post)
 
-                except TelegramError as e:
-                    logger.error(f"❌ Ошибка отправки в {channel_key}: {e}")
+    async def deliver(self, post: NewsPost) -> bool:
+        """Доставка поста, уже проверенного на дубликаты"""
 
-        # Обновляем статус в БД
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE news_posts 
-            SET status = 'published', published_at = ?, telegram_message_ids = ?
-            WHERE title = ? AND created_at = ?
-        """, (datetime.now(), json.dumps(published_channels), post.title, post.created_at))
-        self.conn.commit()
+        # Доставка через очередь: повторы при ошибках, статус поста обновит обработчик.
+        # В режиме дайджеста True означает постановку в очередь, а не отправку
+        delivered = False
+        try:
+            delivered = await self.outbox.publish(post)
+            return delivered
+        finally:
+            if not delivered:
+                # История не ушла в каналы: ее следующий пересказ - не дубликат
+                self.dedup_index.discard(post.id)
 
-        return len(published_channels) > 0
+    async def recover_ready_posts(self) -> int:
+        """Восстановление доставки после перезапуска (см. TelegramOutbox.recover_ready_posts)"""
+        return await self.outbox.recover_ready_posts(self.is_duplicate)
 
 # Предопределенные запросы для разных сессий
 NEWS_QUERIES = {
@@ -508,82 +621,112 @@ NEWS_QUERIES = {
 class NewsScheduler:
     """Планировщик новостных сессий"""
 
-    def __init__(self, automation: PerplexityAutomation):
+    def __init__(self, automation: PerplexityAutomation, loop_monitor: Optional[LoopLatencyMonitor] = None):
         self.automation = automation
+        self.loop_monitor = loop_monitor
         self.setup_schedule()
 
-    def setup_schedule(self):
-        """Настройка расписания"""
-
-        # Утренняя сессия - 09:00
-        schedule.every().day.at("09:00").do(
-            lambda: asyncio.create_task(self.run_session("morning", 3))
-        )
+        # Посты дайджеста учитываются как опубликованные после отправки дайджеста
+        automation.outbox.add_delivery_listener(self.on_post_delivered)
 
-        # Дневная сессия - 13:00
-        schedule.every().day.at("13:00").do(
-            lambda: asyncio.create_task(self.run_session("afternoon", 4))
-        )
-
-        # Вечерняя сессия - 18:00
-        schedule.every().day.at("18:00").do(
-            lambda: asyncio.create_task(self.run_session("evening", 5))
+    def setup_schedule(self):
+        """Настройка расписания: сессии и их время из Config.SESSIONS_CONFIG"""
+
+        self.sessions = Config.get_schedule_config()
+        self.scheduler = SessionScheduler(
+            self.sessions,
+            lambda name: self.run_session(name, self.sessions[name].target_posts),
+            overlap=Config.SCHEDULER_OVERLAP_POLICY,
+            misfire=Config.SCHEDULER_MISFIRE_POLICY,
+            misfire_grace_seconds=Config.SCHEDULER_MISFIRE_GRACE_SECONDS
         )
 
-        # Ночная сессия - 22:00
-        schedule.every().day.at("22:00").do(
-            lambda: asyncio.create_task(self.run_session("night", 3))
-        )
+    async def run(self):
+        """Запуск сессий по расписанию (до остановки планировщика)"""
+        await self.scheduler.run()
 
-    async def run_session(self, session_name: str, target_posts: int):
-        """Запуск новостной сессии"""
+    async def run_session(self, session_name: str, target_posts: int) -> Dict:
+        """Запуск новостной сессии; возвращает итоги и статистику стадий"""
 
         logger.info(f"🚀 Запуск сессии '{session_name}' (цель: {target_posts} постов)")
 
         queries = NEWS_QUERIES.get(session_name, [])
         posts_created = 0
-        posts_published = 0
-
-        # Перемешиваем запросы для разнообразия
-        import random
-        selected_queries = random.sample(queries, min(len(queries), target_posts * 3))
 
-        for query in selected_queries[:target_posts * 2]:  # Берем с запасом
-            if posts_created >= target_posts:
-                break
-
-            try:
-                # Создаем пост
-                post = await self.automation.create_news_post_from_query(query)
-                if not post:
-                    continue
+        # Бюджет сессии тратится сначала на шаблоны, которые чаще дают публикации
+        session = Config.get_schedule_config().get(session_name)
+        budget = session.queries_budget if session else target_posts * 2
+        candidates = await self.automation.planner.plan(queries, budget)
+
+        async def parse_stage(answer: CapturedAnswer) -> Optional[NewsPost]:
+            nonlocal posts_created
+            post = await self.automation.build_post(answer)
+            if not post or posts_created >= target_posts:
+                return None
+            posts_created += 1
+            return post
+
+        async def dedupe_stage(post: NewsPost) -> Optional[NewsPost]:
+            # Публикуем если важность достаточная
+            if post.importance < Config.MIN_IMPORTANCE_TO_PUBLISH or self.automation.is_duplicate(post):
+                return None
+            return post
+
+        # Запросы выполняются на всех браузерах пула; пока Perplexity печатает
+        # следующий ответ, предыдущий пост разбирается, сохраняется и доставляется.
+        # Публикации ждут доставки параллельно; в режиме дайджеста deliver
+        # возвращается сразу после постановки поста в очередь
+        pipeline = Pipeline([
+            Stage('query', self.automation.fetch_answer, workers=self.automation.pool.size),
+            Stage('parse', parse_stage),
+            Stage('dedupe', dedupe_stage),
+            Stage('publish', self.automation.deliver, workers=max(target_posts, 1))
+        ], trace_name='post')
+        published = await pipeline.run(candidates, keep_feeding=lambda: posts_created < target_posts)
+        accepted = sum(1 for result in published if result)
+
+        # Посты дайджеста только поставлены в очередь: опубликованными их
+        # учтет on_post_delivered, если отправка дайджеста удастся
+        posts_queued = accepted if self.automation.outbox.digest_window_seconds else 0
+        posts_published = accepted - posts_queued
+
+        logger.info(f"📊 Стадии сессии '{session_name}': {pipeline.get_stats()}")
+
+        logger.info(f"✅ Сессия '{session_name}' завершена: создано {posts_created}, опубликовано {posts_published}, "
+                    f"в очереди дайджеста {posts_queued}")
+
+        if self.loop_monitor:
+            logger.info(f"⏱️ Задержка event loop: {self.loop_monitor.get_stats()}")
+
+        planner_stats = self.automation.get_planner_stats()
+        logger.info(f"🎯 Публикаций на запрос за {planner_stats['history_days']} дн.: {planner_stats['published_per_query']}")
 
-                posts_created += 1
-
-                # Публикуем если важность достаточная
-                if post.importance >= 6:
-                    success = await self.automation.publish_to_telegram(post)
-                    if success:
-                        posts_published += 1
-
-                # Пауза между запросами
-                await asyncio.sleep(30)  # 30 секунд между запросами
+        # Обновляем статистику
+        self.update_daily_stats(posts_created, posts_published)
 
-            except Exception as e:
-                logger.error(f"❌ Ошибка в сессии {session_name}: {e}")
+        return {
+            'posts_created': posts_created,
+            'posts_published': posts_published,
+            'posts_queued': posts_queued,
+            'pipeline': pipeline.get_stats()
+        }
 
-        logger.info(f"✅ Сессия '{session_name}' завершена: создано {posts_created}, опубликовано {posts_published}")
+    def on_post_delivered(self, post_id: int, status: str):
+        """Итог доставки поста, которого сессия не ждала (дайджест, восстановленные посты)"""
+        if status != 'published':
+            return
 
-        # Обновляем статистику
-        self.update_daily_stats(posts_created, posts_published)
+        self.automation.db.submit("""
+            INSERT INTO daily_stats (date, posts_published) VALUES (?, 1)
+            ON CONFLICT(date) DO UPDATE SET posts_published = COALESCE(posts_published, 0) + 1
+        """, (datetime.now().date().isoformat(),))
 
     def update_daily_stats(self, posts_created: int, posts_published: int):
         """Обновление дневной статистики"""
 
         today = datetime.now().date().isoformat()
-        cursor = self.automation.conn.cursor()
 
-        cursor.execute("""
+        self.automation.db.submit("""
             INSERT OR REPLACE INTO daily_stats 
             (date, queries_used, posts_created, posts_published)
             VALUES (?, 
@@ -592,8 +735,6 @@ class NewsScheduler:
                     COALESCE((SELECT posts_published FROM daily_stats WHERE date = ?), 0) + ?)
         """, (today, today, self.automation.queries_used_today, today, posts_created, today, posts_published))
 
-        self.automation.conn.commit()
-
 async def main():
     """Главная функция запуска системы"""
 
@@ -611,7 +752,21 @@ async def main():
 
     # Создаем и запускаем систему
     automation = PerplexityAutomation(credentials)
-    scheduler = NewsScheduler(automation)
+    loop_monitor = LoopLatencyMonitor()
+    loop_monitor.start()
+    asyncio.create_task(automation.query_cache.run_eviction(Config.QUERY_CACHE_EVICTION_INTERVAL))
+    scheduler = NewsScheduler(automation, loop_monitor)
+    await automation.recover_ready_posts()
+
+    # Трассы постов (JSON lines в формате OTLP) для команды traces
+    if Config.TRACING_ENABLED:
+        tracing.configure(Config.TRACE_FILE)
+
+    # /metrics и /health для Prometheus и healthcheck контейнера
+    if Config.METRICS_ENABLED:
+        REGISTRY.add_collector(automation.collect_metrics)
+        await MetricsServer(Config.HEALTH_HOST, Config.HEALTH_PORT,
+                            health=lambda: {'database': automation.db.writer.is_alive()}).start()
 
     logger.info("🚀 Система автоматизации новостей запущена")
 
@@ -620,14 +775,21 @@ async def main():
         "Последние новости искусственного интеллекта за сегодня"
     )
 
-    if test_post and test_post.importance >= 6:
+    if test_post and test_post.importance >= Config.MIN_IMPORTANCE_TO_PUBLISH:
         await automation.publish_to_telegram(test_post)
         logger.info("✅ Тестовый пост успешно создан и опубликован")
 
-    # Основной цикл планировщика
-    while True:
-        schedule.run_pending()
-        await asyncio.sleep(60)  # Проверяем каждую минуту
+    # Основной цикл планировщика: ожидание до ближайшей сессии
+    logger.info(f"📅 Следующие сессии: {scheduler.scheduler.get_stats()['next_runs']}")
+    await scheduler.run()
 
 if __name__ == "__main__":
+    # Логирование настраивается при запуске, а не при импорте модуля
+    setup_queued_logging(
+        Config.LOG_LEVEL,
+        Config.LOG_FILE,
+        max_bytes=Config.MAX_LOG_FILE_SIZE * 1024 * 1024,
+        when=Config.LOG_ROTATION_WHEN,
+        backup_count=Config.LOG_BACKUP_COUNT
+    )
     asyncio.run(main())
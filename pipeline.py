@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Session Pipeline for Perplexity Pro News Automation System
+==========================================================
+
+Конвейер сессии: запрос -> разбор и оценка -> проверка дубликатов ->
+публикация. Стадии связаны ограниченными очередями asyncio, каждая стадия
+обслуживается своими воркерами, поэтому доставка в Telegram и запись в БД
+поста N идут, пока Perplexity печатает ответ на запрос N+1. Полная очередь
+притормаживает предыдущую стадию, а не копит работу в памяти.
+
+Обработчик стадии получает элемент и возвращает элемент для следующей
+стадии или None, если элемент дальше не идет. По завершении доступна
+статистика: обработано, отброшено, ошибок, загрузка воркеров и глубина
+входной очереди каждой стадии (у первой стадии очереди нет - она берет
+элементы из источника).
+
+С trace_name каждый элемент получает свою трассу (tracing.py): корневой
+отрезок от подачи элемента до выхода из конвейера и отрезок на каждую
+стадию. Обработчик выполняется в контексте элемента, поэтому отрезки внутри
+обработчиков вкладываются в отрезок стадии.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+import tracing
+from metrics import STAGE_QUEUE_DEPTH, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока элементов
+_DONE = object()
+
+@dataclass
+class Stage:
+    """Стадия конвейера: обработчик и число воркеров"""
+    name: str
+    handler: Callable[[Any], Awaitable[Optional[Any]]]
+    workers: int = 1
+
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_depth: int = 0
+    depth_samples: List[int] = field(default_factory=list)
+    durations: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def get_stats(self, wall_seconds: float) -> Dict:
+        capacity = wall_seconds * self.workers
+        stats = {
+            'workers': self.workers,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'utilization': round(self.busy_seconds / capacity, 3) if capacity else 0.0,
+            'queue_max_depth': self.max_depth,
+            'queue_avg_depth': round(sum(self.depth_samples) / len(self.depth_samples), 2) if self.depth_samples else 0.0
+        }
+
+        if self.durations:
+            ordered = sorted(self.durations)
+            percentile = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+            stats['latency_ms'] = {'p50': percentile(0.5), 'p95': percentile(0.95), 'max': round(ordered[-1] * 1000, 1)}
+
+        return stats
+
+class Pipeline:
+    """Стадии с ограниченными очередями между ними"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 2, trace_name: Optional[str] = None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.trace_name = trace_name
+        self.wall_seconds = 0.0
+
+    async def run(self, items: Iterable[Any], keep_feeding: Callable[[], bool] = lambda: True) -> List[Any]:
+        """Пропустить элементы через все стадии; возвращает выход последней стадии.
+
+        keep_feeding проверяется перед подачей каждого элемента: False
+        прекращает подачу, уже поданные элементы обрабатываются до конца.
+        """
+        def end_trace(context: Optional[contextvars.Context], error: Optional[Exception] = None, **attributes):
+            # Элемент вышел из конвейера: завершаем и выгружаем его трассу
+            if context is None:
+                return
+            root = context.run(tracing.current_span)
+            root.set(**attributes)
+            root.end(error)
+
+        # Первая стадия берет элементы прямо из источника, когда воркер
+        # свободен: лишние запросы не начинаются после keep_feeding() == False
+        source = iter(items)
+        queues = [None] + [asyncio.Queue(maxsize=max(self.queue_size, stage.workers)) for stage in self.stages[1:]]
+        results: List[Any] = []
+        started = time.perf_counter()
+
+        async def next_item(index: int, stage: Stage):
+            if index == 0:
+                item = next(source, _DONE) if keep_feeding() else _DONE
+                if item is _DONE or not self.trace_name or not tracing.enabled():
+                    return item, None
+                # Контекст элемента: корень трассы становится текущим отрезком
+                context = contextvars.copy_context()
+                context.run(tracing.trace(self.trace_name, item=str(item)[:200]).__enter__)
+                return item, context
+
+            inbox = queues[index]
+            depth = inbox.qsize()
+            stage.depth_samples.append(depth)
+            stage.max_depth = max(stage.max_depth, depth)
+            STAGE_QUEUE_DEPTH.set(depth, stage=stage.name)
+            return await inbox.get()
+
+        async def call(stage: Stage, item: Any):
+            with tracing.span(stage.name):
+                return await stage.handler(item)
+
+        async def work(index: int, stage: Stage):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+
+            while True:
+                item, context = await next_item(index, stage)
+                if item is _DONE:
+                    return
+
+                began = time.perf_counter()
+                try:
+                    if context is None:
+                        result = await stage.handler(item)
+                    else:
+                        result = await asyncio.create_task(call(stage, item), context=context)
+                except Exception as e:
+                    stage.errors += 1
+                    logger.error("❌ Ошибка стадии '%s': %s", stage.name, e)
+                    end_trace(context, e)
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - began
+                    stage.busy_seconds += elapsed
+                    stage.durations.append(elapsed)
+                    STAGE_SECONDS.observe(elapsed, stage=stage.name)
+
+                if result is None:
+                    stage.dropped += 1
+                    end_trace(context, dropped_at=stage.name)
+                    continue
+
+                stage.processed += 1
+                if outbox is None:
+                    results.append(result)
+                    end_trace(context)
+                else:
+                    await outbox.put((result, context))
+
+        async def run_stage(index: int, stage: Stage):
+            await asyncio.gather(*(work(index, stage) for _ in range(stage.workers)))
+            # Все воркеры стадии закончили - завершаем следующую
+            if index + 1 < len(queues):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put((_DONE, None))
+
+        try:
+            await asyncio.gather(*(run_stage(index, stage) for index, stage in enumerate(self.stages)))
+        finally:
+            self.wall_seconds = time.perf_counter() - started
+
+        return results
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Статистика стадий за последний запуск"""
+        return {stage.name: stage.get_stats(self.wall_seconds) for stage in self.stages}
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Query Cache for Perplexity Pro News Automation System
+=====================================================
+
+Многоуровневый кэш ответов Perplexity с нормализацией запросов и поиском
+почти одинаковых формулировок:
+
+* память процесса - ограниченный LRU;
+* общий уровень - Redis-совместимый сервер (опционально, REDIS_URL);
+* SQLite - таблица perplexity_queries.
+
+Запросы приводятся к канонической форме (регистр, пробелы, даты, выражения
+времени), а для похожих запросов используется 64-битный SimHash с индексом
+по блокам битов. Срок жизни ответа зависит от шаблона: запросы "за сегодня"
+устаревают в полночь, запросы "прямо сейчас" - через несколько часов.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Общий уровень кэша необязателен
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Формат времени, совместимый с CURRENT_TIMESTAMP в SQLite (UTC)
+SQLITE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SIMHASH_BITS = 64
+
+# Нижняя граница порога сходства (не больше 6 различающихся бит из 64).
+# Запросы одной сессии с общим шаблоном ("новые релизы технологических
+# гигантов за день" / "новые стартапы ...") различаются примерно на 15 бит:
+# при пороге 0.75 они совпадали бы, и на запрос выдавался бы чужой ответ
+MIN_SIMILARITY_THRESHOLD = 0.9
+
+# Даты, которые подставляются в шаблоны запросов через {date}
+DATE_PATTERNS = [
+    re.compile(r'\b\d{1,2}[./]\d{1,2}[./]\d{2,4}\b'),
+    re.compile(r'\b\d{4}-\d{2}-\d{2}\b'),
+    re.compile(r'\{date\}')
+]
+
+# Разные формулировки одного и того же временного окна
+TIME_PHRASES = [
+    (re.compile(r'(?<!\w)(?:за последние 24 часа|за последние сутки|за последний день|за сутки|за день|за сегодня|сегодня|today|дня)(?!\w)'), ' {today} '),
+    (re.compile(r'(?<!\w)(?:за последние 12 часов|за ночь|overnight)(?!\w)'), ' {night} '),
+    (re.compile(r'(?<!\w)(?:прямо сейчас|сейчас|right now)(?!\w)'), ' {now} ')
+]
+
+PUNCTUATION = re.compile(r'[^\w{}\s-]+')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_query(query: str) -> str:
+    """Каноническая форма запроса для поиска в кэше"""
+    text = query.lower().replace('ё', 'е')
+
+    for pattern in DATE_PATTERNS:
+        text = pattern.sub(' {date} ', text)
+
+    for pattern, replacement in TIME_PHRASES:
+        text = pattern.sub(replacement, text)
+
+    text = PUNCTUATION.sub(' ', text)
+    return WHITESPACE.sub(' ', text).strip()
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+
+def simhash(normalized: str) -> int:
+    """64-битный SimHash по словам и парам соседних слов"""
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = _token_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+def cache_expiry(normalized: str, default_ttl_hours: int, now_ttl_hours: int) -> datetime:
+    """Момент устаревания ответа (UTC) в зависимости от шаблона запроса"""
+    now_utc = datetime.now(timezone.utc)
+
+    if '{now}' in normalized:
+        expires = now_utc + timedelta(hours=now_ttl_hours)
+    elif '{today}' in normalized or '{date}' in normalized or '{night}' in normalized:
+        # Новости "за сегодня" актуальны до локальной полуночи
+        local_now = datetime.now().astimezone()
+        midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        expires = midnight.astimezone(timezone.utc)
+    else:
+        expires = now_utc + timedelta(hours=default_ttl_hours)
+
+    return expires.replace(tzinfo=None, microsecond=0)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _to_signed(value: int) -> int:
+    # SQLite хранит INTEGER как знаковое 64-битное число
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+@dataclass
+class CacheEntry:
+    """Ответ, хранимый в уровнях кэша"""
+    response: str
+    query: str
+    expires_at: datetime
+
+    @property
+    def fresh(self) -> bool:
+        return _utcnow() < self.expires_at
+
+@dataclass
+class CacheHit:
+    """Найденный в кэше ответ"""
+    response: str
+    kind: str  # exact | normalized | similar
+    similarity: float
+    cached_query: str
+    tier: str = 'sqlite'  # memory | shared | sqlite
+
+class TierStats:
+    """Попадания, промахи и время поиска уровня кэша"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def record(self, hit: bool, started: float):
+        self.lookup_seconds += time.perf_counter() - started
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def as_dict(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'avg_lookup_ms': round(self.lookup_seconds / lookups * 1000, 3) if lookups else 0.0
+        }
+
+class MemoryTier:
+    """Ограниченный LRU в памяти процесса"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not entry.fresh:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def evict_expired(self) -> int:
+        stale = [key for key, entry in self.entries.items() if not entry.fresh]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+class SharedTier:
+    """Общий кэш на Redis-совместимом сервере"""
+
+    name = 'shared'
+
+    def __init__(self, url: str, prefix: str = 'pplx:answer:'):
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"⚠️ Общий кэш недоступен: {e}")
+            return None
+        if raw is None:
+            return None
+
+        data = json.loads(raw)
+        entry = CacheEntry(data['response'], data['query'],
+                           datetime.strptime(data['expires_at'], SQLITE_TIME_FORMAT))
+        return entry if entry.fresh else None
+
+    async def set(self, key: str, entry: CacheEntry):
+        ttl = int((entry.expires_at - _utcnow()).total_seconds())
+        if ttl <= 0:
+            return
+        payload = json.dumps({
+            'response': entry.response,
+            'query': entry.query,
+            'expires_at': entry.expires_at.strftime(SQLITE_TIME_FORMAT)
+        })
+        try:
+            # Срок жизни ключа совпадает со сроком свежести ответа
+            await self.client.set(self.prefix + key, payload, ex=ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось записать в общий кэш: {e}")
+
+    async def close(self):
+        await self.client.close()
+
+class QueryCache:
+    """Многоуровневый кэш ответов с поиском почти одинаковых запросов"""
+
+    def __init__(self, db, similarity_threshold: float,
+                 default_ttl_hours: int, now_ttl_hours: int = 3,
+                 memory_entries: int = 256, redis_url: str = ""):
+        if not MIN_SIMILARITY_THRESHOLD <= similarity_threshold <= 1.0:
+            raise ValueError(f"Порог сходства запросов должен быть от {MIN_SIMILARITY_THRESHOLD} до 1.0: {similarity_threshold}")
+
+        self.db = db
+        self.similarity_threshold = similarity_threshold
+        self.default_ttl_hours = default_ttl_hours
+        self.now_ttl_hours = now_ttl_hours
+
+        # Допустимое расстояние Хэмминга; при max_distance + 1 блоках
+        # хотя бы один блок у похожих хэшей совпадает (принцип Дирихле)
+        self.max_distance = int(SIMHASH_BITS * (1 - similarity_threshold))
+        self.bands = min(max(self.max_distance + 1, 1), 16)
+        self.band_bits = SIMHASH_BITS // self.bands
+
+        self.by_normalized: Dict[str, int] = {}
+        self.fingerprints: Dict[int, Tuple[int, datetime]] = {}
+        self.buckets: List[Dict[int, Set[int]]] = [defaultdict(set) for _ in range(self.bands)]
+
+        # Уровни перед SQLite: память процесса и (опционально) общий Redis
+        self.tiers = [MemoryTier(memory_entries)]
+        if redis_url:
+            if aioredis is None:
+                logger.warning("⚠️ REDIS_URL задан, но пакет redis не установлен: общий кэш отключен")
+            else:
+                self.tiers.append(SharedTier(redis_url))
+
+        self.tier_stats = {tier.name: TierStats() for tier in self.tiers}
+        self.tier_stats['sqlite'] = TierStats()
+        self.counters = {'exact': 0, 'normalized': 0, 'similar': 0, 'misses': 0, 'evicted': 0}
+
+        # Колонки кэша создает миграция БД (database.MIGRATIONS); индекс
+        # загружается синхронно при запуске
+        conn = self.db.connect()
+        try:
+            self.load(conn)
+        finally:
+            conn.close()
+
+    def load(self, conn):
+        """Построение индекса по свежим успешным ответам из БД"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, normalized_query, simhash, expires_at
+            FROM perplexity_queries
+            WHERE success = TRUE AND normalized_query IS NOT NULL
+              AND expires_at > datetime('now')
+            ORDER BY id
+        """)
+
+        for row_id, normalized, fingerprint, expires_at in cursor.fetchall():
+            self._index(row_id, normalized, _to_unsigned(fingerprint), self._parse_timestamp(expires_at))
+
+        logger.info(f"📋 Кэш запросов загружен: {len(self.fingerprints)} свежих ответов")
+
+    @staticmethod
+    def _parse_timestamp(value) -> datetime:
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except (TypeError, ValueError):
+            return datetime.min
+
+    @staticmethod
+    def _key(normalized: str) -> str:
+        return hashlib.md5(normalized.encode()).hexdigest()
+
+    def _bands_of(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def _index(self, row_id: int, normalized: str, fingerprint: int, expires_at: datetime):
+        self.by_normalized[normalized] = row_id
+        self.fingerprints[row_id] = (fingerprint, expires_at)
+        for i, band in enumerate(self._bands_of(fingerprint)):
+            self.buckets[i][band].add(row_id)
+
+    def _forget(self, row_id: int):
+        entry = self.fingerprints.pop(row_id, None)
+        if entry is None:
+            return
+        for i, band in enumerate(self._bands_of(entry[0])):
+            self.buckets[i][band].discard(row_id)
+
+    def _is_fresh(self, row_id: int) -> bool:
+        entry = self.fingerprints.get(row_id)
+        return entry is not None and _utcnow() < entry[1]
+
+    async def _fetch(self, row_id: int) -> Optional[Tuple[str, str, str]]:
+        row = await self.db.fetch_one("""
+            SELECT response, query, expires_at FROM perplexity_queries
+            WHERE id = ? AND success = TRUE AND expires_at > datetime('now')
+        """, (row_id,))
+        if row is None:
+            # Запись устарела, заменена или удалена
+            self._forget(row_id)
+        return row
+
+    async def _promote(self, key: str, entry: CacheEntry, below: int):
+        """Копирование найденного ответа в верхние уровни"""
+        for tier in self.tiers[:below]:
+            await tier.set(key, entry)
+
+    async def lookup(self, query: str) -> Optional[CacheHit]:
+        """Поиск ответа: память, общий кэш, SQLite, затем похожие запросы"""
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+
+        for level, tier in enumerate(self.tiers):
+            started = time.perf_counter()
+            entry = await tier.get(key)
+            self.tier_stats[tier.name].record(entry is not None, started)
+
+            if entry is not None:
+                await self._promote(key, entry, level)
+                kind = 'exact' if entry.query == query else 'normalized'
+                self.counters[kind] += 1
+                return CacheHit(entry.response, kind, 1.0, entry.query, tier=tier.name)
+
+        started = time.perf_counter()
+        hit = await self._lookup_sqlite(query, normalized)
+        self.tier_stats['sqlite'].record(hit is not None, started)
+
+        if hit is None:
+            self.counters['misses'] += 1
+            return None
+
+        hit, expires_at = hit
+        self.counters[hit.kind] += 1
+        await self._promote(self._key(normalize_query(hit.cached_query)),
+                            CacheEntry(hit.response, hit.cached_query, expires_at), len(self.tiers))
+        return hit
+
+    async def _lookup_sqlite(self, query: str, normalized: str) -> Optional[Tuple[CacheHit, datetime]]:
+        query_hash = hashlib.md5(query.encode()).hexdigest()
+        existing = await self.db.fetch_one("""
+            SELECT response, expires_at FROM perplexity_queries
+            WHERE query_hash = ? AND success = TRUE AND expires_at > datetime('now')
+        """, (query_hash,))
+
+        if existing:
+            return CacheHit(existing[0], 'exact', 1.0, query), self._parse_timestamp(existing[1])
+
+        row_id = self.by_normalized.get(normalized)
+        if row_id is not None and self._is_fresh(row_id):
+            row = await self._fetch(row_id)
+            if row:
+                return CacheHit(row[0], 'normalized', 1.0, row[1]), self._parse_timestamp(row[2])
+
+        fingerprint = simhash(normalized)
+        best_id, best_distance = None, self.max_distance + 1
+
+        candidates = set()
+        for i, band in enumerate(self._bands_of(fingerprint)):
+            candidates |= self.buckets[i].get(band, set())
+
+        for candidate_id in candidates:
+            if not self._is_fresh(candidate_id):
+                continue
+            distance = bin(fingerprint ^ self.fingerprints[candidate_id][0]).count('1')
+            if distance < best_distance:
+                best_id, best_distance = candidate_id, distance
+
+        if best_id is not None:
+            row = await self._fetch(best_id)
+            if row:
+                similarity = 1 - best_distance / SIMHASH_BITS
+                logger.info("📋 Похожий запрос в кэше (сходство %.2f): %.50s...", similarity, row[1])
+                return CacheHit(row[0], 'similar', similarity, row[1]), self._parse_timestamp(row[2])
+
+        return None
+
+    def cache_fields(self, query: str) -> Tuple[str, int, str]:
+        """Нормализованный запрос, SimHash и срок свежести для сохранения в БД"""
+        normalized = normalize_query(query)
+        expires_at = cache_expiry(normalized, self.default_ttl_hours, self.now_ttl_hours)
+        return normalized, _to_signed(simhash(normalized)), expires_at.strftime(SQLITE_TIME_FORMAT)
+
+    async def add(self, row_id: int, query: str, response: str, expires_at: str):
+        """Добавление сохраненного ответа в индекс и верхние уровни"""
+        normalized = normalize_query(query)
+        expires = datetime.strptime(expires_at, SQLITE_TIME_FORMAT)
+        self._index(row_id, normalized, simhash(normalized), expires)
+        await self._promote(self._key(normalized), CacheEntry(response, query, expires), len(self.tiers))
+
+    async def evict_expired(self) -> int:
+        """Удаление устаревших ответов из индекса, памяти и кэша SQLite.
+
+        Сами ответы остаются в perplexity_queries (они нужны для повторного
+        разбора), но освобождают query_hash, чтобы новый ответ на тот же
+        запрос не заменял архивную запись.
+        """
+        now = _utcnow()
+        stale_ids = [row_id for row_id, (_, expires_at) in self.fingerprints.items() if expires_at <= now]
+        for row_id in stale_ids:
+            self._forget(row_id)
+        self.by_normalized = {
+            normalized: row_id for normalized, row_id in self.by_normalized.items()
+            if row_id in self.fingerprints
+        }
+
+        for tier in self.tiers:
+            if isinstance(tier, MemoryTier):
+                tier.evict_expired()
+
+        _, released = await self.db.write("""
+            UPDATE perplexity_queries SET query_hash = NULL
+            WHERE query_hash IS NOT NULL AND expires_at <= datetime('now')
+        """)
+
+        evicted = len(stale_ids) + released
+        self.counters['evicted'] += evicted
+        if evicted:
+            logger.info(f"🧹 Из кэша удалено устаревших ответов: {evicted}")
+        return evicted
+
+    async def run_eviction(self, interval_seconds: int):
+        """Фоновая периодическая очистка устаревших ответов"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.evict_expired()
+            except Exception as e:
+                logger.error(f"❌ Ошибка очистки кэша: {e}")
+
+    def get_stats(self) -> Dict:
+        """Счетчики попаданий и промахов, статистика по уровням"""
+        hits = self.counters['exact'] + self.counters['normalized'] + self.counters['similar']
+        total = hits + self.counters['misses']
+
+        return {
+            **self.counters,
+            'hits': hits,
+            'hit_ratio': round(hits / total, 3) if total else 0.0,
+            'indexed': len(self.fingerprints),
+            'similarity_threshold': self.similarity_threshold,
+            'tiers': {name: stats.as_dict() for name, stats in self.tier_stats.items()}
+        }
+
+    async def close(self):
+        """Закрытие соединения с общим кэшем"""
+        for tier in self.tiers:
+            if isinstance(tier, SharedTier):
+                await tier.close()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Query Planner for Perplexity Pro News Automation System
+=======================================================
+
+Выбор запросов сессии по их прошлой отдаче. Для каждого шаблона запроса
+из истории (perplexity_queries и созданные по ним news_posts) считается,
+сколько раз он выполнялся и сколько опубликованных постов дал. Пост с
+низкой важностью, дубликат или пустой ответ - запрос без отдачи.
+
+Сессия получает queries_budget запросов по Thompson sampling: для каждого
+шаблона берется случайное значение из Beta(1 + опубликовано,
+1 + выполнено - опубликовано), и выбираются шаблоны с наибольшими
+значениями. Шаблоны с хорошей историей выбираются чаще, новые и редкие
+еще получают шанс проявить себя.
+"""
+
+import logging
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Выполненные запросы и опубликованные посты по ним за окно истории
+HISTORY_SQL = """
+    SELECT q.query,
+           COUNT(DISTINCT q.id),
+           COUNT(DISTINCT CASE WHEN p.status = 'published' THEN q.id END)
+    FROM perplexity_queries q
+    LEFT JOIN news_posts p ON p.query_id = q.id
+    WHERE q.success = TRUE AND q.timestamp >= datetime('now', ?)
+    GROUP BY q.query
+"""
+
+@dataclass
+class TemplateYield:
+    """Отдача шаблона: выполнено запросов и опубликовано постов"""
+    spent: int = 0
+    published: int = 0
+
+    @property
+    def ratio(self) -> float:
+        return self.published / self.spent if self.spent else 0.0
+
+class QueryPlanner:
+    """Выбор запросов сессии с учетом отдачи шаблонов"""
+
+    def __init__(self, db: DatabaseManager, history_days: int = 30, rng: Optional[random.Random] = None):
+        self.db = db
+        self.history_days = history_days
+        self.rng = rng or random.Random()
+        self.yields: Dict[str, TemplateYield] = {}
+
+    async def refresh(self):
+        """Перечитать отдачу шаблонов из БД"""
+        rows = await self.db.fetch_all(HISTORY_SQL, (f"-{self.history_days} days",))
+        self.yields = {query: TemplateYield(spent, published) for query, spent, published in rows}
+
+    def _sample(self, template: str) -> float:
+        stats = self.yields.get(template, TemplateYield())
+        return self.rng.betavariate(1 + stats.published, 1 + stats.spent - stats.published)
+
+    async def plan(self, templates: List[str], budget: int) -> List[str]:
+        """Запросы сессии в порядке выполнения (не больше budget)"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Без истории выбор остается случайным
+            logger.error(f"❌ Ошибка чтения истории запросов: {e}")
+
+        templates = list(dict.fromkeys(templates))
+        ranked = sorted(templates, key=self._sample, reverse=True)
+        return ranked[:budget]
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Отдача по шаблонам: опубликовано постов на выполненный запрос"""
+        stats = {
+            template: {
+                'spent': item.spent,
+                'published': item.published,
+                'published_per_query': round(item.ratio, 3)
+            }
+            for template, item in sorted(self.yields.items(), key=lambda entry: entry[1].ratio, reverse=True)
+        }
+
+        spent = sum(item.spent for item in self.yields.values())
+        published = sum(item.published for item in self.yields.values())
+        return {
+            'history_days': self.history_days,
+            'queries_spent': spent,
+            'posts_published': published,
+            'published_per_query': round(published / spent, 3) if spent else 0.0,
+            'templates': stats
+        }
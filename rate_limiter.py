@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter for Perplexity Pro News Automation System
+======================================================
+
+Асинхронный token bucket: ведро на capacity токенов пополняется со
+скоростью rate токенов в секунду. Ожидающие обслуживаются по очереди,
+ожидание не блокирует event loop. Ведро можно приостановить (например,
+по ответу RetryAfter от Telegram) - токены не выдаются до конца паузы.
+
+AdaptiveRateGovernor задает темп отправки запросов в Perplexity: скользящее
+окно REQUESTS_PER_MINUTE, минимальный интервал и автоматическое замедление
+при ошибках и медленных ответах.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+class TokenBucket:
+    """Ограничение частоты: не больше rate операций в секунду, всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds: float):
+        """Не выдавать токены seconds секунд (и сбросить накопленный запас)"""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated_at = max(self.updated_at, self.paused_until)
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self.paused_until
+
+    async def acquire(self):
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.waited_seconds += now - started
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveRateGovernor:
+    """Темп отправки запросов: не больше max_per_minute за скользящую минуту
+    и не чаще min_interval секунд.
+
+    Ошибки и медленные ответы увеличивают множитель паузы (до max_backoff),
+    нормальные ответы постепенно возвращают его к 1. Множитель растягивает
+    и интервал, и окно: при backoff=2 разрешено вдвое меньше запросов.
+    """
+
+    def __init__(self, max_per_minute: float, min_interval: float = 0.0,
+                 slow_latency_seconds: float = 35.0, max_backoff: float = 8.0, window: float = 60.0):
+        self.max_per_minute = max_per_minute
+        self.min_interval = min_interval
+        self.slow_latency_seconds = slow_latency_seconds
+        self.max_backoff = max_backoff
+        self.window = window
+
+        self.backoff = 1.0
+        self.submitted = deque()
+        self.last_submit = None
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self.errors = 0
+        self.slow_answers = 0
+        self._lock = asyncio.Lock()
+
+    def _delay(self, now: float) -> float:
+        """Сколько ждать до следующей разрешенной отправки"""
+        window = self.window * self.backoff
+        while self.submitted and now - self.submitted[0] >= window:
+            self.submitted.popleft()
+
+        delay = 0.0
+        if len(self.submitted) >= self.max_per_minute:
+            # Самая старая отправка выходит из окна
+            delay = self.submitted[0] + window - now
+        if self.last_submit is not None:
+            delay = max(delay, self.last_submit + self.min_interval * self.backoff - now)
+        return delay
+
+    async def acquire(self):
+        """Дождаться права на отправку запроса"""
+        async with self._lock:
+            started = time.monotonic()
+            waited = False
+            while True:
+                now = time.monotonic()
+                delay = self._delay(now)
+                if delay <= 0:
+                    break
+                waited = True
+                await asyncio.sleep(delay)
+
+            if waited:
+                self.throttled += 1
+                self.waited_seconds += now - started
+            self.submitted.append(now)
+            self.last_submit = now
+
+    def record_success(self, latency_seconds: float):
+        """Ответ получен: медленный ответ увеличивает паузу, нормальный - уменьшает"""
+        if latency_seconds > self.slow_latency_seconds:
+            self.slow_answers += 1
+            self.backoff = min(self.max_backoff, self.backoff * 1.5)
+        else:
+            self.backoff = max(1.0, self.backoff * 0.8)
+
+    def record_error(self):
+        """Запрос не удался: пауза удваивается"""
+        self.errors += 1
+        self.backoff = min(self.max_backoff, self.backoff * 2)
+
+    def get_stats(self) -> Dict:
+        """Текущий темп, множитель паузы и время ожидания"""
+        self._delay(time.monotonic())
+        return {
+            'max_per_minute': self.max_per_minute,
+            'effective_per_minute': round(self.max_per_minute / self.backoff, 2),
+            'backoff': round(self.backoff, 2),
+            'in_window': len(self.submitted),
+            'throttled': self.throttled,
+            'waited_seconds': round(self.waited_seconds, 1),
+            'errors': self.errors,
+            'slow_answers': self.slow_answers
+        }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Bulk Reparse for Perplexity Pro News Automation System
+======================================================
+
+Повторный разбор сохраненных ответов Perplexity после изменения правил
+парсинга - без новых запросов и расхода квоты. Посты читаются порциями
+вместе со своими ответами из perplexity_queries, разбираются в
+ProcessPoolExecutor на всех ядрах, а заголовок, категория, важность,
+ключевые слова и каналы обновляются в тех же строках news_posts (по id)
+одной транзакцией на порцию. Статус и источники поста не меняются.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from database import DatabaseManager
+from news_parser import NewsPost, parse_batch
+
+logger = logging.getLogger(__name__)
+
+# Статус копий, которые создавала прежняя версия повторного разбора
+REPARSED_STATUS = 'reparsed'
+
+SELECT_CHUNK_SQL = """
+    SELECT p.id, q.id, q.query, q.response
+    FROM news_posts p JOIN perplexity_queries q ON q.id = p.query_id
+    WHERE p.id > ? AND p.status != ? AND q.success = TRUE AND q.response IS NOT NULL
+    ORDER BY p.id LIMIT ?
+"""
+
+UPDATE_POST_SQL = """
+    UPDATE news_posts
+    SET title = ?, summary = ?, category = ?, importance = ?, keywords = ?, telegram_channels = ?
+    WHERE id = ?
+"""
+
+def _split(rows: List, parts: int) -> List[List]:
+    size = max(1, -(-len(rows) // parts))
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+def _write_statements(posts: List[NewsPost]) -> List:
+    return [(
+        UPDATE_POST_SQL,
+        (post.title, post.summary, post.category, post.importance,
+         json.dumps(post.keywords), json.dumps(post.telegram_channels), post.id)
+    ) for post in posts]
+
+async def reparse_stored_responses(db: DatabaseManager, chunk_size: int = 500,
+                                   workers: Optional[int] = None) -> Dict[str, float]:
+    """Повторный разбор всех сохраненных ответов; возвращает статистику"""
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    rows_total = posts_total = 0
+    last_id = 0
+    pending_write = None
+
+    # Копии от прежней версии повторного разбора не нужны: обновляются сами посты
+    _, removed = await db.write("DELETE FROM news_posts WHERE status = ?", (REPARSED_STATUS,))
+    if removed:
+        logger.info(f"🧹 Удалено копий прежнего повторного разбора: {removed}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = await db.fetch_all(SELECT_CHUNK_SQL, (last_id, REPARSED_STATUS, chunk_size))
+
+        while rows:
+            last_id = rows[-1][0]
+            # Следующая порция читается, пока процессы разбирают текущую
+            next_rows = asyncio.ensure_future(db.fetch_all(SELECT_CHUNK_SQL, (last_id, REPARSED_STATUS, chunk_size)))
+
+            batches = await asyncio.gather(*(
+                loop.run_in_executor(pool, parse_batch, part) for part in _split(rows, workers)
+            ))
+            posts = [post for batch in batches for post in batch]
+
+            # Запись порции идет в фоне; ждем предыдущую, чтобы очередь не росла
+            if pending_write is not None:
+                await pending_write
+            pending_write = asyncio.ensure_future(
+                db.write_many(_write_statements(posts))
+            )
+
+            rows_total += len(rows)
+            posts_total += len(posts)
+            elapsed = time.perf_counter() - started
+            logger.info(f"🔁 Разобрано {rows_total} ответов ({rows_total / elapsed:.0f} строк/с)")
+
+            rows = await next_rows
+
+        if pending_write is not None:
+            await pending_write
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows_total,
+        'posts': posts_total,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows_total / elapsed, 1) if elapsed else 0.0,
+        'workers': workers
+    }
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Session Scheduler for Perplexity Pro News Automation System
+===========================================================
+
+Планировщик сессий на asyncio без периодического опроса. Ближайшие
+запуски хранятся в куче дедлайнов; задача спит ровно до первого из них
+(или до изменения расписания) и запускает сессию в срок.
+
+Политики:
+
+* overlap - что делать, если сессия должна начаться, а предыдущая еще идет:
+  'skip' (пропустить запуск), 'queue' (начать после завершения текущей),
+  'allow' (запускать параллельно);
+* misfire - что делать, если планировщик проснулся позже срока больше чем
+  на misfire_grace_seconds (остановленный процесс, спящий режим, занятый
+  event loop): 'run' (выполнить один раз с опозданием) или 'skip'.
+"""
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, time as dt_time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_POLICIES = ('skip', 'queue', 'allow')
+MISFIRE_POLICIES = ('run', 'skip')
+
+def next_occurrence(at: str, after: datetime) -> datetime:
+    """Ближайшее время HH:MM строго позже after (локальное время)"""
+    hour, minute = (int(part) for part in at.split(':'))
+    candidate = datetime.combine(after.date(), dt_time(hour, minute))
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    return candidate
+
+class SessionScheduler:
+    """Ежедневный запуск сессий по времени из SessionConfig"""
+
+    def __init__(self, sessions: Dict, run_session: Callable[[str], Awaitable],
+                 overlap: str = 'skip', misfire: str = 'run', misfire_grace_seconds: float = 300,
+                 clock: Callable[[], datetime] = datetime.now):
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Неизвестная политика перекрытия: {overlap}")
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"Неизвестная политика пропуска: {misfire}")
+
+        self.sessions = {name: session for name, session in sessions.items() if session.enabled}
+        self.run_session = run_session
+        self.overlap = overlap
+        self.misfire = misfire
+        self.misfire_grace_seconds = misfire_grace_seconds
+        self.clock = clock
+
+        self.heap: List[Tuple[datetime, str]] = []
+        self.running: Dict[str, asyncio.Task] = {}
+        self._session_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped = False
+
+        self.started_runs = 0
+        self.skipped_overlap = 0
+        self.skipped_misfire = 0
+        self.late_runs = 0
+        self.max_start_delay = 0.0
+
+        self._reset_heap()
+
+    def _reset_heap(self):
+        now = self.clock()
+        self.heap = [(next_occurrence(session.time, now), name) for name, session in self.sessions.items()]
+        heapq.heapify(self.heap)
+
+    def next_run_times(self) -> Dict[str, datetime]:
+        """Следующий запуск каждой сессии"""
+        return {name: due for due, name in sorted(self.heap)}
+
+    def reschedule(self, sessions: Dict):
+        """Замена расписания; спящая задача пересчитывает ожидание сразу"""
+        self.sessions = {name: session for name, session in sessions.items() if session.enabled}
+        self._reset_heap()
+        self._notify()
+
+    def stop(self):
+        """Остановка цикла (можно вызывать из обработчика сигнала)"""
+        self._stopped = True
+        self._notify()
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        """Цикл планировщика: сон до ближайшего дедлайна и запуск сессии"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._session_lock = asyncio.Lock()
+        self._stopped = False
+
+        if self.heap:
+            due, name = self.heap[0]
+            logger.info(f"📅 Планировщик запущен, ближайшая сессия '{name}' в {due:%d.%m %H:%M}")
+
+        try:
+            while not self._stopped:
+                timeout = None
+                if self.heap:
+                    timeout = max((self.heap[0][0] - self.clock()).total_seconds(), 0)
+
+                if timeout is None or timeout > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    # Проснулись по сигналу или раньше срока (перевод часов) - пересчет
+                    continue
+
+                due, name = heapq.heappop(self.heap)
+                now = self.clock()
+                heapq.heappush(self.heap, (next_occurrence(self.sessions[name].time, max(now, due)), name))
+                self._fire(name, due, now)
+        finally:
+            self._loop = None
+
+    def _fire(self, name: str, due: datetime, now: datetime):
+        delay = (now - due).total_seconds()
+        self.max_start_delay = max(self.max_start_delay, delay)
+
+        if delay > self.misfire_grace_seconds:
+            if self.misfire == 'skip':
+                self.skipped_misfire += 1
+                logger.warning(f"⏭️ Сессия '{name}' пропущена: опоздание {delay:.0f} с")
+                return
+            self.late_runs += 1
+            logger.warning(f"⏰ Сессия '{name}' запускается с опозданием {delay:.0f} с")
+
+        if self.overlap == 'skip' and self._session_lock.locked():
+            self.skipped_overlap += 1
+            logger.warning(f"⏭️ Сессия '{name}' пропущена: предыдущая сессия еще выполняется")
+            return
+
+        key = f"{name}@{due:%Y-%m-%d %H:%M}"
+        self.running[key] = asyncio.create_task(self._run_session(name, key))
+
+    async def _run_session(self, name: str, key: str):
+        try:
+            if self.overlap == 'allow':
+                await self._execute(name)
+            else:
+                async with self._session_lock:
+                    await self._execute(name)
+        finally:
+            self.running.pop(key, None)
+
+    async def _execute(self, name: str):
+        self.started_runs += 1
+        try:
+            await self.run_session(name)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сессии '{name}': {e}")
+
+    def get_stats(self) -> Dict:
+        """Следующие запуски, выполняемые сессии и счетчики пропусков"""
+        return {
+            'next_runs': {name: due.isoformat(timespec='minutes') for name, due in self.next_run_times().items()},
+            'running': list(self.running),
+            'overlap_policy': self.overlap,
+            'misfire_policy': self.misfire,
+            'started_runs': self.started_runs,
+            'skipped_overlap': self.skipped_overlap,
+            'skipped_misfire': self.skipped_misfire,
+            'late_runs': self.late_runs,
+            'max_start_delay_seconds': round(self.max_start_delay, 3)
+        }
+
+    async def close(self):
+        """Остановка цикла и отмена выполняемых сессий"""
+        self.stop()
+        tasks = list(self.running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
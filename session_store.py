@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Browser Session Store for Perplexity Pro News Automation System
+===============================================================
+
+Хранение авторизованных сессий Perplexity на диске. Каждый воркер пула
+получает собственный профиль Chrome (user-data-dir) и резервную копию
+cookies в JSON, чтобы после перезапуска не проходить логин заново.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """Профили браузера и cookie jar воркеров"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    def profile_dir(self, worker_id: int) -> Path:
+        """Каталог профиля Chrome для воркера (у каждого свой: Chrome блокирует профиль)"""
+        path = self.base_dir / f"worker-{worker_id}"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _cookies_path(self, worker_id: int) -> Path:
+        return self.base_dir / f"cookies-worker-{worker_id}.json"
+
+    def save_cookies(self, worker_id: int, cookies: List[Dict]):
+        """Сохранение cookies авторизованной сессии"""
+        path = self._cookies_path(worker_id)
+        tmp_path = path.with_suffix('.tmp')
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cookies, f)
+
+        # Cookies дают доступ к аккаунту: только владелец может читать файл
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+        logger.debug("🍪 Сохранено %d cookies воркера %s", len(cookies), worker_id)
+
+    def load_cookies(self, worker_id: int) -> List[Dict]:
+        """Загрузка сохраненных cookies (пустой список, если их нет)"""
+        path = self._cookies_path(worker_id)
+        if not path.exists():
+            return []
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать cookies воркера {worker_id}: {e}")
+            return []
+
+    def clear(self, worker_id: int):
+        """Удаление cookies недействительной сессии"""
+        self._cookies_path(worker_id).unlink(missing_ok=True)
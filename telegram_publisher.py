@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Telegram Publisher for Perplexity Pro News Automation System
+============================================================
+
+Публикация постов в Telegram каналы. Сообщение в разные каналы
+отправляется параллельно; частоту ограничивают token bucket'ы:
+
+* общий - TELEGRAM_RATE_LIMIT сообщений в секунду на бота;
+* по чату - TELEGRAM_CHAT_MESSAGES_PER_MINUTE (лимит Telegram для групп и каналов).
+
+Ответ RetryAfter (flood control) приостанавливает только тот чат,
+для которого он получен; остальные каналы продолжают отправку. Сам send
+не повторяет отправку - повторы выполняет очередь доставки (outbox.py).
+
+В режиме дайджеста несколько постов собираются в одно сообщение
+(format_digest_entry, render_digest) с разбиением по лимиту длины Telegram.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+
+from config import Config, TelegramConfig
+import tracing
+from metrics import TELEGRAM_FLOOD, TELEGRAM_SEND_SECONDS
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Формат сообщения для категорий без своего эмодзи
+DEFAULT_EMOJI = '📰'
+
+def _importance_emoji(importance: int) -> str:
+    if importance >= 9:
+        return "🔥🔥 "
+    if importance >= 7:
+        return "🔥 "
+    return ""
+
+def _hashtags(post) -> List[str]:
+    hashtags = [f"#{keyword.replace(' ', '_')}" for keyword in post.keywords[:3]]
+    hashtags.append(f"#{post.category}")
+    return hashtags
+
+def format_post_message(post) -> str:
+    """Текст сообщения для поста"""
+    emoji = Config.TELEGRAM_FORMATTING['emoji_map'].get(post.category, DEFAULT_EMOJI)
+
+    # Индикатор важности
+    importance_emoji = _importance_emoji(post.importance)
+
+    # Формируем хештеги
+    hashtags = _hashtags(post)
+
+    return f"""
+{emoji} **{importance_emoji}{post.title}**
+
+{post.summary}
+
+{' '.join(hashtags)}
+📅 {datetime.now().strftime('%d.%m.%Y %H:%M')}
+
+#технологии #новости
+    """.strip()
+
+def format_digest_entry(post) -> str:
+    """Блок поста внутри дайджеста: без даты и общих хештегов"""
+    emoji = Config.TELEGRAM_FORMATTING['emoji_map'].get(post.category, DEFAULT_EMOJI)
+    return f"""
+{emoji} **{_importance_emoji(post.importance)}{post.title}**
+
+{post.summary}
+
+{' '.join(_hashtags(post))}
+    """.strip()
+
+def render_digest(entries: List[str]) -> List[Tuple[str, List[int]]]:
+    """Сборка блоков в сообщения дайджеста не длиннее лимита Telegram.
+
+    Возвращает (текст, индексы блоков в этом сообщении). Блоки не
+    разрываются между сообщениями; блок длиннее лимита обрезается.
+    """
+    digest = Config.TELEGRAM_FORMATTING['digest']
+    header = digest['header'].format(date=datetime.now().strftime('%d.%m.%Y %H:%M'))
+    separator = digest['separator']
+    footer = digest['footer']
+    limit = digest['max_message_length']
+
+    # Место под блоки, если в сообщении только заголовок и подпись
+    room = limit - len(header) - len(footer) - 2 * len(separator)
+
+    messages = []
+    parts: List[str] = []
+    indices: List[int] = []
+    size = 0
+
+    for index, entry in enumerate(entries):
+        if len(entry) > room:
+            entry = entry[:room - 1] + '…'
+
+        added = len(entry) + (len(separator) if parts else 0)
+        if parts and size + added > room:
+            messages.append((separator.join([header, *parts, footer]), indices))
+            parts, indices, size = [], [], 0
+            added = len(entry)
+
+        parts.append(entry)
+        indices.append(index)
+        size += added
+
+    if parts:
+        messages.append((separator.join([header, *parts, footer]), indices))
+
+    return messages
+
+class TelegramPublisher:
+    """Параллельная отправка в каналы с общим и поканальным ограничением частоты"""
+
+    def __init__(self, config: TelegramConfig, bot: Optional[Bot] = None):
+        self.channels = config.channels
+        self.bot = bot or Bot(token=config.bot_token, base_url=Config.TELEGRAM_API_BASE_URL)
+
+        self.global_bucket = TokenBucket(Config.TELEGRAM_RATE_LIMIT, capacity=Config.TELEGRAM_RATE_LIMIT)
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+
+        self.messages_sent = 0
+        self.send_errors = 0
+        self.flood_waits = 0
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(Config.TELEGRAM_CHAT_MESSAGES_PER_MINUTE / 60, capacity=1)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def initialize(self):
+        """Инициализация HTTP-клиента бота"""
+        await self.bot.initialize()
+
+    async def check_connection(self) -> bool:
+        """Проверка токена бота"""
+        try:
+            await self.bot.get_me()
+            return True
+        except TelegramError as e:
+            logger.error(f"❌ Telegram недоступен: {e}")
+            return False
+
+    async def send(self, chat_id: str, text: str, parse_mode: str = 'Markdown'):
+        """Одна попытка отправки с учетом лимитов.
+
+        RetryAfter приостанавливает этот чат и пробрасывается дальше: повторы
+        с паузой выполняет TelegramOutbox, второго слоя повторов здесь нет.
+        """
+        bucket = self._chat_bucket(chat_id)
+
+        # Сначала поканальный лимит: ожидание одного чата не занимает общий токен
+        with tracing.span('telegram.rate_wait'):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+
+        started = time.perf_counter()
+        with tracing.span('telegram.send_message') as send_span:
+            try:
+                result = await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                self.messages_sent += 1
+                return result
+            except RetryAfter as e:
+                self.flood_waits += 1
+                TELEGRAM_FLOOD.inc()
+                send_span.set(retry_after=float(e.retry_after))
+                logger.warning("⏳ Flood control для %s: пауза %s с", chat_id, e.retry_after)
+                bucket.pause(float(e.retry_after))
+                raise
+            finally:
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started)
+
+    async def publish_to_channels(self, text: str, channel_keys: List[str]) -> List[Tuple[str, int]]:
+        """Параллельная отправка текста в каналы; возвращает (канал, message_id) успешных"""
+        targets = [(key, self.channels[key]) for key in dict.fromkeys(channel_keys)
+                   if self.channels.get(key)]
+
+        results = await asyncio.gather(
+            *(self.send(chat_id, text) for _, chat_id in targets),
+            return_exceptions=True
+        )
+
+        published = []
+        for (channel_key, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.send_errors += 1
+                logger.error("❌ Ошибка отправки в %s: %s", channel_key, result)
+            else:
+                published.append((channel_key, result.message_id))
+                logger.info("📤 Опубликовано в %s", channel_key)
+
+        return published
+
+    async def publish_post(self, post) -> bool:
+        """Публикация поста во все его каналы"""
+        published = await self.publish_to_channels(format_post_message(post), post.telegram_channels)
+        return len(published) > 0
+
+    def get_stats(self) -> Dict:
+        """Отправленные сообщения, ошибки и ожидание лимитов"""
+        return {
+            'messages_sent': self.messages_sent,
+            'send_errors': self.send_errors,
+            'flood_waits': self.flood_waits,
+            'global_wait_seconds': round(self.global_bucket.waited_seconds, 2),
+            'paused_chats': [chat_id for chat_id, bucket in self.chat_buckets.items() if bucket.paused]
+        }
+
+    async def cleanup(self):
+        """Закрытие HTTP-клиента бота"""
+        await self.bot.shutdown()
@@ -0,0 +1,9 @@
+"""Общие настройки тестов: модули проекта лежат в корне репозитория"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,66 @@
+"""Команды status и health не загружают браузер, бота и aiohttp"""
+
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ('selenium', 'telegram', 'aiohttp', 'automation', 'perplexity_main')
+
+# main() в новом процессе, затем список загруженных модулей последней строкой
+RUNNER = """
+import json, sys
+sys.argv = ['main.py'] + sys.argv[1:]
+import main
+main.main()
+print(json.dumps(sorted(sys.modules)))
+"""
+
+def run_cli(tmp_path, *args, env=None):
+    environment = dict(os.environ, DATABASE_PATH=str(tmp_path / 'news.db'),
+                       LOG_FILE=str(tmp_path / 'news.log'), PYTHONPATH=str(ROOT), **(env or {}))
+    result = subprocess.run([sys.executable, '-c', RUNNER, *args], cwd=tmp_path,
+                            env=environment, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.strip().splitlines()
+    return lines[:-1], set(json.loads(lines[-1]))
+
+def heavy(modules):
+    return sorted(name for name in modules if name.split('.')[0] in HEAVY_MODULES)
+
+def test_status_skips_heavy_imports(tmp_path):
+    output, modules = run_cli(tmp_path, 'status')
+    assert any('Запросов сегодня' in line for line in output)
+    assert heavy(modules) == []
+
+def test_health_of_running_instance_skips_heavy_imports(tmp_path):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({'healthy': True, 'database': True}).encode()
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = http.server.HTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        output, modules = run_cli(tmp_path, 'health', env={'HEALTH_PORT': str(port)})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert '✅ database: OK' in output
+    assert heavy(modules) == []
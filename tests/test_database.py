@@ -0,0 +1,138 @@
+"""Поток-писатель БД и сохранение ответов Perplexity"""
+
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from database import MIGRATIONS, SCHEMA, DatabaseManager, DatabaseWriter
+from news_parser import NewsPost
+
+class FailingCommitConnection:
+    """Соединение, у которого первые failures операторов COMMIT падают"""
+
+    def __init__(self, conn: sqlite3.Connection, failures: int = 1):
+        object.__setattr__(self, 'conn', conn)
+        object.__setattr__(self, 'failures', failures)
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and self.failures > 0:
+            object.__setattr__(self, 'failures', self.failures - 1)
+            raise sqlite3.OperationalError("database or disk is full")
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.conn, name, value)
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'writer.db'
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (value TEXT)")
+    return path
+
+def count_items(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+def test_failed_commit_fails_batch_and_keeps_writer_alive(db_path):
+    writer = DatabaseWriter(lambda: FailingCommitConnection(sqlite3.connect(db_path, check_same_thread=False)))
+    writer.start()
+    try:
+        failed = writer.submit([("INSERT INTO items VALUES (?)", ('lost',))])
+        with pytest.raises(sqlite3.OperationalError):
+            failed.result(timeout=5)
+
+        saved = writer.submit([("INSERT INTO items VALUES (?)", ('saved',))])
+        assert saved.result(timeout=5)[1] == 1
+        assert writer.is_alive()
+        assert writer.failed_batches == 1
+    finally:
+        writer.stop()
+
+    assert count_items(db_path) == 1
+
+def test_submit_fails_fast_when_writer_cannot_start(tmp_path):
+    def connect():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    writer = DatabaseWriter(connect)
+    writer.start()
+    writer.join(timeout=5)
+
+    with pytest.raises(RuntimeError):
+        writer.submit([("INSERT INTO items VALUES (?)", ('x',))]).result(timeout=5)
+
+def test_restoring_answer_keeps_linked_query_row(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'news.db'))
+    post = NewsPost('Заголовок', 'Кратко', 'ai', 7, [], [], ['it_news'], 'ответ', datetime.now())
+
+    def store(response: str) -> int:
+        # Срок свежести истек, но очистка еще не освободила query_hash
+        row_id, _ = db.submit_answer('новости ИИ', response, 'hash-1', 1200,
+                                     'новости ии', 42, '2000-01-01 00:00:00').result(timeout=5)
+        return row_id
+
+    try:
+        first_answer = store('первый ответ')
+        first_post = asyncio.run(db.save_news_post(post, query_hash='hash-1'))
+        second_answer = store('второй ответ')
+        second_post = asyncio.run(db.save_news_post(post, query_hash='hash-1'))
+
+        conn = db.connect()
+        links = dict(conn.execute("SELECT id, query_id FROM news_posts").fetchall())
+        hashes = dict(conn.execute("SELECT id, query_hash FROM perplexity_queries").fetchall())
+        conn.close()
+    finally:
+        db.close()
+
+    assert second_answer != first_answer
+    assert links == {first_post: first_answer, second_post: second_answer}
+    assert hashes == {first_answer: None, second_answer: 'hash-1'}
+
+def test_answer_store_works_without_query_cache(tmp_path):
+    # Колонки кэша создает миграция: QueryCache для записи ответа не нужен
+    db = DatabaseManager(str(tmp_path / 'news.db'))
+    try:
+        row_id, _ = db.submit_answer('новости ИИ', 'ответ', 'hash-1', 900,
+                                     'новости ии', 7, '2030-01-01 00:00:00').result(timeout=5)
+        conn = db.connect()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+    finally:
+        db.close()
+
+    assert row_id == 1
+    assert version == MIGRATIONS[-1][0]
+
+def test_migration_adds_cache_columns_and_expires_old_answers(tmp_path):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        # База версии 4: колонок кэша еще нет
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for target, _, statements in MIGRATIONS:
+            for statement in statements if target <= 4 else ():
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError:
+                    pass  # колонка уже есть в SCHEMA
+        conn.execute("PRAGMA user_version = 4")
+        conn.execute("INSERT INTO perplexity_queries (query, response, query_hash, success) "
+                     "VALUES ('старый запрос', 'старый ответ', 'hash-old', TRUE)")
+
+    db = DatabaseManager(str(path))
+    db.close()
+
+    with sqlite3.connect(path) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(perplexity_queries)")}
+        expired = conn.execute(
+            "SELECT expires_at <= datetime('now') FROM perplexity_queries WHERE query_hash = 'hash-old'"
+        ).fetchone()[0]
+
+    assert {'normalized_query', 'simhash', 'expires_at'} <= columns
+    assert expired == 1
@@ -0,0 +1,68 @@
+"""Пул браузеров перезапускает драйвер после ошибки WebDriver"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('selenium')
+
+from selenium.common.exceptions import TimeoutException, WebDriverException  # noqa: E402
+
+from driver_pool import DriverPool  # noqa: E402
+
+class FakeDriver:
+    def __init__(self, number: int):
+        self.number = number
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+def make_pool():
+    created = []
+
+    def factory(worker_id: int) -> FakeDriver:
+        created.append(FakeDriver(len(created)))
+        return created[-1]
+
+    return DriverPool(1, factory), created
+
+async def fail_query(pool: DriverPool, error: Exception):
+    with pytest.raises(type(error)):
+        async with pool.checkout():
+            raise error
+
+def test_webdriver_error_recreates_driver():
+    pool, created = make_pool()
+
+    async def scenario():
+        await fail_query(pool, WebDriverException('chrome not reachable'))
+        async with pool.checkout() as worker:
+            return worker.driver
+
+    try:
+        driver = asyncio.run(scenario())
+    finally:
+        asyncio.run(pool.close())
+
+    assert len(created) == 2
+    assert created[0].quit_called
+    assert driver is created[1]
+    assert pool.workers[0].stats.restarts == 1
+
+def test_timeout_keeps_driver():
+    pool, created = make_pool()
+
+    async def scenario():
+        await fail_query(pool, TimeoutException('answer timeout'))
+        async with pool.checkout() as worker:
+            return worker.driver, worker.driver.quit_called
+
+    try:
+        driver, quit_called = asyncio.run(scenario())
+    finally:
+        asyncio.run(pool.close())
+
+    assert driver is created[0]
+    assert not quit_called
+    assert pool.workers[0].stats.restarts == 0
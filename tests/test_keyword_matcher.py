@@ -0,0 +1,38 @@
+"""Оценка важности не упирается в 10 и различает каналы"""
+
+import json
+import sys
+from pathlib import Path
+
+from keyword_matcher import BASE_IMPORTANCE, get_matcher
+from news_parser import parse_response
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from parser_bench import build_documents, check_golden, GOLDEN_PATH  # noqa: E402
+
+def test_text_without_indicators_keeps_base_importance():
+    assert get_matcher().match("Компания обновила дизайн сайта и поменяла логотип").importance() == BASE_IMPORTANCE
+
+def test_routine_announcement_is_low_importance_single_channel():
+    post = parse_response("Google announces new app for Android. Analysts forecast growth.\n\n"
+                          "The update ships next month.", "новости Android")
+    assert post.importance < 8
+    assert post.telegram_channels == ['it_news']
+
+def test_single_weak_indicator_routes_by_category():
+    post = parse_response("Новый робот на складе\n\nКомпания показала робота-манипулятора "
+                          "для сортировки посылок на складе.", "новости робототехники")
+    assert post.importance == BASE_IMPORTANCE
+    assert post.telegram_channels == ['robotics']
+
+def test_breakthrough_with_funding_goes_to_all_channels():
+    post = parse_response("OpenAI announces a breakthrough in reasoning\n\nThe first ever model to pass the exam. "
+                          "Investors raised $2 billion in funding after the unprecedented result.", "новости ИИ")
+    assert post.importance >= 8
+    assert post.telegram_channels == ['it_news', 'automation', 'robotics']
+
+def test_parser_corpus_matches_golden():
+    golden = json.loads(GOLDEN_PATH.read_text(encoding='utf-8'))
+    assert check_golden(build_documents(), golden) == []
+    assert len({record['importance'] for record in golden.values()}) > 1
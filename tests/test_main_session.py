@@ -0,0 +1,103 @@
+"""NewsAutomationSystem из main.py: сборка системы и сессия на заменителях"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('selenium')
+pytest.importorskip('telegram')
+
+import main
+from answer_watcher import AnswerChunk
+from config import Config
+
+# Ответы на первые запросы сессии; остальные запросы остаются без ответа
+STORIES = [
+    "OpenAI представила новую модель для генерации кода\n\n"
+    "Главное: OpenAI представила модель, которая пишет и проверяет программы. "
+    "Это настоящий прорыв в области искусственного интеллекта и машинного обучения.",
+    "Boston Dynamics показала робота для складской логистики\n\n"
+    "Главное: новый робот Boston Dynamics сам разгружает фуры на складах. "
+    "Революционный подход к робототехнике, сделка оценивается в 2 миллиарда долларов.",
+    "Стартап из Берлина привлек инвестиции на автоматизацию производства\n\n"
+    "Главное: платформа автоматизации заводских линий получила раунд финансирования. "
+    "Аналитики называют событие значительным для промышленной автоматизации."
+]
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'news.db'))
+    monkeypatch.setattr(Config, 'BROWSER_PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(Config, 'TELEGRAM_BOT_TOKEN', '123456:test')
+    monkeypatch.setattr(Config, 'TELEGRAM_CHANNELS',
+                        {'it_news': '@it_news', 'automation': '@automation', 'robotics': '@robotics'})
+    monkeypatch.setattr(Config, 'TELEGRAM_DIGEST_ENABLED', False)
+    monkeypatch.setattr(Config, 'TRACING_ENABLED', False)
+    monkeypatch.setattr(Config, 'REDIS_URL', '')
+    # Обработчики сигналов pytest не подменяются
+    monkeypatch.setattr(main.signal, 'signal', lambda *args: None)
+    return main.NewsAutomationSystem()
+
+def fake_session(system):
+    """Ответы Perplexity и отправка в Telegram без браузера и сети"""
+    stories = iter(STORIES)
+    sent = []
+
+    async def stream(query):
+        text = next(stories, None)
+        if text is None:
+            return
+        yield AnswerChunk('chunk', text[:40], text[:40], 10.0)
+        yield AnswerChunk('complete', text[40:], text, 20.0)
+        yield AnswerChunk('sources', '', text, 20.0, sources=['https://example.com/news'])
+
+    async def send(chat_id, text):
+        sent.append(chat_id)
+        return SimpleNamespace(message_id=len(sent))
+
+    system.automation.stream_perplexity_query = stream
+    system.telegram.send = send
+    return sent
+
+def test_system_uses_perplexity_automation_on_shared_db(system):
+    from perplexity_main import PerplexityAutomation
+
+    assert isinstance(system.automation, PerplexityAutomation)
+    assert system.automation.db is system.db
+    assert system.automation.telegram is system.telegram
+    assert system.outbox is system.automation.outbox
+
+def test_manual_session_publishes_through_pipeline(system):
+    sent = fake_session(system)
+
+    async def scenario():
+        try:
+            return await system.run_manual_session('morning')
+        finally:
+            await system.shutdown()
+
+    results = main.asyncio.run(scenario())
+
+    assert results['posts_created'] == len(STORIES)
+    assert results['posts_published'] == len(STORIES)
+    assert results['errors'] == 0
+    assert sent
+    assert set(results['pipeline']) == {'query', 'parse', 'dedupe', 'publish'}
+
+def test_digest_session_counts_queued_posts_apart_from_published(system):
+    sent = fake_session(system)
+    system.outbox.digest_window_seconds = 600
+
+    async def scenario():
+        try:
+            return await system.run_manual_session('morning')
+        finally:
+            await system.shutdown()
+
+    results = main.asyncio.run(scenario())
+
+    # Дайджест уйдет после окна: до отправки посты не считаются опубликованными
+    assert (results['posts_queued'], results['posts_published']) == (len(STORIES), 0)
+    assert system.stats['posts_queued_today'] == len(STORIES)
+    assert system.stats['posts_published_today'] == 0
+    assert sent == []
@@ -0,0 +1,41 @@
+"""Эндпоинт /metrics видит метрики, записанные остальными модулями"""
+
+import asyncio
+import socket
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+from pipeline import Pipeline, Stage  # noqa: E402
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_main_uses_single_registry():
+    assert main.REGISTRY is metrics.REGISTRY
+
+def test_metrics_endpoint_exposes_pipeline_stages():
+    async def scrape() -> str:
+        async def double(item):
+            return item * 2
+
+        await Pipeline([Stage('scrape_test_stage', double)]).run([1, 2, 3])
+
+        port = free_port()
+        server = main.MetricsServer('127.0.0.1', port, main.REGISTRY)
+        assert await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{port}/metrics') as response:
+                    assert response.status == 200
+                    return await response.text()
+        finally:
+            await server.stop()
+
+    text = asyncio.run(scrape())
+    assert 'pipeline_stage_seconds_count{stage="scrape_test_stage"} 3' in text
@@ -0,0 +1,197 @@
+"""Очередь доставки в Telegram: восстановление, повторы и остановка"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('telegram')
+
+from telegram.error import RetryAfter
+
+from config import TelegramConfig
+from database import DatabaseManager
+from news_parser import NewsPost
+from outbox import TelegramOutbox
+from telegram_publisher import TelegramPublisher
+
+CHANNELS = {'it_news': '@it_news'}
+
+class FakePublisher:
+    """Публикатор без сети: send ждет delay секунд и возвращает или бросает result"""
+
+    def __init__(self, result=None, delay: float = 0):
+        self.channels = CHANNELS
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self.started = asyncio.Event()
+
+    async def send(self, chat_id: str, text: str):
+        self.calls += 1
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return SimpleNamespace(message_id=100 + self.calls)
+
+class FloodBot:
+    """Бот, который всегда отвечает flood control"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def send_message(self, **kwargs):
+        self.calls += 1
+        raise RetryAfter(120)
+
+def make_post(title: str = 'Новость') -> NewsPost:
+    return NewsPost(title, 'Кратко', 'ai', 8, [], [], ['it_news'], 'ответ', datetime.now())
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'news.db'))
+    yield manager
+    manager.close()
+
+def outbox_rows(db):
+    conn = db.connect()
+    try:
+        return conn.execute(
+            "SELECT status, attempts, next_attempt_at FROM telegram_outbox ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+def post_status(db, post_id: int) -> str:
+    conn = db.connect()
+    try:
+        return conn.execute("SELECT status FROM news_posts WHERE id = ?", (post_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_ready_posts_are_requeued_on_start(db):
+    async def scenario():
+        # Посты сохранены, но процесс упал до постановки в очередь
+        fresh = make_post('Свежая новость')
+        fresh.id = await db.save_news_post(fresh)
+        seen = make_post('Уже опубликованная новость')
+        seen.id = await db.save_news_post(seen)
+
+        outbox = TelegramOutbox(db, FakePublisher(), digest_window_seconds=0)
+        queued = await outbox.recover_ready_posts(lambda post: post.title == seen.title)
+        for _ in range(100):
+            if outbox.sent:
+                break
+            await asyncio.sleep(0.02)
+        await outbox.close()
+        return fresh.id, seen.id, queued
+
+    fresh_id, seen_id, queued = asyncio.run(scenario())
+
+    assert queued == 1
+    assert post_status(db, fresh_id) == 'published'
+    assert post_status(db, seen_id) == 'ready'
+
+def test_publisher_send_does_not_retry_flood_control():
+    bot = FloodBot()
+    publisher = TelegramPublisher(TelegramConfig('token', CHANNELS), bot=bot)
+
+    async def scenario():
+        with pytest.raises(RetryAfter):
+            await publisher.send('@it_news', 'текст')
+
+    asyncio.run(scenario())
+
+    assert bot.calls == 1
+    assert publisher.flood_waits == 1
+
+def test_outbox_reschedules_flood_control_after_retry_after(db):
+    async def scenario():
+        post = make_post()
+        post.id = await db.save_news_post(post)
+        publisher = FakePublisher(result=RetryAfter(120))
+        outbox = TelegramOutbox(db, publisher, retry_delay_seconds=1, digest_window_seconds=0)
+        await outbox.enqueue(post)
+        for _ in range(100):
+            if outbox.retried:
+                break
+            await asyncio.sleep(0.02)
+        await outbox.close()
+        return publisher.calls
+
+    calls = asyncio.run(scenario())
+
+    [(status, attempts, next_attempt_at)] = outbox_rows(db)
+    retry_at = datetime.fromisoformat(next_attempt_at).replace(tzinfo=timezone.utc)
+    assert calls == 1
+    assert (status, attempts) == ('pending', 1)
+    assert retry_at - datetime.now(timezone.utc) > timedelta(seconds=100)
+
+def test_close_waits_for_send_in_progress(db):
+    async def scenario():
+        post = make_post()
+        post.id = await db.save_news_post(post)
+        publisher = FakePublisher(delay=0.3)
+        outbox = TelegramOutbox(db, publisher, digest_window_seconds=0)
+        delivery = asyncio.create_task(outbox.publish(post))
+        await publisher.started.wait()
+        await outbox.close(timeout=5)
+        return await delivery
+
+    assert asyncio.run(scenario()) is True
+    assert [row[0] for row in outbox_rows(db)] == ['sent']
+
+def test_close_stops_stuck_send_after_timeout(db):
+    async def scenario():
+        post = make_post()
+        post.id = await db.save_news_post(post)
+        publisher = FakePublisher(delay=30)
+        outbox = TelegramOutbox(db, publisher, digest_window_seconds=0)
+        await outbox.enqueue(post)
+        await publisher.started.wait()
+        await asyncio.wait_for(outbox.close(timeout=0.1), timeout=5)
+        return outbox.task.cancelled()
+
+    assert asyncio.run(scenario()) is True
+    assert [row[0] for row in outbox_rows(db)] == ['sending']
+
+def test_digest_publish_returns_after_enqueue(db):
+    async def scenario():
+        post = make_post()
+        post.id = await db.save_news_post(post)
+        publisher = FakePublisher()
+        outbox = TelegramOutbox(db, publisher, digest_window_seconds=600)
+        published = await asyncio.wait_for(outbox.publish(post), timeout=5)
+        await outbox.close(timeout=5)
+        return post.id, published, publisher.calls
+
+    post_id, published, calls = asyncio.run(scenario())
+
+    assert published is True
+    assert calls == 0
+    assert post_status(db, post_id) == 'queued'
+    assert [row[0] for row in outbox_rows(db)] == ['pending']
+
+def test_listeners_get_digest_result_but_not_awaited_posts(db):
+    async def scenario():
+        finished = []
+        digest_post = make_post('Новость дайджеста')
+        digest_post.id = await db.save_news_post(digest_post)
+        awaited_post = make_post('Новость с ожиданием')
+        awaited_post.id = await db.save_news_post(awaited_post)
+
+        outbox = TelegramOutbox(db, FakePublisher(), digest_window_seconds=1)
+        outbox.add_delivery_listener(lambda post_id, status: finished.append((post_id, status)))
+        assert await outbox.publish(digest_post) is True
+        assert finished == []
+
+        # Тот же обработчик, но публикация ждет доставки: итог получает вызывающий
+        assert await asyncio.wait_for(outbox.publish(awaited_post, wait=True), timeout=5) is True
+        await outbox.close()
+        return digest_post.id, finished
+
+    digest_id, finished = asyncio.run(scenario())
+
+    assert finished == [(digest_id, 'published')]
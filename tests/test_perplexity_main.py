@@ -0,0 +1,169 @@
+"""PerplexityAutomation: темп отправки и разбор ответа до загрузки источников"""
+
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('selenium')
+pytest.importorskip('telegram')
+
+from selenium.common.exceptions import WebDriverException
+
+from answer_watcher import AnswerChunk
+from config import Config, TelegramConfig
+from database import DatabaseManager
+from driver_pool import DriverPool
+from perplexity_main import PerplexityAutomation
+from telegram_publisher import TelegramPublisher
+
+ANSWER = (
+    "OpenAI представила новую модель для генерации кода\n\n"
+    "Главное: OpenAI представила модель, которая пишет и проверяет программы. "
+    "Это настоящий прорыв в области искусственного интеллекта."
+)
+
+@pytest.fixture
+def automation(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'BROWSER_PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(Config, 'REDIS_URL', '')
+    channels = {'it_news': '@it_news'}
+    return PerplexityAutomation(
+        {'email': 'bench@example.com', 'password': 'secret', 'telegram_token': '123456:test',
+         'telegram_channels': channels},
+        pool_size=1,
+        db=DatabaseManager(str(tmp_path / 'news.db')),
+        telegram=TelegramPublisher(TelegramConfig('123456:test', channels))
+    )
+
+def test_answer_is_parsed_before_sources_load(automation):
+    async def scenario():
+        sources_requested = asyncio.Event()
+        sources_ready = asyncio.Event()
+
+        async def stream(query):
+            yield AnswerChunk('chunk', ANSWER[:60], ANSWER[:60], 10.0)
+            yield AnswerChunk('complete', ANSWER[60:], ANSWER, 20.0)
+            # Браузер еще собирает источники
+            sources_requested.set()
+            await sources_ready.wait()
+            yield AnswerChunk('sources', '', ANSWER, 20.0, sources=['https://example.com/openai'])
+
+        automation.stream_perplexity_query = stream
+        try:
+            answer = await asyncio.wait_for(automation.fetch_answer('новости ИИ'), timeout=5)
+            assert answer.text == ANSWER
+            assert answer.sources == []
+
+            building = asyncio.create_task(automation.build_post(answer))
+            await sources_requested.wait()
+            await asyncio.sleep(0.05)
+            # Разбор прошел, сохранение поста ждет источников
+            assert not building.done()
+
+            sources_ready.set()
+            post = await asyncio.wait_for(building, timeout=5)
+            return post
+        finally:
+            await automation.cleanup()
+
+    post = asyncio.run(scenario())
+
+    assert post.id is not None
+    assert post.sources == ['https://example.com/openai']
+
+class FakeElement:
+    async def clear(self):
+        pass
+
+    async def send_keys(self, text):
+        pass
+
+class FakeBrowser:
+    """Браузер, который падает на поиске кнопки отправки"""
+
+    async def wait_for(self, condition, timeout):
+        return FakeElement()
+
+    async def execute_script(self, script, *args):
+        return None
+
+    async def find_element(self, by, selector):
+        raise RuntimeError("кнопка отправки не найдена")
+
+def test_rate_token_is_taken_on_checked_out_browser(automation):
+    events = []
+
+    @contextlib.asynccontextmanager
+    async def checkout():
+        events.append('checkout')
+        yield SimpleNamespace(worker_id=0, session_active=True, browser=FakeBrowser())
+
+    async def acquire():
+        events.append('acquire')
+
+    automation.pool.checkout = checkout
+    automation.governor.acquire = acquire
+
+    async def scenario():
+        try:
+            return [chunk async for chunk in automation.stream_perplexity_query('новости ИИ')]
+        finally:
+            await automation.cleanup()
+
+    assert asyncio.run(scenario()) == []
+    assert events == ['checkout', 'acquire']
+
+def test_failed_delivery_releases_story_from_dedup_index(automation):
+    async def publish(post):
+        return False
+
+    automation.outbox.publish = publish
+    post = automation.parse_perplexity_response(ANSWER, 'новости ИИ')
+    post.id = 1
+
+    async def scenario():
+        try:
+            assert not automation.is_duplicate(post)
+            assert await automation.deliver(post) is False
+            # Повтор той же истории после неудачной доставки публикуется
+            return automation.is_duplicate(post)
+        finally:
+            await automation.cleanup()
+
+    assert asyncio.run(scenario()) is False
+    assert automation.get_dedup_stats()['indexed'] == 1
+
+class CrashedDriver:
+    """Драйвер упавшего Chrome: любая навигация заканчивается ошибкой WebDriver"""
+
+    def __init__(self):
+        self.quit_called = False
+
+    def get(self, url):
+        raise WebDriverException('chrome not reachable')
+
+    def quit(self):
+        self.quit_called = True
+
+def test_browser_crash_during_login_restarts_worker(automation):
+    created = []
+
+    def factory(worker_id):
+        created.append(CrashedDriver())
+        return created[-1]
+
+    automation.pool = DriverPool(1, factory)
+
+    async def scenario():
+        try:
+            return [chunk async for chunk in automation.stream_perplexity_query('новости ИИ')]
+        finally:
+            await automation.cleanup()
+
+    assert asyncio.run(scenario()) == []
+    # Ошибка входа дошла до pool.checkout, и упавший браузер заменен новым
+    assert automation.pool.workers[0].stats.restarts == 1
+    assert len(created) == 2
+    assert created[0].quit_called
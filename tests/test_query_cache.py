@@ -0,0 +1,40 @@
+"""Поиск похожих запросов не выдает ответ на другую тему"""
+
+import asyncio
+
+import pytest
+
+from config import Config
+from database import DatabaseManager
+from query_cache import MIN_SIMILARITY_THRESHOLD, QueryCache
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'news.db'))
+    yield manager
+    manager.close()
+
+def store(db, cache: QueryCache, query: str, response: str):
+    normalized, fingerprint, expires_at = cache.cache_fields(query)
+    row_id, _ = db.submit_answer(query, response, f'hash:{query}', 1000,
+                                 normalized, fingerprint, expires_at).result(timeout=5)
+    asyncio.run(cache.add(row_id, query, response, expires_at))
+
+@pytest.mark.parametrize('threshold', [MIN_SIMILARITY_THRESHOLD, Config.QUERY_SIMILARITY_THRESHOLD])
+def test_unrelated_session_queries_do_not_match(db, threshold):
+    cache = QueryCache(db, similarity_threshold=threshold, default_ttl_hours=12)
+    store(db, cache, 'Новые релизы технологических гигантов за день', 'ответ про релизы')
+
+    assert asyncio.run(cache.lookup('Новые стартапы технологических гигантов за день')) is None
+    assert asyncio.run(cache.lookup('Инвестиции в стартапы робототехники сегодня')) is None
+
+def test_rephrased_query_still_matches(db):
+    cache = QueryCache(db, similarity_threshold=Config.QUERY_SIMILARITY_THRESHOLD, default_ttl_hours=12)
+    store(db, cache, 'Новые релизы технологических гигантов за день', 'ответ про релизы')
+
+    hit = asyncio.run(cache.lookup('новые релизы технологических гигантов сегодня'))
+    assert hit is not None and hit.response == 'ответ про релизы'
+
+def test_low_threshold_is_rejected(db):
+    with pytest.raises(ValueError):
+        QueryCache(db, similarity_threshold=0.75, default_ttl_hours=12)
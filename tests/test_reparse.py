@@ -0,0 +1,52 @@
+"""Повторный разбор сохраненных ответов: обновление постов по id"""
+
+import asyncio
+from datetime import datetime
+
+from database import DatabaseManager
+from news_parser import NewsPost, parse_response
+from reparse import REPARSED_STATUS, reparse_stored_responses
+
+ANSWER = (
+    "OpenAI представила новую модель для генерации кода\n\n"
+    "Главное: OpenAI представила модель, которая пишет и проверяет программы. "
+    "Это настоящий прорыв в области искусственного интеллекта."
+)
+
+def test_reparse_updates_original_posts_in_place(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'news.db'))
+    # Пост разобран старыми правилами: категория и важность устарели
+    stale = NewsPost('Старый заголовок', 'Кратко', 'robotics', 1, [], ['https://example.com/openai'],
+                     ['robotics'], ANSWER, datetime.now())
+
+    async def scenario():
+        db.submit_answer('новости ИИ', ANSWER, 'hash-1', 900,
+                         'новости ии', 7, '2030-01-01 00:00:00').result(timeout=5)
+        post_id = await db.save_news_post(stale, query_hash='hash-1')
+        await db.write("UPDATE news_posts SET status = 'published' WHERE id = ?", (post_id,))
+        # Копия от прежней версии повторного разбора
+        await db.write(
+            "INSERT INTO news_posts (title, summary, category, importance, status, query_id) "
+            "VALUES ('Копия', 'Кратко', 'ai', 5, ?, 1)", (REPARSED_STATUS,)
+        )
+        results = await reparse_stored_responses(db, workers=1)
+        return post_id, results
+
+    try:
+        post_id, results = asyncio.run(scenario())
+        conn = db.connect()
+        rows = conn.execute(
+            "SELECT id, title, category, importance, status, sources FROM news_posts"
+        ).fetchall()
+        conn.close()
+    finally:
+        db.close()
+
+    expected = parse_response(ANSWER, 'новости ИИ')
+    assert (results['rows'], results['posts']) == (1, 1)
+    [(row_id, title, category, importance, status, sources)] = rows
+    assert row_id == post_id
+    assert (title, category, importance) == (expected.title, expected.category, expected.importance)
+    assert (category, importance) != ('robotics', 1)
+    assert status == 'published'
+    assert 'https://example.com/openai' in sources
@@ -0,0 +1,27 @@
+"""Трассы конвейера пишутся в файл, включенный через main.py"""
+
+import asyncio
+from datetime import date
+
+import main
+import tracing
+from pipeline import Pipeline, Stage
+
+def test_pipeline_traces_are_exported(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    main.tracing.configure(str(path))
+    try:
+        async def parse(item):
+            with tracing.span('parse.inner'):
+                return item
+
+        asyncio.run(Pipeline([Stage('parse', parse)], trace_name='post').run(['a', 'b']))
+        tracing.flush()
+    finally:
+        tracing.configure(None)
+
+    traces = tracing.load_traces(str(path), date.today())
+    assert len(traces) == 2
+    for item in traces:
+        names = {span['name'] for span in item['spans']}
+        assert {'post', 'parse', 'parse.inner'} <= names
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Tracing for Perplexity Pro News Automation System
+=================================================
+
+Легковесная трассировка поста: у каждого прохода поста (запрос, разбор,
+запись в БД, доставка) свой trace id, внутри - вложенные отрезки (spans)
+на вход в Perplexity, ожидание элементов страницы, печать ответа, поиск
+источников, разбор, запись в SQLite, ожидание лимитов и вызовы Bot API.
+
+Текущий отрезок хранится в contextvars, поэтому вложенность получается
+сама: `with span(...)` внутри обработчика становится дочерним для
+отрезка, в котором выполняется обработчик. Вне трассы span() ничего не
+делает; trace() начинает новую трассу, если текущей нет.
+
+Завершенная трасса дописывается одной строкой JSON в файл (TRACE_FILE) в
+форме OTLP/JSON (resourceSpans -> scopeSpans -> spans), такой файл можно
+загрузить в коллектор OpenTelemetry. Сериализация и запись выполняются в
+фоновом потоке экспортера: завершение отрезка в event loop только ставит
+трассу в очередь. Пока трассировка не включена через configure(), все
+функции модуля - пустые операции.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'perplexity-news-automation'
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('trace_span', default=None)
+_exporter: Optional['JsonLinesExporter'] = None
+
+@dataclass
+class Span:
+    """Отрезок трассы"""
+    name: str
+    trace: 'Trace'
+    span_id: str
+    parent_id: str = ''
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: str = ''
+    _token: Optional[contextvars.Token] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        """Завершение отрезка; завершение корневого отрезка выгружает трассу"""
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self is self.trace.root:
+            self.trace.finish()
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_otlp(self) -> Dict:
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class _NoopSpan:
+    """Отрезок вне трассы или при выключенной трассировке"""
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """Отрезки одного прохода поста"""
+
+    def __init__(self, exporter: 'JsonLinesExporter'):
+        self.trace_id = os.urandom(16).hex()
+        self.exporter = exporter
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        span = Span(name, self, os.urandom(8).hex(), parent.span_id if parent else '', attributes=attributes)
+        self.spans.append(span)
+        if self.root is None:
+            self.root = span
+        return span
+
+    def finish(self):
+        # Незавершенные отрезки (например, отмененные задачи) закрываются вместе с трассой
+        for span in self.spans:
+            if not span.end_ns:
+                span.end_ns = self.root.end_ns
+                span.error = span.error or 'не завершен к концу трассы'
+        self.exporter.export(self)
+
+class JsonLinesExporter:
+    """Запись трасс в файл: одна строка OTLP/JSON на трассу.
+
+    export() только ставит трассу в очередь; сериализует и пишет фоновый
+    поток, который запускается при первой трассе.
+    """
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = Path(path)
+        self.service_name = service_name
+        self.exported = 0
+        self._queue: 'queue.Queue[Optional[Trace]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, trace: Trace):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+        self._queue.put(trace)
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                if trace is None:
+                    return
+                self._write(trace)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, trace: Trace):
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', self.service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [span.to_otlp() for span in trace.spans]
+            }]
+        }]}, ensure_ascii=False)
+
+        try:
+            with self.path.open('a', encoding='utf-8') as output:
+                output.write(line + '\n')
+            self.exported += 1
+        except OSError as e:
+            logger.error("❌ Ошибка записи трассы: %s", e)
+
+    def flush(self):
+        """Ожидание записи всех трасс из очереди"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Запись оставшихся трасс и остановка потока"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+def configure(path: Optional[str], service_name: str = SERVICE_NAME):
+    """Включение трассировки с записью в path; None выключает"""
+    global _exporter
+    shutdown()
+    _exporter = JsonLinesExporter(path, service_name) if path else None
+
+def flush():
+    """Запись трасс, завершенных к этому моменту"""
+    if _exporter is not None:
+        _exporter.flush()
+
+def shutdown():
+    """Запись оставшихся трасс и остановка потока экспортера"""
+    if _exporter is not None:
+        _exporter.close()
+
+def enabled() -> bool:
+    return _exporter is not None
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes):
+    """Дочерний отрезок без активации (для отрезков, которые переживают yield).
+
+    Без parent родителем становится текущий отрезок; вне трассы - пустая операция.
+    """
+    parent = parent or _current.get()
+    if parent is None or _exporter is None:
+        return NOOP_SPAN
+    return parent.trace.start_span(name, parent, **attributes)
+
+def span(name: str, parent: Optional[Span] = None, **attributes):
+    """Вложенный отрезок: `with span('db.save_post'):`"""
+    return start_span(name, parent, **attributes)
+
+def trace(name: str, **attributes):
+    """Отрезок текущей трассы или корень новой, если трассы нет"""
+    if _exporter is None:
+        return NOOP_SPAN
+    parent = _current.get()
+    if parent is not None:
+        return parent.trace.start_span(name, parent, **attributes)
+    return Trace(_exporter).start_span(name, **attributes)
+
+def annotate(**attributes):
+    """Атрибуты корня текущей трассы (id и заголовок поста для команды traces)"""
+    current = _current.get()
+    if current is not None:
+        current.trace.root.set(**attributes)
+
+atexit.register(shutdown)
+
+# =============================================================================
+# ЧТЕНИЕ ТРАСС (команда CLI traces)
+# =============================================================================
+
+def _attribute_value(value: Dict) -> Any:
+    for kind in ('stringValue', 'intValue', 'doubleValue', 'boolValue'):
+        if kind in value:
+            return int(value[kind]) if kind == 'intValue' else value[kind]
+    return None
+
+def load_traces(path: str, day: Optional[date] = None) -> List[Dict]:
+    """Трассы из файла (корень начался в день day, по умолчанию - сегодня)"""
+    day = day or date.today()
+    traces = []
+
+    try:
+        lines = Path(path).read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return []
+
+    for line in lines:
+        try:
+            spans = [span for resource in json.loads(line)['resourceSpans']
+                     for scope in resource['scopeSpans'] for span in scope['spans']]
+        except (ValueError, KeyError):
+            continue
+
+        root = next((span for span in spans if not span.get('parentSpanId')), None)
+        if root is None:
+            continue
+        started = datetime.fromtimestamp(int(root['startTimeUnixNano']) / 1e9)
+        if started.date() != day:
+            continue
+
+        traces.append({
+            'trace_id': root['traceId'],
+            'name': root['name'],
+            'started': started,
+            'seconds': (int(root['endTimeUnixNano']) - int(root['startTimeUnixNano'])) / 1e9,
+            'attributes': {item['key']: _attribute_value(item['value']) for item in root.get('attributes', [])},
+            'root': root,
+            'spans': spans
+        })
+
+    return traces
+
+def slowest_traces(path: str, limit: int = 10, day: Optional[date] = None) -> List[Dict]:
+    return sorted(load_traces(path, day), key=lambda item: item['seconds'], reverse=True)[:limit]
+
+def breakdown(trace_item: Dict) -> Iterator[str]:
+    """Строки дерева отрезков трассы с длительностью и долей от корня"""
+    children: Dict[str, List[Dict]] = {}
+    for span in trace_item['spans']:
+        children.setdefault(span.get('parentSpanId', ''), []).append(span)
+
+    total = max(trace_item['seconds'], 1e-9)
+
+    def walk(span: Dict, depth: int) -> Iterator[str]:
+        seconds = (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e9
+        error = " ❌ " + span['status'].get('message', '') if span.get('status', {}).get('code') == 2 else ''
+        yield f"{'  ' * depth}{span['name']:<{32 - 2 * depth}} {seconds:>8.3f} с {seconds / total:>5.0%}{error}"
+        for child in sorted(children.get(span['spanId'], []), key=lambda item: int(item['startTimeUnixNano'])):
+            yield from walk(child, depth + 1)
+
+    yield from walk(trace_item['root'], 0)